@@ -0,0 +1,208 @@
+import glob
+import hashlib
+import os
+import time
+import uuid
+from typing import Iterable, Iterator, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import FileResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+
+from .async_utils import aiter_sync, aread_file
+from .metrics import observe_archive_build
+from .models import Automobile, Part, PartFile
+from .utils import stream_zip
+
+PART_SCOPE = 'part'
+AUTOMOBILE_SCOPE = 'automobile'
+
+
+def archive_part_files(scope: str, object_id: int) -> QuerySet:
+    """
+    Returns the PartFiles that make up the archive of a part or an automobile,
+    in a stable order.
+
+    :param scope: Either PART_SCOPE or AUTOMOBILE_SCOPE.
+    :param object_id: The ID of the part or automobile.
+    :return: A QuerySet of PartFiles ordered by ID.
+    """
+    if scope == PART_SCOPE:
+        queryset = PartFile.objects.filter(part_id=object_id)
+    elif scope == AUTOMOBILE_SCOPE:
+        queryset = PartFile.objects.filter(part__automobile_id=object_id)
+    else:
+        raise ValueError(f"Unknown archive scope: {scope}")
+    return queryset.only('id', 'file', 'file_name').order_by('id')
+
+
+def archive_cache_dir() -> str:
+    return os.path.join(settings.MEDIA_ROOT, settings.ARCHIVE_CACHE_LOCATION)
+
+
+class CachedArchive:
+    """
+    A ZIP archive of a part's or an automobile's files, cached on disk under a
+    version stamp derived from its PartFile set.
+
+    Because stored file names are content hashes, the stamp changes whenever a
+    file is added, removed or renamed, so a cached archive is never stale; old
+    versions are only removed to reclaim disk space. The stamp also covers the
+    scope's compression level from ARCHIVE_COMPRESSION_LEVELS.
+    """
+
+    def __init__(self, scope: str, object_id: int, part_files: Iterable[PartFile]):
+        self.scope = scope
+        self.object_id = object_id
+        part_files = list(part_files)
+        self.members = [(pf.file.path, pf.file_name) for pf in part_files]
+        self.compression_level = settings.ARCHIVE_COMPRESSION_LEVELS[scope]
+
+        hasher = hashlib.sha256(f"level={self.compression_level}\n".encode('utf-8'))
+        for pf in part_files:
+            hasher.update(f"{pf.id}\0{pf.file.name}\0{pf.file_name}\n".encode('utf-8'))
+        self.version = hasher.hexdigest()
+
+    @classmethod
+    def for_object(cls, scope: str, object_id: int) -> 'CachedArchive':
+        return cls(scope, object_id, archive_part_files(scope, object_id))
+
+    @property
+    def path(self) -> str:
+        return os.path.join(archive_cache_dir(), f"{self.scope}-{self.object_id}-{self.version}.zip")
+
+    @property
+    def etag(self) -> str:
+        return quote_etag(self.version)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def stream(self) -> Iterator[bytes]:
+        """
+        Streams the archive while writing it to the cache. The cached copy is
+        only published once the whole archive has been produced, so an aborted
+        download never leaves a truncated archive behind. The time spent
+        producing the archive, but not waiting for the client to read it, is
+        recorded in the archive_build_seconds metric.
+
+        :return: An iterator over the bytes of the ZIP archive.
+        """
+        os.makedirs(archive_cache_dir(), exist_ok=True)
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        build_time = 0.0
+        try:
+            with open(temp_path, 'wb') as cache_file:
+                started = time.perf_counter()
+                for chunk in stream_zip(self.members, compression_level=self.compression_level,
+                                        workers=settings.ARCHIVE_COMPRESSION_WORKERS):
+                    cache_file.write(chunk)
+                    build_time += time.perf_counter() - started
+                    yield chunk
+                    started = time.perf_counter()
+            os.replace(temp_path, self.path)
+            observe_archive_build(self.scope, build_time + time.perf_counter() - started)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def build(self) -> None:
+        """
+        Writes the archive to the cache without serving it.
+        """
+        for _ in self.stream():
+            pass
+
+
+def invalidate_archives(scope: str, object_id: int) -> None:
+    """
+    Removes every cached archive version of a part or an automobile.
+
+    :param scope: Either PART_SCOPE or AUTOMOBILE_SCOPE.
+    :param object_id: The ID of the part or automobile.
+    """
+    for path in glob.glob(os.path.join(archive_cache_dir(), f"{scope}-{object_id}-*.zip")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def invalidate_upload_archives(automobile: Automobile, parts: Iterable[Part]) -> None:
+    """
+    Removes the cached archives affected by new files on the given parts of an automobile.
+
+    :param automobile: The automobile that received files.
+    :param parts: The parts that received files.
+    """
+    for part in parts:
+        invalidate_archives(PART_SCOPE, part.id)
+    invalidate_archives(AUTOMOBILE_SCOPE, automobile.id)
+
+
+def not_modified_response(request: HttpRequest, archive: CachedArchive) -> Optional[HttpResponse]:
+    """
+    Returns a 304 response if the client's If-None-Match matches the archive version.
+
+    :param request: The incoming HTTP request.
+    :param archive: The archive being requested.
+    :return: A 304 HttpResponse, or None if the archive must be sent.
+    """
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if archive.etag in if_none_match or '*' in if_none_match:
+        response = HttpResponse(status=304)
+        response['ETag'] = archive.etag
+        return response
+    return None
+
+
+def archive_response(request: HttpRequest, archive: CachedArchive, filename: str) -> HttpResponse:
+    """
+    Returns the response for an archive download: 304 if the client already
+    has this version, the cached file if it exists, or a streaming response
+    that populates the cache otherwise.
+
+    :param request: The incoming HTTP request, optionally with If-None-Match.
+    :param archive: The archive to deliver.
+    :param filename: The attachment file name.
+    :return: An HttpResponse carrying the archive's ETag.
+    """
+    response = not_modified_response(request, archive)
+    if response is not None:
+        return response
+
+    try:
+        response = FileResponse(open(archive.path, 'rb'), content_type='application/zip')
+    except FileNotFoundError:
+        response = StreamingHttpResponse(archive.stream(), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = archive.etag
+    return response
+
+
+async def aarchive_response(request: HttpRequest, archive: CachedArchive, filename: str) -> HttpResponse:
+    """
+    Async variant of archive_response() whose body is produced without
+    blocking the event loop.
+
+    :param request: The incoming HTTP request, optionally with If-None-Match.
+    :param archive: The archive to deliver.
+    :param filename: The attachment file name.
+    :return: An HttpResponse carrying the archive's ETag.
+    """
+    response = not_modified_response(request, archive)
+    if response is not None:
+        return response
+
+    try:
+        size = await sync_to_async(os.path.getsize, thread_sensitive=False)(archive.path)
+    except FileNotFoundError:
+        response = StreamingHttpResponse(aiter_sync(archive.stream()), content_type='application/zip')
+    else:
+        response = StreamingHttpResponse(aread_file(archive.path), content_type='application/zip')
+        response['Content-Length'] = size
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = archive.etag
+    return response
@@ -0,0 +1,60 @@
+from typing import AsyncIterator, Iterable, TypeVar
+
+from asgiref.sync import sync_to_async
+
+T = TypeVar('T')
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+_exhausted = object()
+
+
+async def aiter_sync(iterable: Iterable[T], thread_sensitive: bool = False) -> AsyncIterator[T]:
+    """
+    Adapts a blocking iterator (e.g. stream_zip) for async streaming responses
+    by advancing it in a worker thread, so the event loop is never blocked by
+    file reads or compression. The iterator is closed if the client goes away.
+
+    :param iterable: The blocking iterable to consume.
+    :param thread_sensitive: Advance the iterator in the shared sync thread,
+        as iterators holding a database cursor must stay on its connection.
+    :return: An async iterator over the same items.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            item = await sync_to_async(next, thread_sensitive=thread_sensitive)(iterator, _exhausted)
+            if item is _exhausted:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+
+async def aread_file(path: str, start: int = 0, length: int = -1,
+                     chunk_size: int = FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """
+    Reads a byte range of a file in chunks without blocking the event loop.
+
+    :param path: The path of the file to read.
+    :param start: The offset of the first byte to read.
+    :param length: The number of bytes to read, or -1 to read to the end.
+    :param chunk_size: The maximum size of each yielded chunk.
+    :return: An async iterator over the file's bytes.
+    """
+    file = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining != 0:
+            size = chunk_size if remaining < 0 else min(chunk_size, remaining)
+            chunk = await sync_to_async(file.read, thread_sensitive=False)(size)
+            if not chunk:
+                return
+            if remaining > 0:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
@@ -0,0 +1,251 @@
+from typing import Any, Callable, Dict, List
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.models import Model, QuerySet
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .archives import AUTOMOBILE_SCOPE, PART_SCOPE, CachedArchive, aarchive_response
+from .async_utils import aiter_sync
+from .downloads import get_download_backend
+from .export import EXPORT_CONTENT_TYPE, EXPORT_STARTED_HEADER, export_watermark, iter_export
+from .fast_serializers import AUTOMOBILE_COLUMNS, PART_COLUMNS, serialize_automobiles, serialize_parts
+from .filters import filter_automobiles, filter_parts
+from .models import Automobile, Part, PartFile
+from .pagination import PaginationMixin
+from .query_planning import QueryPlanMixin
+from .renderers import InstrumentedJSONRenderer, ORJSONRenderer
+from .response_cache import AUTOMOBILE_LIST_SCOPE, automobile_scope, cached_representation, conditional_response
+from .serializers import AutomobileSerializer, ExportQuerySerializer, PartSerializer, UploadFileContentSerializer
+from .views import automobile_pk, publish_upload
+
+
+async def aget_object_or_404(queryset: QuerySet, **lookup) -> Model:
+    """
+    Async counterpart of get_object_or_404 using the async ORM.
+
+    :param queryset: The queryset to look the object up in.
+    :return: The matching model instance.
+    :raises Http404: If no object matches the lookup.
+    """
+    try:
+        return await queryset.aget(**lookup)
+    except queryset.model.DoesNotExist:
+        raise Http404
+
+
+class AsyncAPIView(View):
+    """
+    Base class for the async views used in the ASGI deployment (ASYNC_VIEWS).
+
+    Like APIView it is CSRF exempt, wraps the request in a DRF Request,
+    answers missing objects with ``{"detail": "Not found."}`` and any other
+    APIException (validation, parse or permission errors) with its status
+    and detail, like DRF's exception handler; JSON bodies are rendered with the sync views' JSON
+    renderer so payloads match.
+    """
+
+    renderer = InstrumentedJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    def setup(self, request, *args, **kwargs):
+        parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+        super().setup(Request(request, parsers=parsers), *args, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(self.request, *args, **kwargs)
+        except Http404:
+            return self.json_response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = self.json_response(data, status=exc.status_code)
+            if getattr(exc, 'wait', None):
+                response['Retry-After'] = str(int(exc.wait))
+            return response
+
+    def json_response(self, data: Any, status: int = status.HTTP_200_OK) -> HttpResponse:
+        return HttpResponse(self.renderer.render(data), status=status, content_type='application/json')
+
+    def render_page(self, queryset: QuerySet) -> Dict[str, Any]:
+        """
+        Paginates and serializes a planned queryset. Runs in a worker thread,
+        as pagination and prefetching use the sync ORM.
+        """
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True, context={'request': self.request})
+        return self.get_paginated_response(serializer.data).data
+
+    def render_rows(self, queryset: QuerySet,
+                    serialize: Callable[[List[Dict[str, Any]], Any], List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Paginates a values() queryset and serializes the page with one of the
+        fast_serializers functions. Runs in a worker thread.
+        """
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize(page, self.request)).data
+
+
+class AsyncListPartsView(QueryPlanMixin, PaginationMixin, AsyncAPIView):
+    """
+    Async variant of ListPartsView.
+    """
+
+    queryset = Part.objects.all()
+    serializer_class = PartSerializer
+    renderer = ORJSONRenderer()
+
+    async def get(self, request, automobile_id):
+        automobile = await aget_object_or_404(Automobile.objects.all(), id=automobile_id)
+        if self.get_field_selection().is_empty:
+            rows = filter_parts(Part.objects.filter(automobile=automobile).values(*PART_COLUMNS), request.query_params)
+            render = lambda: self.render_rows(rows, serialize_parts)  # noqa: E731
+        else:
+            queryset = filter_parts(self.get_queryset().filter(automobile=automobile), request.query_params)
+            render = lambda: self.render_page(queryset)  # noqa: E731
+        representation = await sync_to_async(cached_representation)(request, automobile_scope(automobile_id), render)
+        return conditional_response(request, representation, self.json_response)
+
+
+class AsyncListAutomobilesView(QueryPlanMixin, PaginationMixin, AsyncAPIView):
+    """
+    Async variant of ListAutomobilesView.
+    """
+
+    queryset = Automobile.objects.all()
+    serializer_class = AutomobileSerializer
+    renderer = ORJSONRenderer()
+
+    async def get(self, request):
+        if self.get_field_selection().is_empty:
+            rows = filter_automobiles(Automobile.objects.values(*AUTOMOBILE_COLUMNS), request.query_params)
+            render = lambda: self.render_rows(rows, serialize_automobiles)  # noqa: E731
+        else:
+            queryset = filter_automobiles(self.get_queryset(), request.query_params)
+            render = lambda: self.render_page(queryset)  # noqa: E731
+        representation = await sync_to_async(cached_representation)(request, AUTOMOBILE_LIST_SCOPE, render)
+        return conditional_response(request, representation, self.json_response)
+
+
+class AsyncExportCatalogueView(AsyncAPIView):
+    """
+    Async variant of ExportCatalogueView.
+    """
+
+    async def get(self, request):
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        started_at = timezone.now()
+        lines = iter_export(**params.validated_data, request=request)
+        response = StreamingHttpResponse(aiter_sync(lines, thread_sensitive=True), content_type=EXPORT_CONTENT_TYPE)
+        response[EXPORT_STARTED_HEADER] = export_watermark(started_at).isoformat()
+        return response
+
+
+class AsyncGetAutomobileView(QueryPlanMixin, AsyncAPIView):
+    """
+    Async variant of GetAutomobileView.
+    """
+
+    queryset = Automobile.objects.all()
+    serializer_class = AutomobileSerializer
+
+    async def get(self, request, pk):
+        pk = automobile_pk(pk)
+        representation = await sync_to_async(cached_representation)(
+            request, automobile_scope(pk),
+            lambda: self.get_serializer(get_object_or_404(self.get_queryset(), pk=pk)).data)
+        return conditional_response(request, representation, self.json_response)
+
+
+class AsyncUploadFileView(AsyncAPIView):
+    """
+    Async variant of UploadFileView. The file and its outbox notification are
+    written in a worker thread, so the event loop never waits on the database.
+    """
+
+    async def get(self, request, automobile_id, part_id):
+        serializer = UploadFileContentSerializer(data={"file_name": "", "content": ""})
+        return self.json_response(serializer.initial_data)
+
+    async def post(self, request, automobile_id, part_id):
+        part = await aget_object_or_404(Part.objects.select_related('automobile'),
+                                        id=part_id, automobile__id=automobile_id)
+
+        data = await sync_to_async(lambda: request.data)()
+        serializer = UploadFileContentSerializer(data=data)
+        if not serializer.is_valid():
+            return self.json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        file_name = serializer.validated_data['file_name']
+        content = serializer.validated_data['content']
+
+        file_obj = SimpleUploadedFile(file_name, content.encode('utf-8'))
+        part_file = await sync_to_async(self.create_part_file)(request, part, file_obj)
+
+        return self.json_response(
+            {"message": "File uploaded successfully.", "file_id": part_file.id},
+            status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def create_part_file(request, part: Part, file_obj) -> PartFile:
+        """
+        Creates the PartFile and queues its notification in one transaction.
+        Runs in the thread that owns the database connection.
+        """
+        with transaction.atomic():
+            part_file = PartFile.objects.create(part=part, file=file_obj)
+            publish_upload(request, part, part_file)
+        return part_file
+
+
+class AsyncDownloadSingleFileView(AsyncAPIView):
+    """
+    Async variant of DownloadSingleFileView.
+    """
+
+    async def get(self, request, part_id, file_id):
+        part_file = await aget_object_or_404(PartFile.objects.all(), id=file_id, part_id=part_id)
+        return await get_download_backend().aserve(request, part_file)
+
+
+class AsyncDownloadAllFilesForPartView(AsyncAPIView):
+    """
+    Async variant of DownloadAllFilesForPartView.
+    """
+
+    async def get(self, request, part_id):
+        part = await aget_object_or_404(Part.objects.select_related('automobile'), id=part_id)
+        archive = await sync_to_async(CachedArchive.for_object)(PART_SCOPE, part.id)
+        if not archive.members:
+            return self.json_response({"error": "No files found for this part."},
+                                      status=status.HTTP_404_NOT_FOUND)
+        return await aarchive_response(request, archive, f"{part.name}_{part.automobile}_files.zip")
+
+
+class AsyncDownloadAllFilesForAutomobileView(AsyncAPIView):
+    """
+    Async variant of DownloadAllFilesForAutomobileView.
+    """
+
+    async def get(self, request, automobile_id):
+        automobile = await aget_object_or_404(Automobile.objects.all(), id=automobile_id)
+        archive = await sync_to_async(CachedArchive.for_object)(AUTOMOBILE_SCOPE, automobile.id)
+        if not archive.members:
+            return self.json_response({"error": "No files found for this automobile."},
+                                      status=status.HTTP_404_NOT_FOUND)
+        return await aarchive_response(request, archive,
+                                       f"{automobile.manufacturer}_{automobile.model}_files.zip")
@@ -0,0 +1,349 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from django.core.files.base import File
+from django.db import transaction
+
+from .archives import AUTOMOBILE_SCOPE, PART_SCOPE, invalidate_archives
+from .models import Automobile, Part, PartFile
+from .outbox import enqueue_task
+from .response_cache import invalidate_automobile_responses
+from .utils import upload_payload
+
+CSV_FORMAT = 'csv'
+NDJSON_FORMAT = 'ndjson'
+MANIFEST_FORMATS = {'.csv': CSV_FORMAT, '.ndjson': NDJSON_FORMAT, '.jsonl': NDJSON_FORMAT}
+AUTOMOBILE_COLUMNS = ('manufacturer', 'type', 'model')
+
+ManifestRow = Dict[str, str]
+AutomobileKey = Tuple[str, str, str]
+PartKey = Tuple[int, str]
+
+
+class ManifestError(Exception):
+    """
+    Raised for a manifest row that cannot be imported.
+    """
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+class ImportStats:
+    """
+    Counts what an import created or found already present.
+    """
+
+    __slots__ = ('rows', 'automobiles', 'parts', 'files', 'existing_files', 'bytes')
+
+    def __init__(self):
+        self.rows = 0
+        self.automobiles = 0
+        self.parts = 0
+        self.files = 0
+        self.existing_files = 0
+        self.bytes = 0
+
+    def add(self, other: 'ImportStats') -> None:
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def manifest_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MANIFEST_FORMATS:
+        raise ValueError(f"Cannot tell the format of {path}; use a .csv, .ndjson or .jsonl manifest.")
+    return MANIFEST_FORMATS[extension]
+
+
+def read_manifest(path: str, format: Optional[str] = None) -> Iterator[Tuple[int, ManifestRow]]:
+    """
+    Streams the rows of a CSV or NDJSON manifest. Every row describes an
+    automobile (``manufacturer``, ``type``, ``model``) and optionally one of
+    its parts (``part``) and a file of that part (``file``, a path relative to
+    the files directory, and ``file_name``, defaulting to the file's name).
+
+    :param path: The path of the manifest.
+    :param format: CSV_FORMAT or NDJSON_FORMAT, guessed from the extension by default.
+    :return: An iterator over (line number, row) pairs.
+    :raises ManifestError: If an NDJSON line is not a JSON object.
+    """
+    format = format or manifest_format(path)
+    with open(path, newline='' if format == CSV_FORMAT else None, encoding='utf-8') as manifest:
+        if format == CSV_FORMAT:
+            reader = csv.DictReader(manifest)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(manifest, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as exc:
+                raise ManifestError(line, f"Invalid JSON: {exc}")
+            if not isinstance(row, dict):
+                raise ManifestError(line, "Expected a JSON object.")
+            yield line, row
+
+
+def clean_row(line: int, row: ManifestRow) -> ManifestRow:
+    """
+    Strips a manifest row and checks that it names an automobile, and a part
+    for any file.
+
+    :raises ManifestError: If a required column is missing.
+    """
+    row = {key: str(value).strip() for key, value in row.items() if key and value is not None}
+    missing = [column for column in AUTOMOBILE_COLUMNS if not row.get(column)]
+    if missing:
+        raise ManifestError(line, f"Missing {', '.join(missing)}.")
+    if row.get('file') and not row.get('part'):
+        raise ManifestError(line, "A file needs a part.")
+    return row
+
+
+def automobile_key(row: ManifestRow) -> AutomobileKey:
+    return tuple(row[column] for column in AUTOMOBILE_COLUMNS)
+
+
+def batched(rows: Iterable[Tuple[int, ManifestRow]], size: int) -> Iterator[List[Tuple[int, ManifestRow]]]:
+    batch = []
+    for line, row in rows:
+        batch.append((line, clean_row(line, row)))
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def store_file(path: str) -> Tuple[str, int]:
+    """
+    Copies a file into PartFile storage. Storage is content-addressed, so a
+    file whose content is already stored is not copied again.
+
+    :param path: The path of the file to copy.
+    :return: The storage name and the size of the file.
+    """
+    field = PartFile._meta.get_field('file')
+    with open(path, 'rb') as source:
+        name = field.storage.save(field.generate_filename(None, os.path.basename(path)), File(source))
+        return name, os.fstat(source.fileno()).st_size
+
+
+class CatalogueImporter:
+    """
+    Imports manifest rows batch by batch. A pool of threads copies a batch's
+    files before its rows are written with bulk_create. Automobiles that
+    already exist (same manufacturer, type and model) and parts that already
+    exist (same automobile and name) are reused, and files a part already has
+    under the same name and content are skipped, so an interrupted import can
+    simply be run again.
+
+    Upload notifications are suppressed unless ``notify_base_url`` is given,
+    in which case every batch queues one aggregated notification.
+    """
+
+    def __init__(self, files_dir: str, workers: Optional[int] = None, notify_base_url: Optional[str] = None):
+        self.files_dir = os.path.realpath(files_dir)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='catalogue-import')
+        self.notify_base_url = notify_base_url
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def __enter__(self) -> 'CatalogueImporter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def resolve(self, line: int, path: str) -> str:
+        """
+        Resolves a manifest path against the files directory, following
+        symbolic links.
+
+        :return: The absolute path of the file.
+        :raises ManifestError: If the path leads outside the files directory.
+        """
+        resolved = os.path.realpath(os.path.join(self.files_dir, path))
+        if os.path.commonpath([self.files_dir, resolved]) != self.files_dir:
+            raise ManifestError(line, f"{path} is outside the files directory.")
+        return resolved
+
+    def store_files(self, batch: List[Tuple[int, ManifestRow]], stats: ImportStats) -> Dict[str, Tuple[str, int]]:
+        """
+        Copies the distinct files of a batch in parallel.
+
+        :return: A mapping of manifest path to storage name and size.
+        :raises ManifestError: If a file is outside the files directory or cannot be read.
+        """
+        lines = {}
+        for line, row in batch:
+            if row.get('file'):
+                lines.setdefault(row['file'], line)
+
+        paths = {path: self.resolve(line, path) for path, line in lines.items()}
+        futures = {path: self.executor.submit(store_file, resolved) for path, resolved in paths.items()}
+        blobs = {}
+        for path, future in futures.items():
+            try:
+                blobs[path] = future.result()
+            except OSError as exc:
+                raise ManifestError(lines[path], f"Cannot read {path}: {exc.strerror or exc}")
+            stats.bytes += blobs[path][1]
+        return blobs
+
+    def import_batch(self, batch: List[Tuple[int, ManifestRow]]) -> ImportStats:
+        """
+        Imports one batch of cleaned manifest rows in a single transaction.
+
+        :param batch: (line number, row) pairs, see read_manifest() and clean_row().
+        :return: What the batch created.
+        """
+        stats = ImportStats()
+        stats.rows = len(batch)
+        blobs = self.store_files(batch, stats)
+        rows = [row for _, row in batch]
+
+        with transaction.atomic():
+            automobiles, new_automobiles = self.get_or_create_automobiles(rows)
+            parts, new_parts = self.get_or_create_parts(rows, automobiles)
+            part_files, existing_files = self.create_part_files(rows, automobiles, parts, blobs)
+            stats.automobiles, stats.parts, stats.files = len(new_automobiles), len(new_parts), len(part_files)
+            stats.existing_files = existing_files
+
+            new_part_ids = {part.id for part in new_parts}
+            filed_parts = {part_file.part_id: part_file.part for part_file in part_files}
+            changed_automobile_ids = ({automobile.id for automobile in new_automobiles}
+                                      | {part.automobile_id for part in new_parts}
+                                      | {part.automobile_id for part in filed_parts.values()})
+            transaction.on_commit(lambda: self.invalidate(
+                changed_automobile_ids, filed_parts.keys() - new_part_ids,
+                {part.automobile_id for part in filed_parts.values()}))
+
+            if self.notify_base_url and part_files:
+                payloads = [upload_payload(part_file.part, urljoin(self.notify_base_url, part_file.file.url))
+                            for part_file in part_files]
+                enqueue_task('email_app.tasks.send_bulk_email_task', [payloads])
+        return stats
+
+    @staticmethod
+    def get_or_create_automobiles(rows: List[ManifestRow]) -> Tuple[Dict[AutomobileKey, Automobile],
+                                                                    List[Automobile]]:
+        """
+        Looks up the automobiles of a batch, creating the missing ones. Of
+        several matching automobiles, the oldest is used.
+
+        :return: The automobiles by key, and those that were created.
+        """
+        keys = {automobile_key(row) for row in rows}
+
+        def existing() -> Dict[AutomobileKey, Automobile]:
+            found = {}
+            queryset = Automobile.objects.filter(model__in={key[2] for key in keys}).order_by('-id')
+            for automobile in queryset.only(*AUTOMOBILE_COLUMNS):
+                key = (automobile.manufacturer, automobile.type, automobile.model)
+                if key in keys:
+                    found[key] = automobile
+            return found
+
+        automobiles = existing()
+        missing = sorted(keys - automobiles.keys())
+        if not missing:
+            return automobiles, []
+        created = Automobile.objects.bulk_create([Automobile(**dict(zip(AUTOMOBILE_COLUMNS, key))) for key in missing])
+        if created[0].pk is None:
+            # Backends that do not return IDs from bulk inserts (e.g. older SQLite).
+            automobiles = existing()
+            return automobiles, [automobiles[key] for key in missing]
+        automobiles.update(zip(missing, created))
+        return automobiles, created
+
+    @staticmethod
+    def get_or_create_parts(rows: List[ManifestRow], automobiles: Dict[AutomobileKey, Automobile]) \
+            -> Tuple[Dict[PartKey, Part], List[Part]]:
+        """
+        Looks up the parts of a batch by automobile and name, creating the
+        missing ones.
+
+        :return: The parts by key, with their automobile set, and those that were created.
+        """
+        keys = {}
+        for row in rows:
+            if row.get('part'):
+                automobile = automobiles[automobile_key(row)]
+                keys[(automobile.id, row['part'])] = automobile
+        if not keys:
+            return {}, []
+
+        def existing() -> Dict[PartKey, Part]:
+            found = {}
+            queryset = Part.objects.filter(automobile_id__in={key[0] for key in keys},
+                                           name__in={key[1] for key in keys}).order_by('-id')
+            for part in queryset.only('id', 'automobile_id', 'name'):
+                key = (part.automobile_id, part.name)
+                if key in keys:
+                    part.automobile = keys[key]
+                    found[key] = part
+            return found
+
+        parts = existing()
+        missing = sorted(keys.keys() - parts.keys())
+        if not missing:
+            return parts, []
+        created = Part.objects.bulk_create([Part(automobile=keys[key], name=key[1]) for key in missing])
+        if created[0].pk is None:
+            parts = existing()
+            return parts, [parts[key] for key in missing]
+        parts.update(zip(missing, created))
+        return parts, created
+
+    @staticmethod
+    def create_part_files(rows: List[ManifestRow], automobiles: Dict[AutomobileKey, Automobile],
+                          parts: Dict[PartKey, Part], blobs: Dict[str, Tuple[str, int]]) \
+            -> Tuple[List[PartFile], int]:
+        """
+        Creates the PartFiles of a batch, skipping those a part already has
+        under the same name and content.
+
+        :return: The created PartFiles, and the number of files skipped.
+        """
+        part_files = {}
+        for row in rows:
+            if not row.get('file'):
+                continue
+            part = parts[(automobiles[automobile_key(row)].id, row['part'])]
+            file_name = row.get('file_name') or os.path.basename(row['file'])
+            name, size = blobs[row['file']]
+            if (part.id, file_name, name) not in part_files:
+                part_file = PartFile(part=part, file=name, file_name=file_name)
+                part_file.set_file_metadata(size)
+                part_files[(part.id, file_name, name)] = part_file
+        if not part_files:
+            return [], 0
+
+        existing = set(PartFile.objects.filter(part_id__in={key[0] for key in part_files})
+                       .values_list('part_id', 'file_name', 'file'))
+        new = [part_file for key, part_file in part_files.items() if key not in existing]
+        return PartFile.objects.bulk_create(new), len(part_files) - len(new)
+
+    @staticmethod
+    def invalidate(automobile_ids: Iterable[int], part_ids: Iterable[int], archive_automobile_ids: Iterable[int]) \
+            -> None:
+        """
+        Drops the cached responses of changed automobiles and the cached
+        archives of the parts and automobiles that received files. New parts
+        have no cached archives.
+        """
+        invalidate_automobile_responses(*automobile_ids)
+        for part_id in part_ids:
+            invalidate_archives(PART_SCOPE, part_id)
+        for automobile_id in archive_automobile_ids:
+            invalidate_archives(AUTOMOBILE_SCOPE, automobile_id)
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+POOL_MODES = (settings.DB_POOL_PERSISTENT, settings.DB_POOL_PGBOUNCER, settings.DB_POOL_NONE)
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+# Connections besides the web and Celery workers: the outbox relay.
+OTHER_CONNECTIONS = 1
+
+
+def connection_budget() -> int:
+    """
+    Returns the number of database connections one deployment holds with
+    persistent connections: one per gunicorn thread and per Celery worker
+    process, plus the outbox relay's.
+    """
+    return settings.WEB_CONCURRENCY * settings.WEB_THREADS + settings.CELERY_WORKER_CONCURRENCY + OTHER_CONNECTIONS
+
+
+@register('database_connections')
+def check_connection_pooling(app_configs, **kwargs):
+    """
+    Checks that DB_POOL_MODE suits the deployment, and that persistent
+    connections fit into DB_MAX_CONNECTIONS.
+    """
+    mode = settings.DB_POOL_MODE
+    if mode not in POOL_MODES:
+        return [Error(f"DB_POOL_MODE must be one of {', '.join(POOL_MODES)}, not '{mode}'.", id='app.E001')]
+
+    if mode == settings.DB_POOL_PERSISTENT and settings.ASYNC_VIEWS:
+        return [Error(
+            "Persistent connections cannot be used with ASYNC_VIEWS: under ASGI every request runs its queries "
+            "in a new thread, which opens a connection of its own that is never reused.",
+            hint="Set DB_POOL_MODE to 'pgbouncer' (or 'none').", id='app.E002')]
+
+    if mode == settings.DB_POOL_PERSISTENT and connection_budget() > settings.DB_MAX_CONNECTIONS:
+        return [Warning(
+            f"Persistent connections need {connection_budget()} database connections "
+            f"(WEB_CONCURRENCY x WEB_THREADS + CELERY_WORKER_CONCURRENCY + {OTHER_CONNECTIONS}), "
+            f"more than DB_MAX_CONNECTIONS ({settings.DB_MAX_CONNECTIONS}).",
+            hint="Lower the worker counts, raise max_connections, or use DB_POOL_MODE=pgbouncer.",
+            id='app.W001')]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_response_cache(app_configs, processes=None, **kwargs):
+    """
+    Checks that the response cache is shared when the service runs in
+    several processes. A local-memory cache is per process, so a change
+    would only invalidate the copies of the process that made it.
+
+    :param processes: The number of web processes, WEB_CONCURRENCY by default.
+    """
+    processes = settings.WEB_CONCURRENCY if processes is None else processes
+    if processes > 1 and settings.CACHES[settings.RESPONSE_CACHE_ALIAS]['BACKEND'] == LOCMEM_CACHE:
+        return [Error(
+            f"The response cache is local to each process, but WEB_CONCURRENCY starts {processes} processes: "
+            f"they would serve stale responses after changes made by the others.",
+            hint="Set CACHE_URL to a shared cache, e.g. redis://host:6379/1, or run a single process.",
+            id='app.E003')]
+    return []
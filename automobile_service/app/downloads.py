@@ -0,0 +1,286 @@
+import os
+import re
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.utils.module_loading import import_string
+
+from .async_utils import aread_file
+from .models import PartFile
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range ``Range: bytes=...`` header against a file size.
+
+    Multiple ranges and malformed headers are ignored (the full file is served),
+    as permitted by RFC 7233.
+
+    :param header: The raw value of the Range header, if any.
+    :param size: The size of the file in bytes.
+    :return: An inclusive (start, end) tuple, or None to serve the whole file.
+    :raises ValueError: If the range is syntactically valid but not satisfiable.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix_length = int(end)
+        if suffix_length == 0:
+            raise ValueError('Unsatisfiable range.')
+        return max(size - suffix_length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Unsatisfiable range.')
+    return start, end
+
+
+class _FileRange:
+    """
+    A read-limited view over an open file starting at a given offset.
+
+    ``fileno`` is exposed so that WSGI servers can still ``sendfile`` the range:
+    the underlying descriptor is positioned at the start of the range and the
+    server sends ``Content-Length`` bytes from there.
+    """
+
+    def __init__(self, file, start: int, length: int):
+        self._file = file
+        self._remaining = length
+        self._file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BaseDownloadBackend:
+    """
+    Base class for download backends. Subclasses turn a stored file into the
+    HTTP response that delivers it to the client.
+    """
+
+    def serve(self, request: HttpRequest, part_file: PartFile) -> HttpResponse:
+        """
+        Builds the response that delivers the given file as an attachment.
+
+        :param request: The incoming HTTP request.
+        :param part_file: The PartFile whose stored file is delivered.
+        :return: An HttpResponse for the download.
+        """
+        raise NotImplementedError('Subclasses of BaseDownloadBackend must implement serve().')
+
+    async def aserve(self, request: HttpRequest, part_file: PartFile) -> HttpResponse:
+        """
+        Async variant of serve() for ASGI views. Backends whose serve() does no
+        blocking I/O can rely on this default.
+
+        :param request: The incoming HTTP request.
+        :param part_file: The PartFile whose stored file is delivered.
+        :return: An HttpResponse for the download.
+        """
+        return self.serve(request, part_file)
+
+    @staticmethod
+    def content_type(part_file: PartFile) -> str:
+        return part_file.content_type or 'application/octet-stream'
+
+    @staticmethod
+    def content_disposition(part_file: PartFile) -> str:
+        filename = part_file.file_name.replace('"', '')
+        return f'attachment; filename="{filename}"'
+
+
+class FileInfo(NamedTuple):
+    """
+    What a download response says about the file it delivers.
+    """
+
+    size: int
+    modified: float
+    etag: Optional[str]
+
+    @classmethod
+    def from_part_file(cls, part_file: PartFile) -> Optional['FileInfo']:
+        """
+        Returns the metadata recorded when the file was uploaded, or None for a
+        PartFile that predates it and has not been backfilled yet.
+        """
+        if part_file.size is None or part_file.uploaded_at is None:
+            return None
+        return cls(part_file.size, part_file.uploaded_at.timestamp(),
+                   quote_etag(part_file.checksum) if part_file.checksum else None)
+
+    @classmethod
+    def from_stat(cls, stat: os.stat_result) -> 'FileInfo':
+        return cls(stat.st_size, stat.st_mtime, None)
+
+
+class StreamingDownloadBackend(BaseDownloadBackend):
+    """
+    Serves the file from the application with a FileResponse, which lets the
+    WSGI server use ``sendfile`` instead of copying the file through Python.
+    Single byte ranges are answered with ``206 Partial Content``. Size, ETag
+    and Last-Modified come from the PartFile's metadata, so the file is only
+    stat()ed for rows that have not been backfilled.
+    """
+
+    @staticmethod
+    def requested_range(request: HttpRequest, info: FileInfo) -> Optional[Tuple[int, int]]:
+        """
+        Returns the byte range to serve, honouring If-Range against the ETag or
+        Last-Modified.
+
+        :param request: The incoming HTTP request.
+        :param info: The size and validators of the file being served.
+        :return: An inclusive (start, end) tuple, or None to serve the whole file.
+        :raises ValueError: If the requested range is not satisfiable.
+        """
+        if_range = request.headers.get('If-Range')
+        if if_range:
+            if if_range.startswith(('"', 'W/')):
+                if if_range != info.etag:
+                    return None
+            elif parse_http_date_safe(if_range) != int(info.modified):
+                return None
+        return parse_range_header(request.headers.get('Range'), info.size)
+
+    @staticmethod
+    def not_modified(request: HttpRequest, info: FileInfo) -> Optional[HttpResponse]:
+        """
+        Returns a 304 response if the client's If-None-Match matches the file's ETag.
+        """
+        if info.etag is None:
+            return None
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if info.etag in if_none_match or '*' in if_none_match:
+            response = HttpResponse(status=304)
+            response['ETag'] = info.etag
+            return response
+        return None
+
+    @staticmethod
+    def not_satisfiable(info: FileInfo) -> HttpResponse:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{info.size}'
+        return response
+
+    def finalize(self, response: HttpResponse, part_file: PartFile, info: FileInfo,
+                 byte_range: Optional[Tuple[int, int]]) -> HttpResponse:
+        if byte_range is None:
+            response['Content-Length'] = info.size
+        else:
+            start, end = byte_range
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = f'bytes {start}-{end}/{info.size}'
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(info.modified)
+        if info.etag:
+            response['ETag'] = info.etag
+        response['Content-Disposition'] = self.content_disposition(part_file)
+        return response
+
+    def serve(self, request: HttpRequest, part_file: PartFile) -> HttpResponse:
+        file_path = part_file.file.path
+        info = FileInfo.from_part_file(part_file) or FileInfo.from_stat(os.stat(file_path))
+        response = self.not_modified(request, info)
+        if response is not None:
+            return response
+        try:
+            byte_range = self.requested_range(request, info)
+        except ValueError:
+            return self.not_satisfiable(info)
+
+        file = open(file_path, 'rb')
+        if byte_range is None:
+            response = FileResponse(file, content_type=self.content_type(part_file))
+        else:
+            start, end = byte_range
+            response = FileResponse(_FileRange(file, start, end - start + 1), status=206,
+                                    content_type=self.content_type(part_file))
+        return self.finalize(response, part_file, info, byte_range)
+
+    async def aserve(self, request: HttpRequest, part_file: PartFile) -> HttpResponse:
+        file_path = part_file.file.path
+        info = FileInfo.from_part_file(part_file)
+        if info is None:
+            info = FileInfo.from_stat(await sync_to_async(os.stat, thread_sensitive=False)(file_path))
+        response = self.not_modified(request, info)
+        if response is not None:
+            return response
+        try:
+            byte_range = self.requested_range(request, info)
+        except ValueError:
+            return self.not_satisfiable(info)
+
+        if byte_range is None:
+            content = aread_file(file_path)
+            response = StreamingHttpResponse(content, content_type=self.content_type(part_file))
+        else:
+            start, end = byte_range
+            content = aread_file(file_path, start, end - start + 1)
+            response = StreamingHttpResponse(content, status=206, content_type=self.content_type(part_file))
+        return self.finalize(response, part_file, info, byte_range)
+
+
+class XAccelRedirectDownloadBackend(BaseDownloadBackend):
+    """
+    Returns an empty response with an ``X-Accel-Redirect`` header so that an
+    nginx front proxy serves the file (including Range requests) from an
+    ``internal`` location mapped to MEDIA_ROOT at FILE_DOWNLOAD_INTERNAL_URL.
+    """
+
+    header = 'X-Accel-Redirect'
+
+    def location(self, part_file: PartFile) -> str:
+        return settings.FILE_DOWNLOAD_INTERNAL_URL.rstrip('/') + '/' + quote(part_file.file.name)
+
+    def serve(self, request: HttpRequest, part_file: PartFile) -> HttpResponse:
+        response = HttpResponse(content_type='application/octet-stream')
+        response[self.header] = self.location(part_file)
+        response['Content-Disposition'] = self.content_disposition(part_file)
+        return response
+
+
+class XSendfileDownloadBackend(XAccelRedirectDownloadBackend):
+    """
+    Returns an empty response with an ``X-Sendfile`` header holding the absolute
+    file path, for Apache (mod_xsendfile) or lighttpd front proxies.
+    """
+
+    header = 'X-Sendfile'
+
+    def location(self, part_file: PartFile) -> str:
+        return part_file.file.path
+
+
+def get_download_backend() -> BaseDownloadBackend:
+    """
+    Instantiates the download backend configured by FILE_DOWNLOAD_BACKEND.
+
+    :return: A BaseDownloadBackend instance.
+    """
+    return import_string(settings.FILE_DOWNLOAD_BACKEND)()
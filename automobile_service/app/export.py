@@ -0,0 +1,121 @@
+import datetime
+from itertools import chain, islice
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+from django.conf import settings
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q, QuerySet
+from django.http import HttpRequest
+
+from .fast_serializers import AUTOMOBILE_COLUMNS, serialize_automobiles
+from .models import Automobile, DeletedAutomobile, Part, PartFile
+
+EXPORT_CONTENT_TYPE = 'application/x-ndjson'
+EXPORT_STARTED_HEADER = 'X-Export-Started-At'
+
+
+def export_watermark(started_at: datetime.datetime) -> datetime.datetime:
+    """
+    Returns the ``since`` value of the export following one started at
+    ``started_at``. Rows are stamped before their transaction commits, so a
+    change committed while the export ran may carry an earlier time than its
+    start; the next export therefore starts EXPORT_WATERMARK_OVERLAP seconds
+    earlier and may repeat a few automobiles.
+    """
+    return started_at - datetime.timedelta(seconds=settings.EXPORT_WATERMARK_OVERLAP)
+
+
+def export_queryset(since_id: Optional[int] = None, since: Optional[datetime.datetime] = None) -> QuerySet:
+    """
+    Selects the automobiles of a catalogue export, in ID order.
+
+    :param since_id: Only export automobiles with a greater ID, i.e. created after it.
+    :param since: Only export automobiles that changed at or after this time,
+        including changes to their parts and files.
+    :return: A values() queryset of Automobile rows.
+    """
+    queryset = Automobile.objects.order_by('id').values(*AUTOMOBILE_COLUMNS)
+    if since_id is not None:
+        queryset = queryset.filter(id__gt=since_id)
+    if since is not None:
+        queryset = queryset.filter(
+            Q(updated_at__gte=since)
+            | Exists(Part.objects.filter(automobile=OuterRef('pk'), updated_at__gte=since))
+            | Exists(PartFile.objects.filter(part__automobile=OuterRef('pk'), updated_at__gte=since)))
+    return queryset
+
+
+def iter_deletions(since_id: Optional[int] = None, since: Optional[datetime.datetime] = None) -> Iterator[bytes]:
+    """
+    Streams a tombstone line, ``{"id": <id>, "deleted": true}``, for each
+    automobile deleted at or after ``since``, in ID order.
+
+    :param since_id: Only report automobiles with a greater ID.
+    :param since: The start of the incremental export.
+    :return: An iterator over the encoded lines.
+    """
+    queryset = DeletedAutomobile.objects.filter(deleted_at__gte=since).order_by('automobile_id')
+    if since_id is not None:
+        queryset = queryset.filter(automobile_id__gt=since_id)
+    for automobile_id in queryset.values_list('automobile_id', flat=True).iterator():
+        yield orjson.dumps({'id': automobile_id, 'deleted': True}) + b'\n'
+
+
+def iter_export(since_id: Optional[int] = None, since: Optional[datetime.datetime] = None,
+                request: Optional[HttpRequest] = None, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Streams a catalogue export: the selected automobiles (see
+    export_queryset() and iter_catalogue()), followed in incremental exports
+    by the tombstones of those deleted since (see iter_deletions()).
+
+    :return: An iterator over the encoded lines.
+    """
+    lines = iter_catalogue(export_queryset(since_id, since), request, chunk_size)
+    if since is None:
+        return lines
+    return chain(lines, iter_deletions(since_id, since))
+
+
+def iter_catalogue(queryset: QuerySet, request: Optional[HttpRequest] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Streams automobiles as NDJSON, one line per automobile shaped like
+    AutomobileSerializer's output. Rows are read ``chunk_size`` at a time
+    (see iter_chunks()), and the parts and files of each chunk are fetched
+    with two queries, so memory use depends on the chunk size rather than on
+    the size of the catalogue.
+
+    :param queryset: The automobiles to export, see export_queryset().
+    :param request: The current request, used to build absolute file URLs.
+    :param chunk_size: The number of automobiles per chunk, EXPORT_CHUNK_SIZE by default.
+    :return: An iterator over the encoded lines.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    for chunk in iter_chunks(queryset, chunk_size):
+        yield b''.join(orjson.dumps(automobile) + b'\n' for automobile in serialize_automobiles(chunk, request))
+
+
+def iter_chunks(queryset: QuerySet, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Reads a values() queryset ordered by ID in chunks, through a server-side
+    cursor on PostgreSQL. Without server-side cursors (DISABLE_SERVER_SIDE_CURSORS, e.g. behind PgBouncer) the driver
+    would load the whole result at once, so each chunk is then fetched with
+    its own keyset query instead.
+    """
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        rows = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    last_id = None
+    while True:
+        page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]['id']
@@ -0,0 +1,109 @@
+from typing import Dict, Optional
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+FieldTree = Dict[str, 'FieldTree']
+
+
+def parse_field_paths(value: str) -> FieldTree:
+    """
+    Parses a comma-separated list of dotted field paths into a tree, e.g.
+    ``"id,parts.name,parts.files"`` into ``{'id': {}, 'parts': {'name': {}, 'files': {}}}``.
+
+    :param value: The query parameter value.
+    :return: A nested dictionary keyed by field name.
+    """
+    tree: FieldTree = {}
+    for path in value.split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class FieldSelection:
+    """
+    The fields rendered for one level of a serializer tree, as requested with
+    the ``fields=`` and ``expand=`` query parameters.
+
+    ``fields`` lists the fields to render as dotted paths; ``parts.name``
+    renders only the name of each part. ``expand`` lists the nested relations
+    to render, e.g. ``expand=parts`` renders parts without their files.
+    Without ``expand`` every relation is rendered, and a relation named in a
+    dotted ``fields`` path is always rendered. Either parameter may be omitted,
+    in which case nothing is pruned on its account.
+    """
+
+    def __init__(self, fields: Optional[FieldTree] = None, expand: Optional[FieldTree] = None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request: Request) -> 'FieldSelection':
+        fields = request.query_params.get(FIELDS_QUERY_PARAM)
+        expand = request.query_params.get(EXPAND_QUERY_PARAM)
+        return cls(None if fields is None else parse_field_paths(fields),
+                   None if expand is None else parse_field_paths(expand))
+
+    @property
+    def is_empty(self) -> bool:
+        return self.fields is None and self.expand is None
+
+    def nested(self, name: str) -> Optional['FieldSelection']:
+        """
+        Returns the selection for the nested serializer of a relation, or None
+        if the relation is not rendered at all.
+        """
+        fields = None if self.fields is None else self.fields[name] or None
+        if self.expand is None:
+            return FieldSelection(fields, None)
+        if name in self.expand:
+            return FieldSelection(fields, self.expand[name])
+        if fields is not None:
+            return FieldSelection(fields, {})
+        return None
+
+    def prune(self, serializer: serializers.BaseSerializer, path: str = '') -> None:
+        """
+        Removes the fields that are not selected from a serializer and its
+        nested serializers, so that neither rendering nor query planning
+        touches them.
+
+        :param serializer: A serializer instance, possibly with many=True.
+        :param path: The dotted path of the serializer, used in error messages.
+        :raises ValidationError: If the selection names a field the serializer
+            does not have, or expands a field that is not a relation.
+        """
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        fields = serializer.fields
+
+        for name in (self.fields or {}).keys() - fields.keys():
+            raise ValidationError({FIELDS_QUERY_PARAM: [f"Unknown field '{path}{name}'."]})
+        for name in (self.expand or {}).keys():
+            field = fields.get(name)
+            if field is None:
+                raise ValidationError({EXPAND_QUERY_PARAM: [f"Unknown field '{path}{name}'."]})
+            if not isinstance(getattr(field, 'child', field), serializers.BaseSerializer):
+                raise ValidationError({EXPAND_QUERY_PARAM: [f"'{path}{name}' is not an expandable relation."]})
+
+        for name, field in list(fields.items()):
+            if self.fields is not None and name not in self.fields:
+                del fields[name]
+                continue
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, serializers.BaseSerializer):
+                if self.fields and self.fields[name]:
+                    raise ValidationError({FIELDS_QUERY_PARAM: [f"'{path}{name}' has no nested fields."]})
+                continue
+            selection = self.nested(name)
+            if selection is None:
+                del fields[name]
+            elif not selection.is_empty:
+                selection.prune(nested, f"{path}{name}.")
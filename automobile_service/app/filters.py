@@ -0,0 +1,95 @@
+from functools import reduce
+from operator import and_, or_
+from typing import Callable, Iterable, List, Optional
+
+from django.db.models import Q, QuerySet
+from django.http import QueryDict
+
+from .models import Part
+
+SEARCH_QUERY_PARAM = 'search'
+SEARCH_PREFIX_QUERY_PARAM = 'search_prefix'
+
+AUTOMOBILE_FIELDS = ('manufacturer', 'type', 'model')
+PART_FIELDS = ('name',)
+
+
+def search_terms(query_params: QueryDict, param: str = SEARCH_QUERY_PARAM) -> List[str]:
+    return query_params.get(param, '').split()
+
+
+def exact_filters(query_params: QueryDict, fields: Iterable[str]) -> Q:
+    """
+    Builds the exact-match filters of a request, e.g. ``?manufacturer=Volvo``.
+    A field given several times matches any of its values. Exact matches use
+    the fields' B-tree indexes.
+
+    :param query_params: The request's query parameters.
+    :param fields: The filterable field names.
+    :return: A Q object, empty if no filter is given.
+    """
+    conditions = [Q(**{f"{field}__in": query_params.getlist(field)}) for field in fields if field in query_params]
+    return reduce(and_, conditions, Q())
+
+
+def search_filter(terms: Iterable[str], fields: Iterable[str], related: Optional[Callable[[str, str], Q]] = None,
+                  lookup: str = 'icontains') -> Q:
+    """
+    Builds a case-insensitive search: every term must occur in one of the
+    fields (``icontains``), or start one of them (``istartswith``), or
+    satisfy the ``related`` condition built for it. On PostgreSQL substring
+    lookups use the trigram indexes of migration 0006 and prefix lookups the
+    pattern indexes of migration 0010; other databases scan.
+
+    :param terms: The search terms.
+    :param fields: The searched field names.
+    :param related: Optionally builds an extra condition for a term and lookup, e.g. on related rows.
+    :param lookup: 'icontains' or 'istartswith'.
+    :return: A Q object, empty if there are no terms.
+    """
+    fields = list(fields)
+    conditions = []
+    for term in terms:
+        matches = [Q(**{f"{field}__{lookup}": term}) for field in fields]
+        if related is not None:
+            matches.append(related(term, lookup))
+        conditions.append(reduce(or_, matches))
+    return reduce(and_, conditions, Q())
+
+
+def filter_automobiles(queryset: QuerySet, query_params: QueryDict) -> QuerySet:
+    """
+    Applies the automobile filters of a request: exact ``manufacturer``,
+    ``type`` and ``model`` filters, and a ``search`` (substrings) and
+    ``search_prefix`` (prefixes) over those fields and the names of the
+    automobile's parts. Part names are matched with an uncorrelated
+    ``id IN (SELECT automobile_id ...)`` subquery, which the database runs
+    once on the part name index rather than once per automobile.
+
+    :param queryset: An Automobile queryset.
+    :param query_params: The request's query parameters.
+    :return: The filtered queryset.
+    """
+    def part_name_matches(term: str, lookup: str) -> Q:
+        return Q(id__in=Part.objects.filter(**{f"name__{lookup}": term}).values('automobile_id'))
+
+    return queryset.filter(
+        exact_filters(query_params, AUTOMOBILE_FIELDS),
+        search_filter(search_terms(query_params), AUTOMOBILE_FIELDS, part_name_matches),
+        search_filter(search_terms(query_params, SEARCH_PREFIX_QUERY_PARAM), AUTOMOBILE_FIELDS, part_name_matches,
+                      lookup='istartswith'))
+
+
+def filter_parts(queryset: QuerySet, query_params: QueryDict) -> QuerySet:
+    """
+    Applies the part filters of a request: an exact ``name`` filter, and a
+    ``search`` and ``search_prefix`` over part names.
+
+    :param queryset: A Part queryset.
+    :param query_params: The request's query parameters.
+    :return: The filtered queryset.
+    """
+    return queryset.filter(exact_filters(query_params, PART_FIELDS),
+                           search_filter(search_terms(query_params), PART_FIELDS),
+                           search_filter(search_terms(query_params, SEARCH_PREFIX_QUERY_PARAM), PART_FIELDS,
+                                         lookup='istartswith'))
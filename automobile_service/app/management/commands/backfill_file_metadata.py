@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from django.core.management.base import BaseCommand
+
+from app.models import PartFile
+
+METADATA_FIELDS = ['size', 'checksum', 'content_type', 'uploaded_at']
+
+
+class Command(BaseCommand):
+    help = ("Records the size, checksum, content type and upload time of PartFiles stored before these were "
+            "kept, in batches. Checksums are taken from content-addressed blob names; other files are read "
+            "in chunks. Files missing from storage are reported and left as they are.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="PartFiles updated per query (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        storage = PartFile._meta.get_field('file').storage
+        updated = missing = 0
+        last_id = 0
+        started = time.perf_counter()
+        while True:
+            batch = list(PartFile.objects.filter(size__isnull=True, id__gt=last_id).order_by('id')
+                         .only('id', 'file', 'file_name', 'uploaded_at')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            blobs: Dict[str, Optional[Tuple[int, str, datetime]]] = {}
+            part_files = []
+            for part_file in batch:
+                name = part_file.file.name
+                if name not in blobs:
+                    blobs[name] = self.inspect(storage, name)
+                if blobs[name] is None:
+                    missing += 1
+                    self.stderr.write(f"PartFile {part_file.id}: {name} is missing from storage.")
+                    continue
+                size, checksum, modified = blobs[name]
+                part_file.uploaded_at = part_file.uploaded_at or modified
+                part_file.set_file_metadata(size, checksum)
+                part_files.append(part_file)
+
+            PartFile.objects.bulk_update(part_files, METADATA_FIELDS)
+            updated += len(part_files)
+            self.stdout.write(f"Backfilled PartFiles up to ID {last_id}: {updated} so far.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {updated} PartFile(s) in {time.perf_counter() - started:.2f}s, "
+            f"{missing} missing from storage."))
+
+    @staticmethod
+    def inspect(storage, name: str) -> Optional[Tuple[int, str, datetime]]:
+        """
+        Returns the size, SHA-256 and modification time of a stored file,
+        reading it only if its name is not a content hash.
+
+        :return: The metadata, or None if the file does not exist.
+        """
+        try:
+            size = storage.size(name)
+            modified = storage.get_modified_time(name)
+            checksum = storage.blob_digest(name)
+            if checksum is None:
+                with storage.open(name, 'rb') as content:
+                    checksum = storage.content_hash(content)
+        except FileNotFoundError:
+            return None
+        return size, checksum, modified
@@ -0,0 +1,96 @@
+import json
+import platform
+import subprocess
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from benchmarks.connections import measure_connection_reuse
+from benchmarks.runner import DEFAULT_SCALES, SCENARIOS, Target, compare, run_suite
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = ("Benchmarks the API against synthetic fleets seeded into a throwaway test database, "
+            "and optionally compares the results with a baseline run.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(map(str, DEFAULT_SCALES)),
+                            help="Comma-separated fleet sizes in automobiles (default: %(default)s).")
+        parser.add_argument('--iterations', type=int, default=30,
+                            help="Timed requests per scenario and scale (default: %(default)s).")
+        parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                            help="Only run this scenario; may be repeated.")
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--baseline', help="Compare with the results of an earlier run and fail on regressions.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Tolerated relative slowdown or memory growth (default: %(default)s).")
+        parser.add_argument('--connections', action='store_true',
+                            help="Also compare get_automobile latency with a new database connection per "
+                                 "request and with persistent connections (DB_CONN_MAX_AGE).")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options['scales'].split(',')]
+        except ValueError:
+            raise CommandError("--scales must be a comma-separated list of integers.")
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                results = run_suite(scales, options['iterations'], options['scenario'], options['seed'],
+                                    report=self.stdout.write)
+                connection_results = None
+                if options['connections']:
+                    self.stdout.write("Connection reuse, get_automobile through the WSGI handler:")
+                    connection_results = measure_connection_reuse(
+                        reverse('get_automobile', args=[Target.latest().automobile_id]), options['iterations'],
+                        {'per_request': 0, 'persistent': settings.DB_CONN_MAX_AGE}, report=self.stdout.write)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'revision': git_revision(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        if connection_results is not None:
+            report['connections'] = connection_results
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(report, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline['results'], options['threshold'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}."))
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.export import export_watermark, iter_export
+
+
+class Command(BaseCommand):
+    help = ("Exports automobiles with their parts and files as NDJSON, either all of them or those "
+            "created or changed since a given ID or time, followed by the IDs of those deleted since.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since-id', type=int,
+                            help="Only export automobiles with a greater ID.")
+        parser.add_argument('--since',
+                            help="Only export automobiles changed at or after this ISO 8601 time.")
+        parser.add_argument('--output',
+                            help="Write the export to this file instead of standard output.")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help="Automobiles read per database round trip (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 date and time.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        started_at = timezone.now()
+        lines = iter_export(options['since_id'], since, chunk_size=options['chunk_size'])
+        count = 0
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in lines:
+                    output.write(chunk)
+                    count += chunk.count(b'\n')
+        else:
+            for chunk in lines:
+                self.stdout.write(chunk.decode(), ending='')
+                count += chunk.count(b'\n')
+
+        self.stderr.write(f"Exported {count} line(s). Continue with --since {export_watermark(started_at).isoformat()}")
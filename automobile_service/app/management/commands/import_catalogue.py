@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.catalogue_import import (
+    CSV_FORMAT, NDJSON_FORMAT, CatalogueImporter, ImportStats, ManifestError, batched, manifest_format,
+    read_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = ("Imports automobiles, parts and files from a CSV or NDJSON manifest and a directory of files, "
+            "in batches.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifest', help="The manifest, a .csv, .ndjson or .jsonl file.")
+        parser.add_argument('--files',
+                            help="The directory manifest file paths are relative to (default: the manifest's).")
+        parser.add_argument('--format', choices=[CSV_FORMAT, NDJSON_FORMAT],
+                            help="The manifest format, by default guessed from its extension.")
+        parser.add_argument('--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+                            help="Manifest rows imported per transaction (default: %(default)s).")
+        parser.add_argument('--workers', type=int, default=settings.IMPORT_WORKERS,
+                            help="Threads copying files (default: %(default)s).")
+        parser.add_argument('--notify-base-url',
+                            help="Queue one aggregated upload notification per batch, linking files under this "
+                                 "URL (e.g. https://example.com). Notifications are suppressed by default.")
+
+    def handle(self, *args, **options):
+        manifest = options['manifest']
+        if not os.path.isfile(manifest):
+            raise CommandError(f"{manifest} does not exist.")
+        try:
+            format = options['format'] or manifest_format(manifest)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        files_dir = options['files'] or os.path.dirname(os.path.abspath(manifest))
+
+        total = ImportStats()
+        started = time.perf_counter()
+        try:
+            with CatalogueImporter(files_dir, options['workers'], options['notify_base_url']) as importer:
+                for batch in batched(read_manifest(manifest, format), options['batch_size']):
+                    batch_started = time.perf_counter()
+                    stats = importer.import_batch(batch)
+                    total.add(stats)
+                    self.stdout.write(
+                        f"Imported lines up to {batch[-1][0]}: {stats.rows} rows, {stats.files} files "
+                        f"in {time.perf_counter() - batch_started:.2f}s")
+        except (ManifestError, OSError) as exc:
+            raise CommandError(f"{exc} Batches before it were imported; the import can be run again.")
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total.rows} rows in {elapsed:.2f}s ({total.rows / elapsed:.0f} rows/s, "
+            f"{total.bytes / elapsed / 2 ** 20:.1f} MiB/s of files): {total.automobiles} automobile(s), "
+            f"{total.parts} part(s) and {total.files} file(s) created, {total.existing_files} file(s) already present."))
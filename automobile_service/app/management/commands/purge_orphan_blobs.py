@@ -0,0 +1,44 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from app.models import PartFile
+
+
+class Command(BaseCommand):
+    help = ("Deletes stored blobs that no PartFile references, once they have not been saved or reused for "
+            "BLOB_RELEASE_GRACE_PERIOD seconds. Deleting a PartFile releases its blob right away unless it was "
+            "used within that period; this collects the rest.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Blob names checked per query (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        field = PartFile._meta.get_field('file')
+        storage = field.storage
+        names = []
+        released = 0
+        for name in self.blob_names(storage, field.upload_to):
+            names.append(name)
+            if len(names) >= options['batch_size']:
+                released += self.release(storage, names)
+                names = []
+        released += self.release(storage, names)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {released} orphaned blob(s)."))
+
+    @staticmethod
+    def blob_names(storage, directory: str):
+        if not storage.exists(directory):
+            return
+        for prefix in storage.listdir(directory)[0]:
+            for filename in storage.listdir(os.path.join(directory, prefix))[1]:
+                name = os.path.join(directory, prefix, filename)
+                if storage.blob_digest(name):
+                    yield name
+
+    @staticmethod
+    def release(storage, names) -> int:
+        referenced = set(PartFile.objects.filter(file__in=names).values_list('file', flat=True))
+        return sum(storage.release(name, PartFile.objects.filter(file=name).exists)
+                   for name in names if name not in referenced)
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.outbox import relay_outbox
+
+
+class Command(BaseCommand):
+    help = "Publishes queued outbox messages to the Celery broker in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Publish what is queued and exit instead of polling.")
+        parser.add_argument('--interval', type=float, default=settings.OUTBOX_RELAY_INTERVAL,
+                            help="Seconds to wait when the outbox is empty or the broker is unavailable.")
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_RELAY_BATCH_SIZE,
+                            help="Maximum number of messages published per batch.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            close_old_connections()
+            try:
+                published = relay_outbox(batch_size)
+            except Exception as exc:
+                if options['once']:
+                    raise
+                self.stderr.write(f"Publishing outbox messages failed, retrying: {exc}")
+                time.sleep(options['interval'])
+                continue
+
+            if options['once']:
+                if published == batch_size:
+                    continue
+                self.stdout.write(self.style.SUCCESS("Outbox is empty."))
+                return
+            if published < batch_size:
+                time.sleep(options['interval'])
@@ -0,0 +1,228 @@
+import os
+import time
+from contextvars import ContextVar
+from ipaddress import ip_address, ip_network
+from typing import AsyncIterator, Iterable, Iterator, Optional
+
+from asgiref.sync import iscoroutinefunction
+from celery.signals import before_task_publish, worker_ready
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import FileResponse, HttpRequest, HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest,
+                               start_http_server)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = tuple(1024 * 4 ** exponent for exponent in range(11))  # 1 KiB to 1 GiB
+
+UNMATCHED_VIEW = 'unmatched'
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', "Time until a view returned its response.",
+    ['view', 'method', 'status'], buckets=DURATION_BUCKETS)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', "Database queries run while handling a request.",
+    ['view'], buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', "Time spent in database queries while handling a request.",
+    ['view'], buckets=DURATION_BUCKETS)
+REQUEST_SERIALIZATION_DURATION = Histogram(
+    'http_request_serialization_seconds', "Time spent rendering response data while handling a request.",
+    ['view'], buckets=DURATION_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    'http_response_bytes', "Size of response bodies, including streamed ones.",
+    ['view'], buckets=SIZE_BUCKETS)
+ARCHIVE_BUILD_DURATION = Histogram(
+    'archive_build_seconds', "Time spent producing a ZIP archive, excluding time waiting for the client.",
+    ['scope'], buckets=DURATION_BUCKETS)
+
+
+class RequestMetrics:
+    """
+    Accumulates the cost of the request being handled. The middleware binds
+    one to the request's context, so code running on its behalf, including
+    sync_to_async worker threads, records into it.
+    """
+
+    __slots__ = ('queries', 'db_time', 'serialization_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+
+
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper that times the queries of instrumented requests.
+    """
+    metrics = _current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_serialization(seconds: float) -> None:
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.serialization_time += seconds
+
+
+def observe_archive_build(scope: str, seconds: float) -> None:
+    ARCHIVE_BUILD_DURATION.labels(scope).observe(seconds)
+
+
+@receiver(before_task_publish)
+def stamp_publish_time(sender=None, headers=None, **kwargs):
+    """
+    Records when a task was published, so workers can measure how long it queued.
+    """
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+def view_label(request: HttpRequest) -> str:
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match is not None else UNMATCHED_VIEW
+
+
+def _count_bytes(chunks: Iterable[bytes], view: str) -> Iterator[bytes]:
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.labels(view).observe(size)
+
+
+async def _acount_bytes(chunks: AsyncIterator[bytes], view: str) -> AsyncIterator[bytes]:
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.labels(view).observe(size)
+
+
+def observe_response(request: HttpRequest, response: HttpResponse, metrics: RequestMetrics, duration: float) -> None:
+    """
+    Records the metrics of a handled request. Streamed bodies are counted as
+    they are sent; file responses of known length are not wrapped, so they
+    keep being served with the server's file wrapper (sendfile).
+
+    :param request: The handled request.
+    :param response: The response returned by the view.
+    :param metrics: What was accumulated while handling the request.
+    :param duration: The time until the response was returned, in seconds.
+    """
+    view = view_label(request)
+    REQUEST_DURATION.labels(view, request.method, str(response.status_code)).observe(duration)
+    REQUEST_DB_QUERIES.labels(view).observe(metrics.queries)
+    REQUEST_DB_DURATION.labels(view).observe(metrics.db_time)
+    REQUEST_SERIALIZATION_DURATION.labels(view).observe(metrics.serialization_time)
+
+    if not response.streaming:
+        RESPONSE_BYTES.labels(view).observe(len(response.content))
+    elif isinstance(response, FileResponse) and response.has_header('Content-Length'):
+        RESPONSE_BYTES.labels(view).observe(int(response['Content-Length']))
+    elif response.is_async:
+        response.streaming_content = _acount_bytes(response.streaming_content, view)
+    else:
+        response.streaming_content = _count_bytes(response.streaming_content, view)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """
+    Records per-view request duration, database queries and time, rendering
+    time and response size.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            metrics = RequestMetrics()
+            token = _current_request.set(metrics)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current_request.reset(token)
+            observe_response(request, response, metrics, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            metrics = RequestMetrics()
+            token = _current_request.set(metrics)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current_request.reset(token)
+            observe_response(request, response, metrics, time.perf_counter() - started)
+            return response
+    return middleware
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Returns the registry to expose: the process's own metrics, or those of
+    every process sharing PROMETHEUS_MULTIPROC_DIR (e.g. gunicorn workers).
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+@receiver(worker_ready)
+def start_worker_exporter(sender=None, **kwargs):
+    """
+    Serves a Celery worker's metrics on WORKER_METRICS_PORT, as workers have
+    no HTTP endpoint of their own. With a prefork pool, PROMETHEUS_MULTIPROC_DIR
+    must be set for the metrics of the pool processes to be included.
+    """
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+
+
+# metrics_allowed() and metrics_view() are kept identical to those of the other
+# service (email_app/metrics.py); the services are built and deployed separately.
+def metrics_allowed(request: HttpRequest) -> bool:
+    """
+    Tells whether the client's address is in METRICS_ALLOWED_IPS.
+    """
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Exposes the metrics in the Prometheus text format to the addresses in
+    METRICS_ALLOWED_IPS.
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-17 23:43
+
+import os
+
+import app.storage
+from django.db import migrations, models
+
+
+def backfill_file_names(apps, schema_editor):
+    PartFile = apps.get_model('app', 'PartFile')
+    for part_file in PartFile.objects.filter(file_name='').only('id', 'file').iterator():
+        part_file.file_name = os.path.basename(part_file.file.name)
+        part_file.save(update_fields=['file_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partfile',
+            name='file_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='partfile',
+            name='file',
+            field=models.FileField(db_index=True, storage=app.storage.ContentAddressedStorage(), upload_to='part_files/'),
+        ),
+        migrations.RunPython(backfill_file_names, migrations.RunPython.noop),
+    ]
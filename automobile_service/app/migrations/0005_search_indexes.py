@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_outbox_message'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='automobile',
+            name='manufacturer',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='automobile',
+            name='model',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='automobile',
+            name='type',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='part',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
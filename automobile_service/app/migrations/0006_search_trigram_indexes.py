@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Trigram GIN indexes on UPPER(column), the expression Django's icontains
+# lookups compare on PostgreSQL, so substring searches do not scan the table.
+TRIGRAM_INDEXES = [
+    ('app_automobile_manufacturer_trgm', 'app_automobile', 'manufacturer'),
+    ('app_automobile_model_trgm', 'app_automobile', 'model'),
+    ('app_automobile_type_trgm', 'app_automobile', 'type'),
+    ('app_part_name_trgm', 'app_part', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}") gin_trgm_ops)')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('app', '0005_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_part_file_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedAutomobile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('automobile_id', models.PositiveBigIntegerField(unique=True)),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
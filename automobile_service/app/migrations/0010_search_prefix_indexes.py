@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# B-tree pattern indexes on UPPER(column), the expression Django's istartswith
+# lookups compare on PostgreSQL (UPPER(column::text) LIKE 'TERM%'). The
+# varchar_pattern_ops indexes Django adds next to those of migration 0005 only
+# serve case-sensitive prefixes; UPPER() returns text, hence text_pattern_ops.
+PREFIX_INDEXES = [
+    ('app_automobile_manufacturer_prefix', 'app_automobile', 'manufacturer'),
+    ('app_automobile_model_prefix', 'app_automobile', 'model'),
+    ('app_automobile_type_prefix', 'app_automobile', 'type'),
+    ('app_part_name_prefix', 'app_part', 'name'),
+]
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}") text_pattern_ops)')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('app', '0009_deleted_automobile'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
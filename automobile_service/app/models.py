@@ -1,10 +1,20 @@
+import mimetypes
+import os
+import uuid
+from typing import Optional
+
+from django.core.files.base import File
 from django.db import models
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 
 class Automobile(models.Model):
-    manufacturer = models.CharField(max_length=100)
-    type = models.CharField(max_length=100)
-    model = models.CharField(max_length=100)
+    manufacturer = models.CharField(max_length=100, db_index=True)
+    type = models.CharField(max_length=100, db_index=True)
+    model = models.CharField(max_length=100, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.manufacturer} {self.model}"
@@ -12,7 +22,8 @@ class Automobile(models.Model):
 
 class Part(models.Model):
     automobile = models.ForeignKey(Automobile, related_name='parts', on_delete=models.CASCADE)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.name} of {self.automobile}"
@@ -20,7 +31,101 @@ class Part(models.Model):
 
 class PartFile(models.Model):
     part = models.ForeignKey(Part, related_name='files', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='part_files/')
+    file = models.FileField(upload_to='part_files/', storage=ContentAddressedStorage(), db_index=True)
+    file_name = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    checksum = models.CharField(max_length=64, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    uploaded_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"File for {self.part.name}"
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.store_file(self.file.name, self.file.file)
+        if not self.file_name and self.file:
+            self.file_name = os.path.basename(self.file.name)
+        super().save(*args, **kwargs)
+
+    def store_file(self, name: str, content: File) -> Optional[int]:
+        """
+        Writes the content to storage and records its metadata without reading
+        it again: the checksum is the SHA-256 the storage computed to name the
+        blob, and the size is that of the uploaded content.
+
+        :param name: The name of the uploaded file.
+        :param content: The uploaded file.
+        :return: The blob's modification time if it was written, or None if
+            identical content was already stored (see ContentAddressedStorage.save_blob()).
+        """
+        # Read first: a temporary upload is moved into place, after which its size is gone.
+        size = content.size
+        self.file_name = self.file_name or os.path.basename(name)
+        self.file.name, written_at = self.file.storage.save_blob(self.file.field.generate_filename(self, name),
+                                                                 content)
+        self.file._committed = True
+        self.set_file_metadata(size)
+        return written_at
+
+    def set_file_metadata(self, size: int, checksum: str = '') -> None:
+        """
+        Records the size, checksum, content type and upload time of the stored
+        file. The checksum defaults to the digest in the blob name.
+
+        :param size: The size of the file in bytes.
+        :param checksum: The SHA-256 of the file, for files stored under another name.
+        """
+        self.size = size
+        self.checksum = checksum or self.file.storage.blob_digest(self.file.name) or ''
+        self.content_type = mimetypes.guess_type(self.file_name)[0] or 'application/octet-stream'
+        self.uploaded_at = self.uploaded_at or timezone.now()
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload of one file to a part. Chunks are stored on
+    disk under UPLOAD_SESSION_LOCATION until the session is completed into a
+    PartFile.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    part = models.ForeignKey(Part, related_name='upload_sessions', on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    part_file = models.ForeignKey(PartFile, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Upload of {self.file_name} for {self.part.name}"
+
+
+class DeletedAutomobile(models.Model):
+    """
+    A tombstone recorded when an automobile is deleted, so incremental
+    catalogue exports can report the deletion.
+    """
+
+    automobile_id = models.PositiveBigIntegerField(unique=True)
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Deleted automobile {self.automobile_id}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A Celery task to publish, recorded in the same transaction as the change
+    that triggers it and sent to the broker by the outbox relay. The
+    message_id is used as the Celery task ID, so consumers can recognise a
+    message that was published more than once.
+    """
+
+    message_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.task_name} ({self.message_id})"
@@ -0,0 +1,50 @@
+from typing import Any, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from automobile_service.celery import app as celery_app
+from .models import OutboxMessage
+
+
+def enqueue_task(task_name: str, args: List[Any]) -> OutboxMessage:
+    """
+    Records a Celery task in the outbox instead of publishing it. Call it inside
+    the transaction that makes the change the task is about: the message is
+    then committed if and only if the change is, and the request never waits
+    for the broker.
+
+    :param task_name: The registered name of the Celery task.
+    :param args: The JSON-serializable positional arguments of the task.
+    :return: The created OutboxMessage.
+    """
+    return OutboxMessage.objects.create(task_name=task_name, args=args)
+
+
+def relay_outbox(batch_size: Optional[int] = None) -> int:
+    """
+    Publishes the oldest batch of outbox messages to the broker over a single
+    producer connection, and deletes them once published.
+
+    Rows are locked with SKIP LOCKED, so several relays can run side by side.
+    If publishing fails part-way, the transaction rolls back and the whole
+    batch is published again later. Delivery is therefore at-least-once, and
+    consumers deduplicate by task ID.
+
+    :param batch_size: The maximum number of messages to publish, defaulting
+        to OUTBOX_RELAY_BATCH_SIZE.
+    :return: The number of messages published.
+    """
+    batch_size = batch_size or settings.OUTBOX_RELAY_BATCH_SIZE
+    with transaction.atomic():
+        messages = list(OutboxMessage.objects.select_for_update(skip_locked=True).order_by('id')[:batch_size])
+        if not messages:
+            return 0
+
+        with celery_app.producer_or_acquire() as producer:
+            for message in messages:
+                celery_app.send_task(message.task_name, args=message.args, task_id=str(message.message_id),
+                                     producer=producer)
+
+        OutboxMessage.objects.filter(id__in=[message.id for message in messages]).delete()
+    return len(messages)
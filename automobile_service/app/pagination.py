@@ -0,0 +1,58 @@
+from typing import Any, List, Optional
+
+from django.db.models import QuerySet
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class IdCursorPagination(CursorPagination):
+    """
+    Keyset pagination ordered by primary key. Each page is fetched with a
+    ``WHERE id > <cursor> ORDER BY id LIMIT n`` query, so deep pages cost the same
+    as the first one and no ``COUNT(*)`` is ever issued.
+
+    Clients may request a smaller or larger page with ``?page_size=``, capped at
+    ``max_page_size``.
+    """
+
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PaginationMixin:
+    """
+    Adds GenericAPIView-style pagination helpers to a plain APIView.
+    """
+
+    pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+
+    @property
+    def paginator(self) -> Optional[BasePagination]:
+        """
+        The paginator instance associated with the view, or None.
+        """
+        if not hasattr(self, '_paginator'):
+            self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+
+    def paginate_queryset(self, queryset: QuerySet) -> Optional[List[Any]]:
+        """
+        Returns a single page of results, or None if pagination is disabled.
+
+        :param queryset: The ordered-or-not queryset to paginate.
+        :return: A list of objects for the requested page, or None.
+        """
+        if self.paginator is None:
+            return None
+        return self.paginator.paginate_queryset(queryset, self.request, view=self)
+
+    def get_paginated_response(self, data: Any) -> Response:
+        """
+        Returns a paginated Response for the given serialized page data.
+
+        :param data: The serialized page of results.
+        :return: A Response including the pagination links.
+        """
+        return self.paginator.get_paginated_response(data)
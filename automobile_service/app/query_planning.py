@@ -0,0 +1,138 @@
+from typing import Iterable, List, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+
+from .fieldsets import FieldSelection
+
+
+def _collect_plan(model: type, serializer: serializers.BaseSerializer,
+                  prefix: str = '') -> Tuple[List[str], List[str], List[Prefetch]]:
+    """
+    Walks the fields of a serializer and works out which columns, joins and
+    prefetches are needed to render it for instances of the given model.
+
+    Declared fields whose source is not a model field (e.g. computed
+    SerializerMethodFields) are skipped; if such a field reads a deferred
+    column it will trigger an extra query per object.
+
+    :param model: The model class the serializer renders.
+    :param serializer: A serializer instance whose fields are inspected.
+    :param prefix: The lookup prefix when the model is reached through select_related.
+    :return: A tuple of (only() fields, select_related() lookups, Prefetch objects).
+    """
+    only = [prefix + model._meta.pk.attname]
+    select_related = []
+    prefetches = []
+
+    for field_name, field in serializer.fields.items():
+        source = field_name if field.source == '*' else field.source
+        try:
+            model_field = model._meta.get_field(source.split('.')[0])
+        except FieldDoesNotExist:
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        lookup = prefix + model_field.name
+
+        if not model_field.is_relation:
+            only.append(prefix + model_field.attname)
+        elif model_field.concrete and not model_field.many_to_many:
+            if isinstance(nested, serializers.BaseSerializer):
+                only.append(lookup)
+                select_related.append(lookup)
+                nested_only, nested_select, nested_prefetches = _collect_plan(
+                    model_field.related_model, nested, prefix=lookup + '__')
+                only.extend(nested_only)
+                select_related.extend(nested_select)
+                prefetches.extend(nested_prefetches)
+            else:
+                only.append(prefix + model_field.attname)
+        else:
+            extra_fields = []
+            if model_field.one_to_many or model_field.one_to_one:
+                # The reverse side needs its foreign key to attach rows to their parent.
+                extra_fields.append(model_field.field.attname)
+            related_queryset = model_field.related_model._default_manager.all()
+            if not related_queryset.ordered:
+                # A stable order, shared with the values()-based listings in fast_serializers.
+                related_queryset = related_queryset.order_by(model_field.related_model._meta.pk.name)
+            if isinstance(nested, serializers.BaseSerializer):
+                related_queryset = _apply_plan(related_queryset, nested, extra_fields)
+            else:
+                related_queryset = related_queryset.only(
+                    model_field.related_model._meta.pk.attname, *extra_fields)
+            prefetches.append(Prefetch(lookup, queryset=related_queryset))
+
+    return only, select_related, prefetches
+
+
+def _apply_plan(queryset: QuerySet, serializer: serializers.BaseSerializer,
+                extra_fields: Iterable[str] = ()) -> QuerySet:
+    only, select_related, prefetches = _collect_plan(queryset.model, serializer)
+    queryset = queryset.only(*only, *extra_fields)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def plan_queryset(queryset: QuerySet, serializer) -> QuerySet:
+    """
+    Returns a copy of the queryset that loads exactly what the serializer needs:
+    forward relations rendered by nested serializers are joined with
+    select_related, reverse and many-to-many relations are prefetched with
+    their own planned querysets, and every level is restricted with only().
+
+    The number of queries needed to serialize the result is therefore fixed by
+    the depth of the serializer tree rather than by the number of rows.
+
+    :param queryset: The base queryset, e.g. ``Automobile.objects.all()``.
+    :param serializer: The serializer class used to render the queryset, or an
+        instance whose fields have been pruned (see FieldSelection).
+    :return: A QuerySet with only(), select_related() and prefetch_related() applied.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    return _apply_plan(queryset, serializer)
+
+
+class QueryPlanMixin:
+    """
+    View mixin that plans ``queryset`` against ``serializer_class`` so that
+    nested serializers never issue per-object queries. The serializer tree is
+    pruned to the request's ``fields=`` and ``expand=`` parameters first, so
+    unrequested columns and relations are never loaded.
+    """
+
+    queryset: QuerySet = None
+    serializer_class: type = None
+
+    def get_field_selection(self) -> FieldSelection:
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = FieldSelection.from_request(self.request)
+        return self._field_selection
+
+    def get_serializer(self, *args, **kwargs) -> serializers.BaseSerializer:
+        """
+        Returns a ``serializer_class`` instance pruned to the request's field selection.
+
+        :raises ValidationError: If the selection names unknown fields.
+        """
+        serializer = self.serializer_class(*args, **kwargs)
+        selection = self.get_field_selection()
+        if not selection.is_empty:
+            selection.prune(serializer)
+        return serializer
+
+    def get_queryset(self) -> QuerySet:
+        """
+        Returns the view's queryset with the serializer-driven query plan applied.
+
+        :return: A planned QuerySet ready to be filtered and serialized.
+        """
+        return plan_queryset(self.queryset.all(), self.get_serializer())
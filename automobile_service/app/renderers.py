@@ -0,0 +1,46 @@
+import time
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import record_serialization
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class InstrumentedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that records its rendering time in the request's metrics.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        started = time.perf_counter()
+        try:
+            return self.encode(data, accepted_media_type, renderer_context)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class ORJSONRenderer(InstrumentedJSONRenderer):
+    """
+    Renders compact JSON with orjson. Payloads of strings, integers,
+    booleans, lists and dicts produce the same bytes as JSONRenderer, which
+    is what the listing endpoints using it return; floats may be formatted
+    differently.
+
+    Types orjson would format differently (datetimes, dataclasses) and types
+    it does not know are handed to DRF's encoder, and U+2028/U+2029 are
+    escaped like JSONRenderer does. Indented output, e.g. for the browsable
+    API, is left to JSONRenderer.
+    """
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().encode(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,120 @@
+import hashlib
+import time
+import uuid
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+AUTOMOBILE_LIST_SCOPE = 'automobiles'
+
+
+def automobile_scope(automobile_id: int) -> str:
+    """
+    Returns the cache scope holding an automobile's detail and parts list responses.
+    """
+    return f"automobile-{automobile_id}"
+
+
+class CachedRepresentation(NamedTuple):
+    """
+    A serialized response body together with its validators.
+    """
+
+    data: Any
+    etag: str
+    last_modified: int
+
+
+def get_response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _generation_key(scope: str) -> str:
+    return f"responses:{scope}:generation"
+
+
+def scope_generation(scope: str) -> str:
+    """
+    Returns the current generation of a cache scope. Every entry of a scope is
+    keyed by its generation, so replacing the generation invalidates all of
+    them at once. Generations are random, so an evicted generation never
+    resurrects entries cached under an earlier one.
+
+    :param scope: The cache scope.
+    :return: The scope's generation token.
+    """
+    return get_response_cache().get_or_set(_generation_key(scope), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_scopes(*scopes: str) -> None:
+    """
+    Drops every cached response of the given scopes.
+
+    :param scopes: The cache scopes to invalidate.
+    """
+    get_response_cache().set_many({_generation_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+
+def invalidate_automobile_responses(*automobile_ids: int) -> None:
+    """
+    Drops the cached responses that embed the given automobiles: their detail
+    and parts list responses, and every page of the automobile list.
+
+    :param automobile_ids: The IDs of the changed automobiles.
+    """
+    invalidate_scopes(AUTOMOBILE_LIST_SCOPE, *[automobile_scope(automobile_id) for automobile_id in automobile_ids])
+
+
+def cached_representation(request: HttpRequest, scope: str, render: Callable[[], Any]) -> CachedRepresentation:
+    """
+    Returns the serialized body for a request from the response cache, calling
+    render() and caching its result for RESPONSE_CACHE_TIMEOUT seconds on a miss.
+
+    Entries are keyed by the absolute request URL, as bodies contain absolute
+    links and pagination cursors.
+
+    :param request: The incoming HTTP request.
+    :param scope: The cache scope invalidated when the underlying objects change.
+    :param render: Produces the serialized body; may raise Http404.
+    :return: The cached body and its ETag and Last-Modified validators.
+    """
+    cache = get_response_cache()
+    url_hash = hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    key = f"responses:{scope}:{scope_generation(scope)}:{url_hash}"
+
+    representation = cache.get(key)
+    if representation is None:
+        data = render()
+        representation = CachedRepresentation(
+            data=data,
+            etag=quote_etag(hashlib.sha256(JSONRenderer().render(data)).hexdigest()),
+            last_modified=int(time.time()),
+        )
+        cache.set(key, representation, settings.RESPONSE_CACHE_TIMEOUT)
+    return representation
+
+
+def conditional_response(request: HttpRequest, representation: CachedRepresentation,
+                         respond: Callable[[Any], HttpResponse]) -> HttpResponse:
+    """
+    Answers a conditional request with 304 Not Modified when the client's
+    If-None-Match or If-Modified-Since still matches, or with the full body
+    built by respond() otherwise. Both responses carry ETag and Last-Modified.
+
+    :param request: The incoming HTTP request.
+    :param representation: The cached body and its validators.
+    :param respond: Builds the full response from the body.
+    :return: The HttpResponse to send.
+    """
+    response: Optional[HttpResponse] = get_conditional_response(
+        request, etag=representation.etag, last_modified=representation.last_modified)
+    if response is None:
+        response = respond(representation.data)
+    response['ETag'] = representation.etag
+    response['Last-Modified'] = http_date(representation.last_modified)
+    return response
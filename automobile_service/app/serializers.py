@@ -1,17 +1,22 @@
+from typing import List
+
+from django.conf import settings
 from rest_framework import serializers
-from .models import Automobile, Part, PartFile
+from .models import Automobile, Part, PartFile, UploadSession
+from .uploads import received_chunks, received_size
 
 
 class PartFileSerializer(serializers.ModelSerializer):
     """
-    Serializer for the PartFile model that returns a URL for the 'file' field.
+    Serializer for the PartFile model that returns a URL for the 'file' field,
+    along with the size and content type recorded at upload.
     """
 
     file = serializers.SerializerMethodField()
 
     class Meta:
         model = PartFile
-        fields = ['id', 'file']
+        fields = ['id', 'file', 'size', 'content_type']
 
     def get_file(self, obj: PartFile) -> str:
         """
@@ -59,3 +64,75 @@ class UploadFileContentSerializer(serializers.Serializer):
     """
     file_name = serializers.CharField(required=True)
     content = serializers.CharField(required=True)
+
+
+class BulkUploadItemSerializer(serializers.Serializer):
+    """
+    A serializer for one file of a bulk upload. Each item targets a part and
+    carries either plain text 'content' together with a 'file_name', or an
+    uploaded 'file' whose name is used when 'file_name' is omitted.
+    """
+    part_id = serializers.IntegerField(required=True)
+    file_name = serializers.CharField(required=False)
+    content = serializers.CharField(required=False)
+    file = serializers.FileField(required=False)
+
+    def validate(self, attrs):
+        if ('content' in attrs) == ('file' in attrs):
+            raise serializers.ValidationError("Provide exactly one of 'content' or 'file'.")
+        if 'file' in attrs:
+            attrs.setdefault('file_name', attrs['file'].name)
+        elif 'file_name' not in attrs:
+            raise serializers.ValidationError({'file_name': ["This field is required."]})
+        return attrs
+
+
+class StartUploadSerializer(serializers.Serializer):
+    """
+    A serializer for starting a chunked upload:
+     - file_name: The name of the file.
+     - size: The total size in bytes, at most UPLOAD_MAX_SIZE. It bounds the chunk
+       indexes and is checked when the upload is completed.
+    """
+    file_name = serializers.CharField(required=True, max_length=255)
+    size = serializers.IntegerField(required=True, min_value=1)
+
+    def validate_size(self, value: int) -> int:
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads may be at most {settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the state of a chunked upload, used by clients to resume it.
+    """
+
+    upload_id = serializers.UUIDField(source='id', read_only=True)
+    chunk_max_size = serializers.SerializerMethodField()
+    received_chunks = serializers.SerializerMethodField()
+    received_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['upload_id', 'file_name', 'size', 'chunk_max_size', 'received_chunks', 'received_size',
+                  'part_file']
+
+    def get_chunk_max_size(self, obj: UploadSession) -> int:
+        return settings.UPLOAD_CHUNK_MAX_SIZE
+
+    def get_received_chunks(self, obj: UploadSession) -> List[int]:
+        return received_chunks(obj)
+
+    def get_received_size(self, obj: UploadSession) -> int:
+        return received_size(obj)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of a catalogue export: 'since_id' exports
+    automobiles created after that ID, 'since' (ISO 8601) those changed at or
+    after that time. Both are optional and may be combined.
+    """
+    since_id = serializers.IntegerField(required=False, min_value=0)
+    since = serializers.DateTimeField(required=False)
@@ -0,0 +1,99 @@
+import shutil
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .archives import AUTOMOBILE_SCOPE, PART_SCOPE, invalidate_archives
+from .models import Automobile, DeletedAutomobile, Part, PartFile, UploadSession
+from .response_cache import invalidate_automobile_responses
+from .uploads import upload_session_dir
+
+
+@receiver(post_delete, sender=PartFile)
+def release_part_file_blob(sender, instance: PartFile, **kwargs) -> None:
+    """
+    Deletes a stored blob once the last PartFile referencing it is gone.
+    Blobs are shared between PartFiles with identical content, so the
+    reference count is the number of rows still pointing at the same name.
+    Blobs used too recently to be released here are left to the
+    purge_orphan_blobs command.
+    """
+    name = instance.file.name
+    if not name:
+        return
+    storage = instance.file.storage
+    transaction.on_commit(lambda: storage.release(name, PartFile.objects.filter(file=name).exists))
+
+
+@receiver(post_save, sender=PartFile)
+@receiver(post_delete, sender=PartFile)
+def invalidate_part_file_archives(sender, instance: PartFile, **kwargs) -> None:
+    """
+    Drops the cached ZIP archives of the part and automobile a PartFile
+    belongs to whenever the file set changes.
+    """
+    part = instance.part
+    transaction.on_commit(lambda: (
+        invalidate_archives(PART_SCOPE, part.id),
+        invalidate_archives(AUTOMOBILE_SCOPE, part.automobile_id),
+    ))
+
+
+@receiver(post_save, sender=Automobile)
+@receiver(post_delete, sender=Automobile)
+def invalidate_automobile_cached_responses(sender, instance: Automobile, **kwargs) -> None:
+    """
+    Drops the cached responses embedding an automobile when it changes.
+    """
+    # Django clears the primary key of a deleted instance before the callback runs.
+    automobile_id = instance.id
+    transaction.on_commit(lambda: invalidate_automobile_responses(automobile_id))
+
+
+@receiver(post_save, sender=Part)
+@receiver(post_delete, sender=Part)
+@receiver(post_save, sender=PartFile)
+@receiver(post_delete, sender=PartFile)
+def invalidate_part_cached_responses(sender, instance, **kwargs) -> None:
+    """
+    Drops the cached responses of the automobile owning a changed Part or
+    PartFile, including uploads made through UploadFileView.
+    """
+    part = instance if isinstance(instance, Part) else instance.part
+    automobile_id = part.automobile_id
+    transaction.on_commit(lambda: invalidate_automobile_responses(automobile_id))
+
+
+@receiver(post_delete, sender=Automobile)
+def record_deleted_automobile(sender, instance: Automobile, **kwargs) -> None:
+    """
+    Leaves a tombstone for a deleted automobile, reported by incremental
+    catalogue exports.
+    """
+    DeletedAutomobile.objects.update_or_create(automobile_id=instance.id, defaults={'deleted_at': timezone.now()})
+
+
+@receiver(post_delete, sender=Part)
+@receiver(post_delete, sender=PartFile)
+def touch_automobile(sender, instance, origin=None, **kwargs) -> None:
+    """
+    Marks the automobile owning a deleted Part or PartFile as changed, so
+    incremental catalogue exports include it. Rows deleted along with their
+    automobile or part leave that to the deleted parent.
+    """
+    if isinstance(origin, (Automobile, Part)) and origin is not instance:
+        return
+    part = instance if isinstance(instance, Part) else instance.part
+    Automobile.objects.filter(id=part.automobile_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=UploadSession)
+def discard_upload_session_chunks(sender, instance: UploadSession, **kwargs) -> None:
+    """
+    Removes the stored chunks of a deleted upload session, whether it was
+    completed, aborted, purged or deleted along with its part.
+    """
+    directory = upload_session_dir(instance)
+    transaction.on_commit(lambda: shutil.rmtree(directory, ignore_errors=True))
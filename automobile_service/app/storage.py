@@ -0,0 +1,194 @@
+import fcntl
+import functools
+import hashlib
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+# Blob names must fit FileField's max_length of 100: 'part_files/xx/' + 64 hex digits leaves 22.
+EXTENSION_RE = re.compile(r'\.[a-z0-9]{1,15}')
+# Lock file of each blob directory, see blob_lock()
+BLOB_LOCK_NAME = '.lock'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A FileSystemStorage that names every file after the SHA-256 of its content.
+
+    A file saved under ``part_files/spec.pdf`` is stored as
+    ``part_files/<h[:2]>/<sha256>.pdf``; saving identical content again returns
+    the existing name without writing anything, so each blob exists once on
+    disk no matter how many PartFile rows reference it. Releasing blobs that
+    are no longer referenced is handled by the PartFile post_delete signal
+    and the purge_orphan_blobs command, through release().
+
+    Reusing a blob refreshes its modification time, and release() keeps
+    blobs used within BLOB_RELEASE_GRACE_PERIOD seconds, since the row of an
+    upload that reused a blob may not be committed yet. Saving and releasing
+    a blob hold its lock (see blob_lock()), so a blob cannot be deleted
+    between being reused and being marked as used, nor written twice.
+    """
+
+    hash_algorithm = 'sha256'
+
+    def content_hash(self, content: File) -> str:
+        """
+        Computes the hex digest of the file content, reading it in chunks.
+
+        :param content: The file being saved.
+        :return: The hexadecimal content hash.
+        """
+        hasher = hashlib.new(self.hash_algorithm)
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def blob_name(self, name: str, digest: str) -> str:
+        """
+        Returns the content-addressed name for a file, keeping the directory
+        and extension of the requested name.
+
+        :param name: The name generated by the field's upload_to.
+        :param digest: The hexadecimal content hash.
+        :return: The storage name of the blob.
+        """
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        if not EXTENSION_RE.fullmatch(extension):
+            extension = ''
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def blob_digest(self, name: str) -> Optional[str]:
+        """
+        Returns the content hash a blob name was derived from.
+
+        :param name: The storage name of a file.
+        :return: The hexadecimal content hash, or None if the file was stored
+            under another name, e.g. before this storage was introduced.
+        """
+        directory, filename = os.path.split(name)
+        digest = os.path.splitext(filename)[0]
+        if DIGEST_RE.fullmatch(digest) and os.path.basename(directory) == digest[:2]:
+            return digest
+        return None
+
+    @contextmanager
+    def blob_lock(self, name: str) -> Iterator[None]:
+        """
+        Holds the exclusive lock of a blob, which serialises checking for,
+        writing, reusing and releasing it. Blobs share the lock file of their
+        directory, i.e. of the first two digits of their hash.
+        """
+        directory = os.path.dirname(self.path(name))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, BLOB_LOCK_NAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def release(self, name: str, is_referenced: Callable[[], bool]) -> bool:
+        """
+        Deletes a blob unless it is still referenced or was saved or reused
+        within the last BLOB_RELEASE_GRACE_PERIOD seconds.
+
+        :param name: The storage name of the blob.
+        :param is_referenced: Returns whether a committed row still uses the blob.
+        :return: True if the blob was deleted.
+        """
+        with self.blob_lock(name):
+            try:
+                used_at = os.path.getmtime(self.path(name))
+            except FileNotFoundError:
+                return False
+            if time.time() - used_at < settings.BLOB_RELEASE_GRACE_PERIOD or is_referenced():
+                return False
+            self.delete(name)
+            return True
+
+    def discard(self, name: str, written_at: int, is_referenced: Callable[[], bool]) -> bool:
+        """
+        Deletes a blob written by an upload that failed before its rows were
+        committed, unless it has been reused since or is referenced.
+
+        :param name: The storage name of the blob.
+        :param written_at: The modification time returned by save_blob().
+        :param is_referenced: Returns whether a committed row uses the blob.
+        :return: True if the blob was deleted.
+        """
+        with self.blob_lock(name):
+            try:
+                used_at = os.stat(self.path(name)).st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if used_at != written_at or is_referenced():
+                return False
+            self.delete(name)
+            return True
+
+    def save_blob(self, name: str, content: File) -> Tuple[str, Optional[int]]:
+        """
+        Saves a file like save(), and tells whether the blob was written.
+
+        Content is hashed while it is copied to a temporary file, so it is
+        read once, and the copy is then renamed into place. Temporary uploads
+        are hashed and then moved into place instead, which copies nothing.
+
+        :param name: The name generated by the field's upload_to.
+        :param content: The file being saved.
+        :return: The storage name of the blob, and its modification time in
+            nanoseconds if this call wrote it, or None if it was already stored.
+        """
+        if hasattr(content, 'temporary_file_path'):
+            name = self.blob_name(name, self.content_hash(content))
+            return self.write_blob(name, functools.partial(super()._save, name, content))
+
+        directory = self.path(os.path.dirname(name))
+        os.makedirs(directory, exist_ok=True)
+        # In the upload_to directory, where purge_orphan_blobs does not look for blobs.
+        temporary_path = os.path.join(directory, f'.{uuid.uuid4().hex}.tmp')
+        hasher = hashlib.new(self.hash_algorithm)
+        try:
+            with open(temporary_path, 'xb') as temporary_file:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    temporary_file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            name = self.blob_name(name, hasher.hexdigest())
+            return self.write_blob(name, lambda: os.replace(temporary_path, self.path(name)))
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def write_blob(self, name: str, write: Callable[[], object]) -> Tuple[str, Optional[int]]:
+        """
+        Writes a blob under its lock unless it is already stored, in which
+        case it is marked as used instead.
+
+        :param name: The storage name of the blob.
+        :param write: Writes the content to the blob's path.
+        :return: The same as save_blob().
+        """
+        validate_file_name(name, allow_relative_path=True)
+        with self.blob_lock(name):
+            if self.exists(name):
+                os.utime(self.path(name))
+                return name, None
+            write()
+            return name, os.stat(self.path(name)).st_mtime_ns
+
+    def _save(self, name: str, content: File) -> str:
+        return self.save_blob(name, content)[0]
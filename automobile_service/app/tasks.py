@@ -0,0 +1,22 @@
+from celery import shared_task
+
+from .archives import CachedArchive
+
+
+@shared_task(name='app.tasks.build_archive_task', ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def build_archive_task(scope: str, object_id: int) -> None:
+    """
+    A Celery task that pre-builds the cached ZIP archive of a part or an
+    automobile, so that the next download is served straight from disk.
+
+    Builds can take long, so the task is only acknowledged once it has run
+    and is redelivered if the worker dies. Building an archive twice is
+    harmless, as it is published with an atomic rename.
+
+    :param scope: Either 'part' or 'automobile'.
+    :param object_id: The ID of the part or automobile.
+    :return: None
+    """
+    archive = CachedArchive.for_object(scope, object_id)
+    if archive.members and not archive.exists():
+        archive.build()
@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import datetime
+import decimal
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection
+from django.http import FileResponse, QueryDict
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from prometheus_client import REGISTRY
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from automobile_service.celery import app as automobile_celery_app
+from benchmarks.connections import measure_connection_reuse
+from benchmarks.runner import SCENARIOS, compare, run_suite
+
+from .async_views import (
+    AsyncDownloadAllFilesForAutomobileView, AsyncDownloadSingleFileView, AsyncExportCatalogueView,
+    AsyncGetAutomobileView, AsyncListAutomobilesView, AsyncUploadFileView,
+)
+from .archives import AUTOMOBILE_SCOPE, PART_SCOPE, CachedArchive
+from .checks import check_connection_pooling, check_response_cache
+from .export import export_queryset, iter_catalogue
+from .filters import filter_automobiles
+from .models import Automobile, OutboxMessage, Part, PartFile
+from .outbox import relay_outbox
+from .pagination import IdCursorPagination
+from .response_cache import get_response_cache
+from .renderers import ORJSONRenderer
+from .serializers import AutomobileSerializer, PartSerializer
+from .storage import BLOB_LOCK_NAME
+from .tasks import build_archive_task
+from .utils import compression_pool, stream_zip
+
+
+class MediaRootTestCase(TestCase):
+    """
+    Base test case that stores uploaded files in a throwaway MEDIA_ROOT.
+    """
+
+    client_class = APIClient
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        get_response_cache().clear()
+
+    def create_part_file(self, part: Part, name: str, content: bytes) -> PartFile:
+        return PartFile.objects.create(part=part, file=SimpleUploadedFile(name, content))
+
+
+class StreamZipTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+
+    def test_stream_zip_yields_data_before_archive_is_complete(self):
+        part_file = self.create_part_file(self.part, 'big.bin', b'x' * 10000)
+
+        chunks = stream_zip([(part_file.file.path, part_file.file_name)], chunk_size=1000)
+        first_chunk = next(chunks)
+
+        self.assertTrue(first_chunk.startswith(b'PK\x03\x04'))
+        self.assertGreater(len(list(chunks)), 10)
+
+    def test_stream_zip_produces_valid_archive(self):
+        first = self.create_part_file(self.part, 'a.txt', b'alpha')
+        second = self.create_part_file(self.part, 'b.txt', b'beta' * 5000)
+
+        for level, workers in ((0, 1), (6, 1), (6, 4), (9, 2)):
+            files = [(first.file.path, first.file_name), (second.file.path, second.file_name)]
+            data = b''.join(stream_zip(files, chunk_size=512, compression_level=level, workers=workers))
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(zf.read('a.txt'), b'alpha')
+                self.assertEqual(zf.read('b.txt'), b'beta' * 5000)
+                self.assertTrue(all(info.flag_bits & 0x08 for info in zf.infolist()))
+                expected = zipfile.ZIP_DEFLATED if level else zipfile.ZIP_STORED
+                self.assertEqual(zf.getinfo('b.txt').compress_type, expected)
+
+    def test_stream_zip_chooses_store_or_deflate_per_file(self):
+        files = {
+            'notes.txt': b'text ' * 2000,
+            'photo.jpg': b'jpeg ' * 2000,
+            'random.bin': os.urandom(20000),
+            'empty.txt': b'',
+        }
+        part_files = [self.create_part_file(self.part, name, content) for name, content in files.items()]
+
+        data = b''.join(stream_zip([(pf.file.path, pf.file_name) for pf in part_files], compression_level=6))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertIsNone(zf.testzip())
+            methods = {info.filename: info.compress_type for info in zf.infolist()}
+            self.assertEqual([info.filename for info in zf.infolist()], list(files))
+            for name, content in files.items():
+                self.assertEqual(zf.read(name), content)
+        self.assertEqual(methods, {
+            'notes.txt': zipfile.ZIP_DEFLATED,
+            'photo.jpg': zipfile.ZIP_STORED,
+            'random.bin': zipfile.ZIP_STORED,
+            'empty.txt': zipfile.ZIP_STORED,
+        })
+
+    def test_parallel_build_matches_sequential_build(self):
+        part_files = [
+            self.create_part_file(self.part, f'{index}.txt', f'{index} '.encode('utf-8') * (1000 + index * 500))
+            for index in range(12)
+        ]
+        files = [(pf.file.path, pf.file_name) for pf in part_files]
+
+        sequential = b''.join(stream_zip(files, compression_level=6, workers=1))
+        parallel = b''.join(stream_zip(files, compression_level=6, workers=4))
+        self.assertEqual(parallel, sequential)
+
+    def test_deflated_member_streams_before_it_is_read(self):
+        part_file = self.create_part_file(self.part, 'notes.txt', b'note ' * 100000)
+        files = [(part_file.file.path, part_file.file_name)] * 3
+
+        chunks = stream_zip(files, chunk_size=4096, compression_level=6, workers=2)
+        local_header = next(chunks)
+        self.assertTrue(local_header.startswith(b'PK\x03\x04'))
+        self.assertEqual(len(local_header), 30 + len('notes.txt'))
+        chunks.close()
+
+    def test_archives_share_one_compression_pool(self):
+        part_file = self.create_part_file(self.part, 'notes.txt', b'note ' * 1000)
+        files = [(part_file.file.path, part_file.file_name)] * 4
+        b''.join(stream_zip(files, compression_level=6, workers=2))
+        pool = compression_pool()
+        b''.join(stream_zip(files, compression_level=6, workers=2))
+        self.assertIs(compression_pool(), pool)
+        self.assertEqual(pool._max_workers, settings.ARCHIVE_COMPRESSION_WORKERS)
+
+    def test_download_all_endpoints_stream_zip(self):
+        self.create_part_file(self.part, 'spec.txt', b'spec')
+        other_part = Part.objects.create(automobile=self.automobile, name='Brakes')
+        self.create_part_file(other_part, 'pads.txt', b'pads')
+
+        urls = {
+            reverse('download_all_files_for_part', args=[self.part.id]): {'spec.txt'},
+            reverse('download_all_files_for_automobile', args=[self.automobile.id]): {'spec.txt', 'pads.txt'},
+        }
+        for url, expected_names in urls.items():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/zip')
+            with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+                self.assertEqual(set(zf.namelist()), expected_names)
+
+    def test_download_all_for_part_without_files_returns_404(self):
+        response = self.client.get(reverse('download_all_files_for_part', args=[self.part.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCountTests(MediaRootTestCase):
+    """
+    Asserts that listing endpoints issue a fixed number of queries regardless
+    of how many automobiles, parts and files exist.
+    """
+
+    def create_fleet(self, size: int) -> Automobile:
+        automobile = None
+        for index in range(size):
+            automobile = Automobile.objects.create(manufacturer=f'Maker {index}', type='Car', model=f'M{index}')
+            for part_index in range(2):
+                part = Part.objects.create(automobile=automobile, name=f'Part {part_index}')
+                for file_index in range(2):
+                    self.create_part_file(part, f'{index}-{part_index}-{file_index}.txt', b'data')
+        return automobile
+
+    def assertConstantQueries(self, expected: int, url_for_fleet, fleet_sizes=(1, 3, 6)):
+        created = 0
+        for size in fleet_sizes:
+            automobile = self.create_fleet(size - created)
+            created = size
+            url = url_for_fleet(automobile)
+            get_response_cache().clear()
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertEqual(response.status_code, 200)
+
+    def test_list_automobiles_query_count(self):
+        self.assertConstantQueries(3, lambda automobile: reverse('list_automobiles'))
+
+    def test_get_automobile_query_count(self):
+        self.assertConstantQueries(3, lambda automobile: reverse('get_automobile', args=[automobile.id]))
+
+    def test_list_parts_query_count(self):
+        self.assertConstantQueries(3, lambda automobile: reverse('list_parts', args=[automobile.id]))
+
+    def test_download_all_for_automobile_query_count(self):
+        self.assertConstantQueries(
+            2, lambda automobile: reverse('download_all_files_for_automobile', args=[automobile.id]))
+
+    def test_planned_listing_matches_unplanned_serialization(self):
+        self.create_fleet(2)
+        response = self.client.get(reverse('list_automobiles'))
+
+        request = response.wsgi_request
+        expected = AutomobileSerializer(Automobile.objects.all(), many=True, context={'request': request}).data
+        self.assertEqual(response.json()['results'], expected)
+
+
+class SparseFieldsetTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        for name in ('Engine', 'Brakes'):
+            part = Part.objects.create(automobile=self.automobile, name=name)
+            self.create_part_file(part, f'{name}.txt', b'spec')
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        return response, [query['sql'] for query in queries]
+
+    def test_fields_prune_payload_and_skip_relations(self):
+        response, queries = self.get(reverse('list_automobiles'), fields='manufacturer,model')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'manufacturer': 'Volvo', 'model': 'FH16'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"type"', queries[0])
+
+    def test_expand_limits_depth(self):
+        response, queries = self.get(reverse('get_automobile', args=[self.automobile.id]), expand='parts')
+
+        self.assertEqual([part['name'] for part in response.json()['parts']], ['Engine', 'Brakes'])
+        self.assertNotIn('files', response.json()['parts'][0])
+        self.assertEqual(len(queries), 2)
+
+        response, queries = self.get(reverse('get_automobile', args=[self.automobile.id]), expand='')
+        self.assertNotIn('parts', response.json())
+        self.assertEqual(len(queries), 1)
+
+    def test_nested_field_paths(self):
+        response, _ = self.get(reverse('list_automobiles'), fields='id,parts.name,parts.files.id', expand='')
+
+        parts = response.json()['results'][0]['parts']
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'parts'})
+        self.assertEqual(set(parts[0]), {'name', 'files'})
+        self.assertEqual(set(parts[0]['files'][0]), {'id'})
+
+        response, queries = self.get(reverse('list_parts', args=[self.automobile.id]), fields='name')
+        self.assertEqual(response.json()['results'], [{'name': 'Engine'}, {'name': 'Brakes'}])
+        self.assertFalse(any('app_partfile' in sql for sql in queries))
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({'fields': 'colour'}, {'fields': 'parts.colour'}, {'expand': 'model'},
+                       {'fields': 'model.name'}):
+            response, _ = self.get(reverse('list_automobiles'), **params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_selections_are_cached_separately(self):
+        full = self.client.get(reverse('get_automobile', args=[self.automobile.id])).json()
+        sparse = self.client.get(reverse('get_automobile', args=[self.automobile.id]), {'fields': 'model'}).json()
+
+        self.assertEqual(sparse, {'model': 'FH16'})
+        self.assertEqual(self.client.get(reverse('get_automobile', args=[self.automobile.id])).json(), full)
+
+
+class FastSerializerTests(MediaRootTestCase):
+    """
+    The listings serialize from values() rows and render with orjson; their
+    bytes must equal what the DRF serializers and JSONRenderer produce.
+    """
+
+    def setUp(self):
+        super().setUp()
+        names = ['Volvo', 'Citro\u00ebn', 'Line\u2028Sep', 'Quote "and" \\slash/', 'Tab\there', '\U0001F697']
+        for index, name in enumerate(names):
+            automobile = Automobile.objects.create(manufacturer=name, type='Car', model=f'M{index}')
+            for part_index in range(index % 3):
+                part = Part.objects.create(automobile=automobile, name=f'{name} part {part_index}')
+                self.create_part_file(part, f'{name}-{part_index}.txt', name.encode('utf-8'))
+        Automobile.objects.create(manufacturer='Empty', type='Van', model='E1')
+
+    def test_automobile_listing_is_byte_identical(self):
+        response = self.client.get(reverse('list_automobiles'))
+
+        page = AutomobileSerializer(Automobile.objects.order_by('id'), many=True,
+                                    context={'request': response.wsgi_request}).data
+        expected = JSONRenderer().render({'next': None, 'previous': None, 'results': page})
+        self.assertEqual(response.content, expected)
+
+    def test_parts_listing_is_byte_identical(self):
+        automobile = Automobile.objects.get(model='M5')
+        response = self.client.get(reverse('list_parts', args=[automobile.id]))
+
+        page = PartSerializer(automobile.parts.order_by('id'), many=True,
+                              context={'request': response.wsgi_request}).data
+        expected = JSONRenderer().render({'next': None, 'previous': None, 'results': page})
+        self.assertEqual(response.content, expected)
+
+    def test_fast_path_matches_serializer_path(self):
+        fast = self.client.get(reverse('list_automobiles'), {'page_size': 3})
+        drf = self.client.get(reverse('list_automobiles'), {'page_size': 3, 'expand': 'parts.files'})
+
+        self.assertEqual(fast.json()['results'], drf.json()['results'])
+        self.assertEqual(self.client.get(fast.json()['next']).json()['results'],
+                         self.client.get(drf.json()['next']).json()['results'])
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {'text': 'caf\u00e9 \u2029 \x00 \\ "', 'ints': [0, -1, 2 ** 40], 'flags': [True, False, None],
+                'detail': ErrorDetail('Not found.'), 1: 'int key', 'nested': [{'a': []}],
+                'when': datetime.datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc),
+                'uuid': uuid.UUID(int=1), 'amount': decimal.Decimal('1.5')}
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(data, 'application/json; indent=2'),
+                         JSONRenderer().render(data, 'application/json; indent=2'))
+
+
+class FilterTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fh16 = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.xc90 = Automobile.objects.create(manufacturer='Volvo', type='Car', model='XC90')
+        self.r450 = Automobile.objects.create(manufacturer='Scania', type='Truck', model='R450')
+        Part.objects.create(automobile=self.fh16, name='Engine')
+        Part.objects.create(automobile=self.fh16, name='Gearbox')
+        Part.objects.create(automobile=self.r450, name='Turbocharger')
+
+    def models(self, **params):
+        response = self.client.get(reverse('list_automobiles'), params)
+        self.assertEqual(response.status_code, 200)
+        return [automobile['model'] for automobile in response.json()['results']]
+
+    def test_exact_filters(self):
+        self.assertEqual(self.models(manufacturer='Volvo'), ['FH16', 'XC90'])
+        self.assertEqual(self.models(manufacturer='Volvo', type='Truck'), ['FH16'])
+        response = self.client.get(reverse('list_automobiles') + '?model=FH16&model=R450')
+        self.assertEqual([automobile['model'] for automobile in response.json()['results']], ['FH16', 'R450'])
+        self.assertEqual(self.models(manufacturer='volvo'), [])
+
+    def test_search_matches_fields_and_part_names(self):
+        self.assertEqual(self.models(search='volvo'), ['FH16', 'XC90'])
+        self.assertEqual(self.models(search='turbo'), ['R450'])
+        self.assertEqual(self.models(search='truck gear'), ['FH16'])
+        self.assertEqual(self.models(search='  '), ['FH16', 'XC90', 'R450'])
+
+    def test_search_prefix_matches_starts_of_fields_and_part_names(self):
+        self.assertEqual(self.models(search_prefix='vol'), ['FH16', 'XC90'])
+        self.assertEqual(self.models(search_prefix='olvo'), [])
+        self.assertEqual(self.models(search_prefix='TURBO'), ['R450'])
+        self.assertEqual(self.models(search_prefix='truck gear', search='box'), ['FH16'])
+
+        url = reverse('list_parts', args=[self.fh16.id])
+        self.assertEqual([part['name'] for part in self.client.get(url, {'search_prefix': 'gear'}).json()['results']],
+                         ['Gearbox'])
+
+    def test_part_name_search_is_not_correlated(self):
+        queryset = filter_automobiles(Automobile.objects.all(), QueryDict('search=gear'))
+        self.assertNotIn('EXISTS', str(queryset.query))
+        self.assertEqual([automobile.model for automobile in queryset], ['FH16'])
+
+    def test_search_joins_no_duplicate_rows(self):
+        with self.assertNumQueries(3):
+            self.assertEqual(self.models(search='e'), ['FH16', 'R450'])
+
+    def test_part_filters(self):
+        url = reverse('list_parts', args=[self.fh16.id])
+        self.assertEqual(self.client.get(url, {'name': 'Engine'}).json()['results'][0]['name'], 'Engine')
+        self.assertEqual([part['name'] for part in self.client.get(url, {'search': 'BOX'}).json()['results']],
+                         ['Gearbox'])
+
+    def test_filtered_pages_are_invalidated(self):
+        self.assertEqual(self.models(manufacturer='Scania'), ['R450'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Automobile.objects.create(manufacturer='Scania', type='Bus', model='Touring')
+        self.assertEqual(self.models(manufacturer='Scania'), ['R450', 'Touring'])
+
+
+class ExportTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobiles = [
+            Automobile.objects.create(manufacturer='Volvo', type='Truck', model=f'FH{index}') for index in range(5)
+        ]
+        for automobile in self.automobiles[:3]:
+            part = Part.objects.create(automobile=automobile, name='Engine')
+            self.create_part_file(part, f'{automobile.model}.txt', automobile.model.encode())
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_catalogue'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_streams_every_automobile_in_chunks(self):
+        response = self.client.get(reverse('export_catalogue'))
+        chunks = list(response.streaming_content)
+
+        self.assertEqual(len(chunks), 3)
+        expected = AutomobileSerializer(Automobile.objects.order_by('id'), many=True,
+                                        context={'request': response.wsgi_request}).data
+        self.assertEqual([json.loads(line) for line in b''.join(chunks).splitlines()], expected)
+
+    def test_export_without_server_side_cursors_reads_keyset_chunks(self):
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}), \
+                CaptureQueriesContext(connection) as queries:
+            lines = [json.loads(line) for line in b''.join(iter_catalogue(export_queryset(), chunk_size=2)).splitlines()]
+
+        self.assertEqual([line['model'] for line in lines], ['FH0', 'FH1', 'FH2', 'FH3', 'FH4'])
+        keyset_queries = [query['sql'] for query in queries.captured_queries
+                          if 'LIMIT 2' in query['sql'] and '"app_automobile"."id" >' in query['sql']]
+        self.assertEqual(len(keyset_queries), 3)
+
+    def test_incremental_export_since_id(self):
+        lines = self.export(since_id=self.automobiles[2].id)
+        self.assertEqual([line['model'] for line in lines], ['FH3', 'FH4'])
+
+    def test_incremental_export_since_time_includes_changed_parts_and_files(self):
+        Automobile.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        Part.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        PartFile.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        started_at = self.client.get(reverse('export_catalogue'))['X-Export-Started-At']
+        self.assertEqual(self.export(since=started_at), [])
+
+        self.create_part_file(self.automobiles[0].parts.get(), 'extra.txt', b'extra')
+        Part.objects.filter(automobile=self.automobiles[1]).delete()
+        self.automobiles[4].save()
+
+        self.assertEqual([line['model'] for line in self.export(since=started_at)], ['FH0', 'FH1', 'FH4'])
+
+    @override_settings(EXPORT_WATERMARK_OVERLAP=60)
+    def test_next_export_overlaps_the_previous_one(self):
+        before = timezone.now()
+        started_at = parse_datetime(self.client.get(reverse('export_catalogue'))['X-Export-Started-At'])
+
+        self.assertLess(started_at, before - datetime.timedelta(seconds=59))
+        self.assertEqual(len(self.export(since=started_at.isoformat())), 5)
+
+    def test_incremental_export_since_time_reports_deleted_automobiles(self):
+        started_at = self.client.get(reverse('export_catalogue'))['X-Export-Started-At']
+        Automobile.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        Part.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        PartFile.objects.update(updated_at=datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc))
+        deleted_ids = [self.automobiles[3].id, self.automobiles[0].id]
+        Automobile.objects.filter(id__in=deleted_ids).delete()
+
+        self.assertEqual(self.export(since=started_at), [{'id': id, 'deleted': True} for id in sorted(deleted_ids)])
+        self.assertEqual(len(self.export()), 3)
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.client.get(reverse('export_catalogue'), {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.json())
+
+    def test_command_writes_export_to_file(self):
+        output = os.path.join(settings.MEDIA_ROOT, 'export.ndjson')
+        stderr = io.StringIO()
+        call_command('export_catalogue', '--output', output, '--since-id', str(self.automobiles[0].id),
+                     '--chunk-size', '3', stderr=stderr)
+
+        with open(output, 'rb') as export_file:
+            self.assertEqual([json.loads(line)['model'] for line in export_file], ['FH1', 'FH2', 'FH3', 'FH4'])
+        self.assertIn('Exported 4 line(s)', stderr.getvalue())
+
+
+class ImportTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        os.makedirs(os.path.join(self.source, 'docs'))
+        for name, content in [('docs/engine.pdf', b'engine'), ('docs/brakes.pdf', b'brakes'),
+                              ('copy.pdf', b'engine')]:
+            with open(os.path.join(self.source, name), 'wb') as source_file:
+                source_file.write(content)
+
+    def write_manifest(self, name, text):
+        path = os.path.join(self.source, name)
+        with open(path, 'w') as manifest:
+            manifest.write(text)
+        return path
+
+    def import_catalogue(self, manifest, *args):
+        stdout = io.StringIO()
+        call_command('import_catalogue', manifest, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_csv_import_creates_rows_and_stores_files_once(self):
+        Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        manifest = self.write_manifest('manifest.csv', (
+            "manufacturer,type,model,part,file,file_name\n"
+            "Volvo,Truck,FH16,Engine,docs/engine.pdf,\n"
+            "Volvo,Truck,FH16,Engine,docs/brakes.pdf,Brake manual.pdf\n"
+            "Volvo,Truck,FH16,Cab,,\n"
+            "Scania,Truck,R450,Engine,copy.pdf,\n"
+            "MAN,Bus,Lion,,,\n"))
+
+        output = self.import_catalogue(manifest, '--batch-size', '2')
+
+        self.assertIn('Imported 5 rows', output)
+        self.assertEqual(Automobile.objects.count(), 3)
+        self.assertEqual(sorted(Part.objects.values_list('automobile__model', 'name')),
+                         [('FH16', 'Cab'), ('FH16', 'Engine'), ('R450', 'Engine')])
+        files = dict(PartFile.objects.values_list('file_name', 'file'))
+        self.assertEqual(set(files), {'engine.pdf', 'Brake manual.pdf', 'copy.pdf'})
+        self.assertEqual(files['engine.pdf'], files['copy.pdf'])
+        with PartFile.objects.get(file_name='Brake manual.pdf').file.open('rb') as stored:
+            self.assertEqual(stored.read(), b'brakes')
+        self.assertFalse(OutboxMessage.objects.exists())
+
+        output = self.import_catalogue(manifest)
+        self.assertIn('0 automobile(s), 0 part(s) and 0 file(s) created, 3 file(s) already present', output)
+        self.assertEqual(PartFile.objects.count(), 3)
+
+    def test_ndjson_import_aggregates_notifications_per_batch(self):
+        manifest = self.write_manifest('manifest.ndjson', "\n".join(json.dumps(row) for row in [
+            {'manufacturer': 'Volvo', 'type': 'Truck', 'model': 'FH16', 'part': 'Engine', 'file': 'docs/engine.pdf'},
+            {'manufacturer': 'Volvo', 'type': 'Truck', 'model': 'FH16', 'part': 'Brakes', 'file': 'docs/brakes.pdf'},
+            {'manufacturer': 'Volvo', 'type': 'Car', 'model': 'XC90', 'part': 'Engine', 'file': 'copy.pdf'},
+        ]))
+
+        self.import_catalogue(manifest, '--batch-size', '2', '--notify-base-url', 'https://cars.example.com')
+
+        messages = list(OutboxMessage.objects.order_by('id'))
+        self.assertEqual([len(message.args[0]) for message in messages], [2, 1])
+        self.assertEqual(messages[0].task_name, 'email_app.tasks.send_bulk_email_task')
+        self.assertTrue(messages[1].args[0][0]['part']['file_link'].startswith('https://cars.example.com/media/'))
+
+    def test_invalid_rows_are_reported_by_line(self):
+        manifest = self.write_manifest('manifest.csv', (
+            "manufacturer,type,model,part,file\n"
+            "Volvo,Truck,FH16,Engine,docs/engine.pdf\n"
+            "Volvo,,FH12,Engine,\n"))
+        with self.assertRaisesMessage(CommandError, 'Line 3: Missing type.'):
+            self.import_catalogue(manifest)
+
+        manifest = self.write_manifest('missing.csv', "manufacturer,type,model,part,file\nVolvo,Truck,FH16,Cab,x.pdf\n")
+        with self.assertRaisesMessage(CommandError, 'Line 2: Cannot read x.pdf'):
+            self.import_catalogue(manifest)
+
+    def test_files_outside_the_files_directory_are_rejected(self):
+        os.symlink(os.path.join(self.source, 'copy.pdf'), os.path.join(self.source, 'docs', 'link.pdf'))
+        for path in ['../copy.pdf', os.path.join(self.source, 'copy.pdf'), 'link.pdf']:
+            manifest = self.write_manifest('manifest.csv',
+                                           f"manufacturer,type,model,part,file\nVolvo,Truck,FH16,Cab,{path}\n")
+            with self.assertRaisesMessage(CommandError, f'Line 2: {path} is outside the files directory.'):
+                self.import_catalogue(manifest, '--files', os.path.join(self.source, 'docs'))
+        self.assertFalse(PartFile.objects.exists())
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        get_response_cache().clear()
+        self.automobiles = [
+            Automobile.objects.create(manufacturer='Maker', type='Car', model=f'M{index}')
+            for index in range(25)
+        ]
+
+    def fetch_all_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.json()['results'])
+            url = response.json()['next']
+        return ids
+
+    def test_pages_follow_id_order_without_gaps(self):
+        ids = self.fetch_all_pages(reverse('list_automobiles'))
+        self.assertEqual(ids, [automobile.id for automobile in self.automobiles])
+
+    def test_page_size_parameter_is_capped(self):
+        response = self.client.get(reverse('list_automobiles'), {'page_size': 5})
+        self.assertEqual(len(response.json()['results']), 5)
+
+        with mock.patch.object(IdCursorPagination, 'max_page_size', 7):
+            response = self.client.get(reverse('list_automobiles'), {'page_size': 1000})
+        self.assertEqual(len(response.json()['results']), 7)
+
+    def test_deep_page_uses_keyset_filter_without_count(self):
+        url = reverse('list_automobiles') + '?page_size=5'
+        for _ in range(3):
+            url = self.client.get(url).json()['next']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['results']), 5)
+        automobile_query = queries.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', automobile_query)
+        self.assertNotIn('OFFSET', automobile_query)
+        self.assertIn('"ID" >', automobile_query.replace('"APP_AUTOMOBILE".', ''))
+
+    def test_list_parts_is_paginated(self):
+        automobile = self.automobiles[0]
+        for index in range(12):
+            Part.objects.create(automobile=automobile, name=f'Part {index}')
+
+        response = self.client.get(reverse('list_parts', args=[automobile.id]))
+        self.assertEqual(len(response.json()['results']), 10)
+        self.assertIsNotNone(response.json()['next'])
+
+
+class ResponseCacheTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+        self.urls = [
+            reverse('get_automobile', args=[self.automobile.id]),
+            reverse('list_automobiles'),
+            reverse('list_parts', args=[self.automobile.id]),
+        ]
+
+    def test_repeated_requests_are_served_from_cache(self):
+        for url in self.urls:
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.json(), first.json())
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertIn('Last-Modified', second)
+
+    def test_conditional_requests_return_not_modified(self):
+        for url in self.urls:
+            first = self.client.get(url)
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], first['ETag'])
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+            self.assertEqual(response.status_code, 200)
+
+    def test_writes_invalidate_cached_responses(self):
+        for url in self.urls:
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('upload_file', args=[self.automobile.id, self.part.id]),
+                {'file_name': 'spec.txt', 'content': 'spec'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        detail = self.client.get(self.urls[0]).json()
+        self.assertEqual(len(detail['parts'][0]['files']), 1)
+        listing = self.client.get(self.urls[1]).json()
+        self.assertEqual(len(listing['results'][0]['parts'][0]['files']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Automobile.objects.filter(id=self.automobile.id).first().delete()
+        self.assertEqual(self.client.get(self.urls[0]).status_code, 404)
+        self.assertEqual(self.client.get(self.urls[1]).json()['results'], [])
+
+    def test_deleting_automobile_without_parts_invalidates_its_responses(self):
+        automobile = Automobile.objects.create(manufacturer='Scania', type='Truck', model='R500')
+        url = reverse('get_automobile', args=[automobile.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            automobile.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_padded_primary_keys_share_the_invalidated_scope(self):
+        url = reverse('get_automobile', args=[f'00{self.automobile.id}'])
+        self.assertEqual(self.client.get(url).json()['model'], 'FH16')
+
+        self.automobile.model = 'FH12'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.automobile.save()
+        self.assertEqual(self.client.get(url).json()['model'], 'FH12')
+        self.assertEqual(self.client.get(reverse('get_automobile', args=['FH12'])).status_code, 404)
+
+
+@override_settings(UPLOAD_CHUNK_MAX_SIZE=1000)
+class ChunkedUploadTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+        self.content = os.urandom(2500)
+
+    def start(self, **data):
+        response = self.client.post(reverse('start_upload', args=[self.automobile.id, self.part.id]),
+                                    {'file_name': 'firmware.bin', 'size': len(self.content), **data}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def url(self, name, upload_id, *args):
+        return reverse(name, args=[self.automobile.id, self.part.id, upload_id, *args])
+
+    def put_chunk(self, upload_id, index, data):
+        return self.client.put(self.url('upload_chunk', upload_id, index), data,
+                               content_type='application/octet-stream')
+
+    def test_chunks_are_assembled_into_part_file(self):
+        upload_id = self.start(size=len(self.content))
+        for index in (2, 0, 1):
+            response = self.put_chunk(upload_id, index, self.content[index * 1000:(index + 1) * 1000])
+            self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.status_code, 201)
+
+        part_file = PartFile.objects.get(id=response.json()['file_id'])
+        self.assertEqual(part_file.file_name, 'firmware.bin')
+        with part_file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(list(OutboxMessage.objects.values_list('task_name', flat=True)),
+                         ['email_app.tasks.send_email_task'])
+        self.assertEqual(os.listdir(os.path.join(settings.MEDIA_ROOT, 'upload_sessions')), [])
+
+        response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.json()['file_id'], part_file.id)
+        self.assertEqual(PartFile.objects.count(), 1)
+
+    def test_interrupted_upload_resumes_from_received_chunks(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, self.content[:1000])
+        self.put_chunk(upload_id, 2, self.content[2000:])
+
+        response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['missing_chunks'], [1])
+
+        state = self.client.get(self.url('upload_session', upload_id)).json()
+        self.assertEqual(state['received_chunks'], [0, 2])
+        self.assertEqual(state['received_size'], 1500)
+
+        self.put_chunk(upload_id, 1, self.content[1000:2000])
+        response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.status_code, 201)
+
+    def test_size_mismatch_and_oversized_chunks_are_rejected(self):
+        upload_id = self.start(size=10)
+        self.put_chunk(upload_id, 0, b'short')
+        response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.status_code, 400)
+
+        with override_settings(UPLOAD_CHUNK_MAX_SIZE=4):
+            response = self.put_chunk(upload_id, 1, b'too large')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.client.get(self.url('upload_session', upload_id)).json()['received_chunks'], [0])
+
+    def test_chunk_indexes_are_bounded_by_size(self):
+        response = self.client.post(reverse('start_upload', args=[self.automobile.id, self.part.id]),
+                                    {'file_name': 'firmware.bin'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(UPLOAD_MAX_SIZE=2000):
+            response = self.client.post(reverse('start_upload', args=[self.automobile.id, self.part.id]),
+                                        {'file_name': 'firmware.bin', 'size': 2001}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        upload_id = self.start(size=len(self.content))
+        self.assertEqual(self.put_chunk(upload_id, 3, b'x').status_code, 400)
+        self.assertEqual(self.put_chunk(upload_id, 10 ** 10, b'x').status_code, 400)
+        self.put_chunk(upload_id, 1, self.content[1000:2000])
+        response = self.client.post(self.url('complete_upload', upload_id))
+        self.assertEqual(response.json()['missing_chunks'], [0, 2])
+
+    def test_aborted_upload_discards_chunks(self):
+        upload_id = self.start()
+        self.put_chunk(upload_id, 0, b'data')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.url('upload_session', upload_id))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(self.url('upload_session', upload_id)).status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'upload_sessions', upload_id)))
+
+
+class OutboxTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+
+    def upload(self):
+        return self.client.post(reverse('upload_file', args=[self.automobile.id, self.part.id]),
+                                {'file_name': 'spec.txt', 'content': 'spec'}, format='json')
+
+    @mock.patch('app.outbox.celery_app')
+    def test_upload_queues_notification_without_touching_broker(self, celery_app):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 201)
+        celery_app.send_task.assert_not_called()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'email_app.tasks.send_email_task')
+        self.assertEqual(message.args[0]['part']['name'], 'Engine')
+
+    def test_failed_upload_queues_nothing(self):
+        with mock.patch('app.views.PartFile.objects.create', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.upload()
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @mock.patch('app.outbox.celery_app')
+    def test_relay_publishes_in_batches_with_message_ids(self, celery_app):
+        for _ in range(3):
+            self.upload()
+        message_ids = [str(message_id) for message_id in
+                       OutboxMessage.objects.order_by('id').values_list('message_id', flat=True)]
+
+        self.assertEqual(relay_outbox(batch_size=2), 2)
+        self.assertEqual(relay_outbox(batch_size=2), 1)
+        self.assertEqual(relay_outbox(batch_size=2), 0)
+
+        self.assertEqual(celery_app.producer_or_acquire.call_count, 2)
+        self.assertEqual([call.kwargs['task_id'] for call in celery_app.send_task.call_args_list], message_ids)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @mock.patch('app.outbox.celery_app')
+    def test_broker_failure_keeps_batch_for_next_run(self, celery_app):
+        self.upload()
+        celery_app.send_task.side_effect = ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            relay_outbox()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+        celery_app.send_task.side_effect = None
+        self.assertEqual(relay_outbox(), 1)
+
+    def test_tasks_are_routed_to_dedicated_priority_queues(self):
+        def route(task_name):
+            options = automobile_celery_app.amqp.router.route({}, task_name, (), {})
+            return options['queue'].name, options.get('priority'), options['queue'].queue_arguments
+
+        self.assertEqual(route('email_app.tasks.send_email_task'), ('notifications', 6, {'x-max-priority': 10}))
+        self.assertEqual(route('email_app.tasks.send_bulk_email_task')[:2], ('notifications', 3))
+        self.assertEqual(route(build_archive_task.name)[:2], ('archives', None))
+        self.assertTrue(build_archive_task.acks_late)
+
+
+class BenchmarkSuiteTests(MediaRootTestCase):
+    def test_suite_measures_every_scenario_at_each_scale(self):
+        results = run_suite(scales=[3, 1], iterations=2, report=lambda line: None)
+
+        self.assertEqual(list(results), ['1', '3'])
+        self.assertEqual(set(results['3']), {scenario.name for scenario in SCENARIOS})
+        self.assertEqual(Automobile.objects.count(), 3)
+        self.assertEqual(results['3']['list_automobiles_cached']['queries'], 0)
+        self.assertEqual(results['3']['get_automobile']['queries'], results['1']['get_automobile']['queries'])
+        self.assertGreater(results['3']['download_all_automobile']['peak_memory_kb'], 0)
+        for part_file in PartFile.objects.all():
+            self.assertEqual(part_file.size, part_file.file.size)
+            with part_file.file.open('rb') as content:
+                self.assertEqual(part_file.checksum, hashlib.sha256(content.read()).hexdigest())
+            self.assertNotEqual(part_file.content_type, '')
+
+    def test_connection_reuse_is_measured_per_lifetime(self):
+        automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+
+        results = measure_connection_reuse(reverse('get_automobile', args=[automobile.id]), 3,
+                                           {'per_request': 0, 'persistent': 600}, report=lambda line: None)
+
+        self.assertEqual(list(results), ['per_request', 'persistent'])
+        self.assertGreater(results['persistent']['p50_ms'], 0)
+
+    def test_compare_flags_slowdowns_and_extra_queries(self):
+        baseline = {'10': {'list': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 3, 'peak_memory_kb': 100}}}
+        noise = {'10': {'list': {'p50_ms': 11.5, 'p95_ms': 21.0, 'queries': 3, 'peak_memory_kb': 150}}}
+        slower = {'10': {'list': {'p50_ms': 15.0, 'p95_ms': 20.0, 'queries': 4, 'peak_memory_kb': 100}}}
+
+        self.assertEqual(compare(noise, baseline, threshold=0.2), [])
+        self.assertEqual(compare(slower, baseline, threshold=0.2),
+                         ['list @ 10: p50_ms 10.0 -> 15.0', 'list @ 10: queries 3 -> 4'])
+
+
+class ConnectionPoolingCheckTests(TestCase):
+    @override_settings(ASYNC_VIEWS=True, DB_POOL_MODE='persistent')
+    def test_persistent_connections_are_rejected_under_asgi(self):
+        self.assertEqual([error.id for error in check_connection_pooling(None)], ['app.E002'])
+
+    @override_settings(DB_POOL_MODE='pooled')
+    def test_unknown_mode_is_rejected(self):
+        self.assertEqual([error.id for error in check_connection_pooling(None)], ['app.E001'])
+
+    @override_settings(ASYNC_VIEWS=False, DB_POOL_MODE='persistent', WEB_CONCURRENCY=8, WEB_THREADS=4,
+                       CELERY_WORKER_CONCURRENCY=8, DB_MAX_CONNECTIONS=40)
+    def test_connection_budget_is_checked_for_persistent_connections(self):
+        self.assertEqual([error.id for error in check_connection_pooling(None)], ['app.W001'])
+        with override_settings(DB_MAX_CONNECTIONS=41):
+            self.assertEqual(check_connection_pooling(None), [])
+        with override_settings(DB_POOL_MODE='pgbouncer'):
+            self.assertEqual(check_connection_pooling(None), [])
+
+    @override_settings(WEB_CONCURRENCY=2,
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_cache_is_rejected_with_several_processes(self):
+        self.assertEqual([error.id for error in check_response_cache(None)], ['app.E003'])
+        self.assertEqual(check_response_cache(None, processes=1), [])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                                                   'LOCATION': 'redis://redis:6379/1'}}):
+            self.assertEqual(check_response_cache(None), [])
+
+
+class MetricsTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+        self.create_part_file(self.part, 'spec.txt', b'spec' * 1000)
+
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_request_duration_queries_and_size(self):
+        labels = {'view': 'list_automobiles'}
+        before = {name: self.sample(name, **labels) for name in (
+            'http_request_db_queries_sum', 'http_request_serialization_seconds_count', 'http_response_bytes_sum')}
+        requests = self.sample('http_request_duration_seconds_count', method='GET', status='200', **labels)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('list_automobiles'))
+
+        self.assertEqual(self.sample('http_request_duration_seconds_count', method='GET', status='200', **labels),
+                         requests + 1)
+        self.assertEqual(self.sample('http_request_db_queries_sum', **labels),
+                         before['http_request_db_queries_sum'] + len(queries))
+        self.assertEqual(self.sample('http_request_serialization_seconds_count', **labels),
+                         before['http_request_serialization_seconds_count'] + 1)
+        self.assertEqual(self.sample('http_response_bytes_sum', **labels),
+                         before['http_response_bytes_sum'] + len(response.content))
+
+    def test_counts_streamed_bytes_and_archive_build_time(self):
+        labels = {'view': 'download_all_files_for_part'}
+        streamed = self.sample('http_response_bytes_sum', **labels)
+        builds = self.sample('archive_build_seconds_count', scope=PART_SCOPE)
+
+        response = self.client.get(reverse('download_all_files_for_part', args=[self.part.id]))
+        content = b''.join(response.streaming_content)
+        response.close()
+
+        self.assertEqual(self.sample('http_response_bytes_sum', **labels), streamed + len(content))
+        self.assertEqual(self.sample('archive_build_seconds_count', scope=PART_SCOPE), builds + 1)
+
+    def test_metrics_endpoint_uses_prometheus_format(self):
+        self.client.get(reverse('list_automobiles'))
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket{le="0.005",method="GET",status="200",'
+                      b'view="list_automobiles"}', response.content)
+
+    def test_metrics_endpoint_is_restricted_by_address(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 403)
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.1', '203.0.113.0/24']):
+            self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 200)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+
+class DownloadSingleFileTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=automobile, name='Engine')
+        self.part_file = self.create_part_file(self.part, 'manual.bin', bytes(range(256)) * 4)
+        self.url = reverse('download_single_file', args=[self.part.id, self.part_file.id])
+
+    def test_streams_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Length'], '1024')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="manual.bin"')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+
+    def test_range_requests(self):
+        content = bytes(range(256)) * 4
+        cases = {
+            'bytes=10-19': (content[10:20], 'bytes 10-19/1024'),
+            'bytes=1000-': (content[1000:], 'bytes 1000-1023/1024'),
+            'bytes=-4': (content[-4:], 'bytes 1020-1023/1024'),
+            'bytes=1020-5000': (content[1020:], 'bytes 1020-1023/1024'),
+        }
+        for header, (expected, content_range) in cases.items():
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(response['Content-Range'], content_range)
+            self.assertEqual(response['Content-Length'], str(len(expected)))
+            self.assertEqual(b''.join(response.streaming_content), expected)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_serves_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_file_of_other_part_returns_404(self):
+        other_part = Part.objects.create(automobile=self.part.automobile, name='Brakes')
+        response = self.client.get(reverse('download_single_file', args=[other_part.id, self.part_file.id]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='app.downloads.XAccelRedirectDownloadBackend',
+                       FILE_DOWNLOAD_INTERNAL_URL='/protected-media/')
+    def test_x_accel_redirect_backend(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.part_file.file.name)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(FILE_DOWNLOAD_BACKEND='app.downloads.XSendfileDownloadBackend')
+    def test_x_sendfile_backend(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.part_file.file.path)
+        self.assertEqual(response.content, b'')
+
+
+class ContentAddressedStorageTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.parts = [Part.objects.create(automobile=self.automobile, name=f'Part {i}') for i in range(2)]
+
+    def upload(self, part, file_name, content):
+        url = reverse('upload_file', args=[self.automobile.id, part.id])
+        response = self.client.post(url, {'file_name': file_name, 'content': content}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return PartFile.objects.get(id=response.json()['file_id'])
+
+    def test_identical_content_is_stored_once(self):
+        first = self.upload(self.parts[0], 'spec.txt', 'shared spec sheet')
+        second = self.upload(self.parts[1], 'spec-copy.txt', 'shared spec sheet')
+        third = self.upload(self.parts[1], 'other.txt', 'something else')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, third.file.name)
+        self.assertEqual(first.file_name, 'spec.txt')
+        self.assertEqual(second.file_name, 'spec-copy.txt')
+        digest = hashlib.sha256(b'shared spec sheet').hexdigest()
+        self.assertEqual(first.file.name, f'part_files/{digest[:2]}/{digest}.txt')
+
+    def age(self, part_file, seconds=7200):
+        used_at = time.time() - seconds
+        os.utime(part_file.file.path, (used_at, used_at))
+
+    def test_blob_is_deleted_with_last_reference(self):
+        first = self.upload(self.parts[0], 'spec.txt', 'shared spec sheet')
+        second = self.upload(self.parts[1], 'spec.txt', 'shared spec sheet')
+        storage, name = first.file.storage, first.file.name
+        self.age(first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(storage.exists(name))
+
+    def test_recently_reused_blob_is_kept_until_purged(self):
+        first = self.upload(self.parts[0], 'spec.txt', 'shared spec sheet')
+        storage, name = first.file.storage, first.file.name
+        self.age(first)
+        # Reusing the blob marks it as used, so a concurrent release keeps it until the new row commits.
+        self.upload(self.parts[1], 'spec.txt', 'shared spec sheet').delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.exists(name))
+
+        stdout = io.StringIO()
+        call_command('purge_orphan_blobs', stdout=stdout)
+        self.assertTrue(storage.exists(name))
+        self.age(first)
+        call_command('purge_orphan_blobs', stdout=stdout)
+        self.assertFalse(storage.exists(name))
+        self.assertIn('Deleted 1 orphaned blob(s).', stdout.getvalue())
+
+    def test_concurrent_saves_write_a_new_blob_once(self):
+        storage = PartFile._meta.get_field('file').storage
+        content = b'uploaded twice at once'
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: storage.save_blob('part_files/spec.txt', ContentFile(content)), range(8)))
+
+        self.assertEqual(len({name for name, _ in results}), 1)
+        self.assertEqual(len([written_at for _, written_at in results if written_at is not None]), 1)
+        with storage.open(results[0][0]) as blob:
+            self.assertEqual(blob.read(), content)
+
+    def test_content_is_read_once(self):
+        storage = PartFile._meta.get_field('file').storage
+        content = ContentFile(b'read in one pass')
+        with mock.patch.object(content, 'chunks', wraps=content.chunks) as chunks:
+            name, written_at = storage.save_blob('part_files/spec.txt', content)
+            self.assertIsNotNone(written_at)
+            self.assertEqual(storage.save_blob('part_files/spec.txt', content), (name, None))
+        self.assertEqual(chunks.call_count, 2)
+        self.assertEqual(storage.listdir('part_files')[1], [])
+        with storage.open(name) as blob:
+            self.assertEqual(blob.read(), b'read in one pass')
+
+    def test_long_extensions_are_dropped_from_blob_names(self):
+        part_file = self.upload(self.parts[0], 'report.' + 'x' * 40, 'report')
+        self.assertEqual(part_file.file.name, f"part_files/{part_file.checksum[:2]}/{part_file.checksum}")
+        self.assertEqual(part_file.file_name, 'report.' + 'x' * 40)
+
+    def test_zip_member_names_stay_unique(self):
+        self.upload(self.parts[0], 'spec.txt', 'shared spec sheet')
+        self.upload(self.parts[1], 'spec.txt', 'shared spec sheet')
+
+        response = self.client.get(reverse('download_all_files_for_automobile', args=[self.automobile.id]))
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as zf:
+            self.assertEqual(sorted(zf.namelist()), ['spec.txt', 'spec_1.txt'])
+            self.assertEqual(zf.read('spec_1.txt'), b'shared spec sheet')
+
+
+class FileMetadataTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+
+    def test_upload_records_metadata(self):
+        url = reverse('upload_file', args=[self.automobile.id, self.part.id])
+        response = self.client.post(url, {'file_name': 'spec.txt', 'content': 'spec sheet'}, format='json')
+        part_file = PartFile.objects.get(id=response.json()['file_id'])
+
+        self.assertEqual(part_file.size, 10)
+        self.assertEqual(part_file.checksum, hashlib.sha256(b'spec sheet').hexdigest())
+        self.assertEqual(part_file.content_type, 'text/plain')
+        self.assertIsNotNone(part_file.uploaded_at)
+
+        response = self.client.get(reverse('list_parts', args=[self.automobile.id]))
+        self.assertEqual(response.json()['results'][0]['files'][0]['size'], 10)
+
+    def test_bulk_upload_records_metadata(self):
+        upload = SimpleUploadedFile('scan.pdf', b'%PDF' * 8)
+        self.client.post(reverse('bulk_upload_files', args=[self.automobile.id]),
+                         {'part_id': self.part.id, 'files': [upload]}, format='multipart')
+        part_file = PartFile.objects.get()
+        self.assertEqual((part_file.size, part_file.content_type), (32, 'application/pdf'))
+        self.assertEqual(part_file.checksum, hashlib.sha256(b'%PDF' * 8).hexdigest())
+
+    def test_download_uses_metadata_without_stat(self):
+        part_file = self.create_part_file(self.part, 'spec.txt', b'0123456789')
+        url = reverse('download_single_file', args=[self.part.id, part_file.id])
+        etag = f'"{part_file.checksum}"'
+
+        with mock.patch('app.downloads.os.stat') as stat:
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Length'], '10')
+            self.assertEqual(response['ETag'], etag)
+            self.assertTrue(response['Content-Type'].startswith('text/plain'))
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            partial = self.client.get(url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=etag)
+            self.assertEqual(b''.join(partial.streaming_content), b'0123')
+            self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"stale"').status_code, 200)
+        stat.assert_not_called()
+
+    def test_backfill_command(self):
+        current = self.create_part_file(self.part, 'spec.txt', b'spec sheet')
+        # Stored under its own name, like files uploaded before content-addressed storage.
+        legacy_name = FileSystemStorage().save('part_files/legacy.csv', SimpleUploadedFile('x', b'a,b'))
+        legacy = PartFile.objects.create(part=self.part, file=legacy_name)
+        missing = PartFile.objects.create(part=self.part, file='part_files/gone.txt')
+        PartFile.objects.update(size=None, checksum='', content_type='', uploaded_at=None)
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('backfill_file_metadata', '--batch-size', '2', stdout=stdout, stderr=stderr)
+
+        current.refresh_from_db()
+        legacy.refresh_from_db()
+        self.assertEqual((current.size, current.checksum), (10, hashlib.sha256(b'spec sheet').hexdigest()))
+        self.assertEqual((legacy.size, legacy.content_type), (3, 'text/csv'))
+        self.assertEqual(legacy.checksum, hashlib.sha256(b'a,b').hexdigest())
+        self.assertIsNotNone(legacy.uploaded_at)
+        self.assertIsNone(PartFile.objects.get(id=missing.id).size)
+        self.assertIn('Backfilled 2 PartFile(s)', stdout.getvalue())
+        self.assertIn(f'PartFile {missing.id}', stderr.getvalue())
+
+
+class ArchiveCacheTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+        self.create_part_file(self.part, 'spec.txt', b'spec')
+        self.url = reverse('download_all_files_for_part', args=[self.part.id])
+
+    def download(self, **headers):
+        response = self.client.get(self.url, **headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+        return response
+
+    def test_second_download_is_served_from_cache(self):
+        first = self.download()
+        archive = CachedArchive.for_object(PART_SCOPE, self.part.id)
+        self.assertTrue(archive.exists())
+        self.assertEqual(first['ETag'], archive.etag)
+
+        with mock.patch('app.archives.stream_zip') as stream_zip_mock:
+            second = self.download()
+        stream_zip_mock.assert_not_called()
+        self.assertIsInstance(second, FileResponse)
+        self.assertEqual(second.content_bytes, first.content_bytes)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_none_match_returns_not_modified(self):
+        etag = self.download()['ETag']
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_upload_invalidates_cached_archives(self):
+        first = self.download()
+        stale_path = CachedArchive.for_object(PART_SCOPE, self.part.id).path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('upload_file', args=[self.automobile.id, self.part.id]),
+                                        {'file_name': 'notes.txt', 'content': 'notes'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(os.path.exists(stale_path))
+
+        second = self.download(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        with zipfile.ZipFile(io.BytesIO(second.content_bytes)) as zf:
+            self.assertEqual(sorted(zf.namelist()), ['notes.txt', 'spec.txt'])
+
+    @override_settings(ARCHIVE_PREBUILD=True)
+    def test_upload_prebuilds_archives_when_enabled(self):
+        self.client.post(reverse('upload_file', args=[self.automobile.id, self.part.id]),
+                         {'file_name': 'notes.txt', 'content': 'notes'}, format='json')
+        prebuilds = OutboxMessage.objects.filter(task_name='app.tasks.build_archive_task').order_by('id')
+        self.assertEqual([message.args for message in prebuilds],
+                         [[PART_SCOPE, self.part.id], [AUTOMOBILE_SCOPE, self.automobile.id]])
+
+        build_archive_task(AUTOMOBILE_SCOPE, self.automobile.id)
+        self.assertTrue(CachedArchive.for_object(AUTOMOBILE_SCOPE, self.automobile.id).exists())
+
+
+class BulkUploadTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.parts = [Part.objects.create(automobile=self.automobile, name=f'Part {i}') for i in range(2)]
+        self.url = reverse('bulk_upload_files', args=[self.automobile.id])
+
+    def test_json_bulk_upload(self):
+        files = [
+            {'part_id': self.parts[index % 2].id, 'file_name': f'{index}.txt', 'content': f'content {index}'}
+            for index in range(6)
+        ]
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {'files': files}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(PartFile.objects.filter(part=self.parts[0]).count(), 3)
+        self.assertEqual(PartFile.objects.filter(part=self.parts[1]).count(), 3)
+        stored = PartFile.objects.get(file_name='4.txt')
+        self.assertEqual(stored.part, self.parts[0])
+        self.assertEqual(stored.file.read(), b'content 4')
+
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task_name, 'email_app.tasks.send_bulk_email_task')
+        payloads = message.args[0]
+        self.assertEqual(len(payloads), 6)
+        self.assertEqual(payloads[1]['part']['name'], 'Part 1')
+
+    def test_multipart_bulk_upload_with_shared_part(self):
+        uploads = [SimpleUploadedFile(f'{index}.bin', bytes([index]) * 10) for index in range(3)]
+        response = self.client.post(self.url, {'part_id': self.parts[1].id, 'files': uploads}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(self.parts[1].files.values_list('file_name', flat=True)),
+                         ['0.bin', '1.bin', '2.bin'])
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_invalid_item_rejects_whole_batch(self):
+        files = [
+            {'part_id': self.parts[0].id, 'file_name': 'ok.txt', 'content': 'ok'},
+            {'part_id': self.parts[0].id, 'content': 'missing name'},
+        ]
+        response = self.client.post(self.url, {'files': files}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file_name', response.json()[1])
+        self.assertFalse(PartFile.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_parts_of_other_automobiles_are_rejected(self):
+        other = Automobile.objects.create(manufacturer='Scania', type='Truck', model='R500')
+        foreign_part = Part.objects.create(automobile=other, name='Cab')
+        files = [{'part_id': foreign_part.id, 'file_name': 'x.txt', 'content': 'x'}]
+
+        response = self.client.post(self.url, {'files': files}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PartFile.objects.exists())
+
+    def test_failed_insert_deletes_written_blobs(self):
+        existing = self.create_part_file(self.parts[0], 'shared.txt', b'shared')
+        files = [{'part_id': self.parts[1].id, 'file_name': f'{content}.txt', 'content': content}
+                 for content in ['shared', 'new']]
+        storage = existing.file.storage
+
+        with mock.patch('app.views.PartFile.objects.bulk_create', side_effect=DatabaseError('boom')), \
+                self.assertRaises(DatabaseError):
+            self.client.post(self.url, {'files': files}, format='json')
+
+        blobs = [os.path.join(directory, name) for directory, _, names in os.walk(storage.path('part_files'))
+                 for name in names if name != BLOB_LOCK_NAME]
+        self.assertEqual(blobs, [storage.path(existing.file.name)])
+        self.assertEqual(PartFile.objects.count(), 1)
+
+    @override_settings(BULK_UPLOAD_MAX_FILES=2)
+    def test_too_many_files_are_rejected(self):
+        files = [{'part_id': self.parts[0].id, 'file_name': f'{i}.txt', 'content': 'x'} for i in range(3)]
+        response = self.client.post(self.url, {'files': files}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class AsyncViewTests(MediaRootTestCase):
+    """
+    Exercises the async view variants served when ASYNC_VIEWS is enabled.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+        self.automobile = Automobile.objects.create(manufacturer='Volvo', type='Truck', model='FH16')
+        self.part = Part.objects.create(automobile=self.automobile, name='Engine')
+        self.part_file = self.create_part_file(self.part, 'manual.bin', bytes(range(256)))
+
+    @staticmethod
+    async def read_streaming(response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_list_automobiles_matches_sync_view(self):
+        sync_response = await sync_to_async(self.client.get)(reverse('list_automobiles'))
+        request = self.factory.get(reverse('list_automobiles'))
+
+        response = await AsyncListAutomobilesView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), sync_response.json())
+
+    async def test_get_automobile_and_not_found(self):
+        response = await AsyncGetAutomobileView.as_view()(self.factory.get('/'), pk=self.automobile.id)
+        self.assertEqual(json.loads(response.content)['parts'][0]['name'], 'Engine')
+
+        response = await AsyncGetAutomobileView.as_view()(self.factory.get('/'), pk=self.automobile.id + 100)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {"detail": "Not found."})
+
+    async def test_field_selection(self):
+        view = AsyncGetAutomobileView.as_view()
+        response = await view(self.factory.get('/', {'fields': 'model,parts.name'}), pk=self.automobile.id)
+        self.assertEqual(json.loads(response.content), {'model': 'FH16', 'parts': [{'name': 'Engine'}]})
+
+        response = await view(self.factory.get('/', {'expand': 'colour'}), pk=self.automobile.id)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_export_streams_ndjson(self):
+        response = await AsyncExportCatalogueView.as_view()(self.factory.get('/', {'since_id': 0}))
+
+        self.assertTrue(response.is_async)
+        line = json.loads(await self.read_streaming(response))
+        self.assertEqual(line['parts'][0]['files'][0]['id'], self.part_file.id)
+
+    async def test_download_single_file_streams_asynchronously(self):
+        view = AsyncDownloadSingleFileView.as_view()
+        response = await view(self.factory.get('/'), part_id=self.part.id, file_id=self.part_file.id)
+        self.assertTrue(response.is_async)
+        self.assertEqual(await self.read_streaming(response), bytes(range(256)))
+
+        response = await view(self.factory.get('/', headers={'Range': 'bytes=10-19'}),
+                              part_id=self.part.id, file_id=self.part_file.id)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(await self.read_streaming(response), bytes(range(10, 20)))
+
+    async def test_download_all_builds_then_serves_cached_archive(self):
+        view = AsyncDownloadAllFilesForAutomobileView.as_view()
+        first = await view(self.factory.get('/'), automobile_id=self.automobile.id)
+        first_bytes = await self.read_streaming(first)
+        with zipfile.ZipFile(io.BytesIO(first_bytes)) as zf:
+            self.assertEqual(zf.namelist(), ['manual.bin'])
+
+        second = await view(self.factory.get('/'), automobile_id=self.automobile.id)
+        self.assertEqual(second['Content-Length'], str(len(first_bytes)))
+        self.assertEqual(await self.read_streaming(second), first_bytes)
+
+        not_modified = await view(self.factory.get('/', headers={'If-None-Match': first['ETag']}),
+                                  automobile_id=self.automobile.id)
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_upload_creates_file_and_publishes_notification(self):
+        request = self.factory.post('/', {'file_name': 'notes.txt', 'content': 'notes'},
+                                    content_type='application/json')
+
+        response = await AsyncUploadFileView.as_view()(request, automobile_id=self.automobile.id,
+                                                       part_id=self.part.id)
+
+        self.assertEqual(response.status_code, 201)
+        part_file = await PartFile.objects.aget(id=json.loads(response.content)['file_id'])
+        self.assertEqual(part_file.file_name, 'notes.txt')
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+    async def test_request_errors_match_sync_views(self):
+        request = self.factory.post('/', '{"file_name": ', content_type='application/json')
+        response = await AsyncUploadFileView.as_view()(request, automobile_id=self.automobile.id, part_id=self.part.id)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('JSON parse error', json.loads(response.content)['detail'])
+
+        request = self.factory.post('/', 'file_name=notes.txt', content_type='text/csv')
+        response = await AsyncUploadFileView.as_view()(request, automobile_id=self.automobile.id, part_id=self.part.id)
+        self.assertEqual(response.status_code, 415)
@@ -0,0 +1,148 @@
+import os
+import re
+import shutil
+import uuid
+from typing import BinaryIO, List, Optional
+
+from django.conf import settings
+from django.core.files.base import File
+
+from .models import PartFile, UploadSession
+
+UPLOAD_READ_SIZE = 64 * 1024
+
+_CHUNK_FILE_PATTERN = re.compile(r'^(\d+)\.chunk$')
+
+
+class ChunkTooLarge(Exception):
+    """
+    Raised when a chunk exceeds UPLOAD_CHUNK_MAX_SIZE.
+    """
+
+
+class AssembledUpload(File):
+    """
+    A finished chunked upload on local disk. Exposing temporary_file_path()
+    lets FileSystemStorage move the file into place instead of copying it.
+    """
+
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+def upload_session_dir(session: UploadSession) -> str:
+    return os.path.join(settings.MEDIA_ROOT, settings.UPLOAD_SESSION_LOCATION, str(session.id))
+
+
+def received_chunks(session: UploadSession) -> List[int]:
+    """
+    Returns the indexes of the chunks stored for an upload session, in order.
+    Chunks only appear once fully written, so this is what a client resumes from.
+
+    :param session: The upload session.
+    :return: The sorted list of received chunk indexes.
+    """
+    try:
+        names = os.listdir(upload_session_dir(session))
+    except FileNotFoundError:
+        return []
+    return sorted(int(match.group(1)) for match in map(_CHUNK_FILE_PATTERN.match, names) if match)
+
+
+def chunk_path(session: UploadSession, index: int) -> str:
+    return os.path.join(upload_session_dir(session), f"{index}.chunk")
+
+
+def received_size(session: UploadSession) -> int:
+    return sum(os.path.getsize(chunk_path(session, index)) for index in received_chunks(session))
+
+
+def write_chunk(session: UploadSession, index: int, stream: Optional[BinaryIO]) -> int:
+    """
+    Streams one chunk of a request body to disk, UPLOAD_READ_SIZE bytes at a
+    time. The chunk is written to a temporary file and renamed into place
+    once complete, so an interrupted request never leaves a partial chunk, and
+    uploading the same index again replaces it.
+
+    :param session: The upload session the chunk belongs to.
+    :param index: The zero-based chunk number.
+    :param stream: The request body stream.
+    :return: The size of the stored chunk in bytes.
+    :raises ChunkTooLarge: If the chunk exceeds UPLOAD_CHUNK_MAX_SIZE.
+    """
+    directory = upload_session_dir(session)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f"{index}.{uuid.uuid4().hex}.tmp")
+    size = 0
+    try:
+        with open(temp_path, 'wb') as chunk_file:
+            while stream is not None:
+                data = stream.read(UPLOAD_READ_SIZE)
+                if not data:
+                    break
+                size += len(data)
+                if size > settings.UPLOAD_CHUNK_MAX_SIZE:
+                    raise ChunkTooLarge
+                chunk_file.write(data)
+        os.replace(temp_path, chunk_path(session, index))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return size
+
+
+def chunk_count(session: UploadSession) -> int:
+    """
+    Returns the number of chunks an upload is made of: every chunk but the
+    last holds UPLOAD_CHUNK_MAX_SIZE bytes. Sessions started without a size
+    are bounded by UPLOAD_MAX_SIZE.
+    """
+    size = settings.UPLOAD_MAX_SIZE if session.size is None else session.size
+    return max(1, -(-size // settings.UPLOAD_CHUNK_MAX_SIZE))
+
+
+def missing_chunks(session: UploadSession) -> List[int]:
+    """
+    Returns the indexes missing from chunks 0 to chunk_count() - 1, or, for a
+    session started without a size, from the run of chunks up to the last
+    one received. Gaps are found by walking the received chunks, so the cost
+    depends on what was received, not on the highest index.
+    """
+    chunks = received_chunks(session)
+    if session.size is not None:
+        end = chunk_count(session)
+    else:
+        end = chunks[-1] + 1 if chunks else 1
+    missing = []
+    expected = 0
+    for index in chunks + [end]:
+        missing.extend(range(expected, index))
+        expected = index + 1
+    return missing
+
+
+def assemble_upload(session: UploadSession) -> PartFile:
+    """
+    Concatenates the chunks of a complete upload session into a single file
+    and stores it as a new PartFile. The caller discards the chunks once the
+    PartFile has been committed.
+
+    :param session: An upload session whose chunks are all present.
+    :return: The created PartFile.
+    """
+    directory = upload_session_dir(session)
+    assembled_path = os.path.join(directory, 'assembled')
+    with open(assembled_path, 'wb') as assembled:
+        for index in received_chunks(session):
+            with open(chunk_path(session, index), 'rb') as chunk_file:
+                shutil.copyfileobj(chunk_file, assembled, UPLOAD_READ_SIZE)
+
+    part_file = PartFile(part=session.part, file_name=session.file_name)
+    with open(assembled_path, 'rb') as assembled:
+        part_file.store_file(session.file_name, AssembledUpload(assembled))
+    part_file.save()
+    return part_file
+
+
+def discard_chunks(session: UploadSession) -> None:
+    shutil.rmtree(upload_session_dir(session), ignore_errors=True)
@@ -2,17 +2,42 @@ from django.urls import path
 from .views import (
     ListPartsView,
     UploadFileView,
+    BulkUploadFileView,
+    StartUploadView,
+    UploadSessionView,
+    UploadChunkView,
+    CompleteUploadView,
     DownloadSingleFileView,
     DownloadAllFilesForPartView,
-    DownloadAllFilesForAutomobileView, ListAutomobilesView, GetAutomobileView
+    DownloadAllFilesForAutomobileView, ListAutomobilesView, GetAutomobileView, ExportCatalogueView
 )
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
+from django.conf import settings
+
+if settings.ASYNC_VIEWS:
+    # ASGI deployment: serve the I/O-bound endpoints with their async variants.
+    from .async_views import (
+        AsyncListPartsView as ListPartsView,
+        AsyncUploadFileView as UploadFileView,
+        AsyncDownloadSingleFileView as DownloadSingleFileView,
+        AsyncDownloadAllFilesForPartView as DownloadAllFilesForPartView,
+        AsyncDownloadAllFilesForAutomobileView as DownloadAllFilesForAutomobileView,
+        AsyncListAutomobilesView as ListAutomobilesView,
+        AsyncGetAutomobileView as GetAutomobileView,
+        AsyncExportCatalogueView as ExportCatalogueView,
+    )
 
 urlpatterns = [
     path('automobiles/<int:automobile_id>/parts/', ListPartsView.as_view(), name='list_parts'),
     path('automobiles/<int:automobile_id>/parts/<int:part_id>/upload/', UploadFileView.as_view(), name='upload_file'),
+    path('automobiles/<int:automobile_id>/parts/<int:part_id>/uploads/', StartUploadView.as_view(), name='start_upload'),
+    path('automobiles/<int:automobile_id>/parts/<int:part_id>/uploads/<uuid:upload_id>/', UploadSessionView.as_view(), name='upload_session'),
+    path('automobiles/<int:automobile_id>/parts/<int:part_id>/uploads/<uuid:upload_id>/chunks/<int:index>/', UploadChunkView.as_view(), name='upload_chunk'),
+    path('automobiles/<int:automobile_id>/parts/<int:part_id>/uploads/<uuid:upload_id>/complete/', CompleteUploadView.as_view(), name='complete_upload'),
+    path('automobiles/<int:automobile_id>/bulk_upload/', BulkUploadFileView.as_view(), name='bulk_upload_files'),
     path('automobiles/<int:automobile_id>/download_all/', DownloadAllFilesForAutomobileView.as_view(), name='download_all_files_for_automobile'),
     path('automobiles/', ListAutomobilesView.as_view(), name ='list_automobiles'),
+    path('automobiles/export/', ExportCatalogueView.as_view(), name='export_catalogue'),
     path('automobiles/<str:pk>/', GetAutomobileView.as_view(), name='get_automobile'),
     path('parts/<int:part_id>/files/<int:file_id>/download/', DownloadSingleFileView.as_view(), name='download_single_file'),
     path('parts/<int:part_id>/download_all/', DownloadAllFilesForPartView.as_view(), name='download_all_files_for_part'),
@@ -1,25 +1,323 @@
-import io
-import zipfile
+import mimetypes
 import os
-from typing import List, Any, Dict
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Any, BinaryIO, Deque, Dict, Iterable, Iterator, Optional, Set, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+from django.conf import settings
 from rest_framework.request import Request
 from .models import Part, PartFile
 
 
-def create_zip(file_paths: List[str]) -> io.BytesIO:
+ZIP_CHUNK_SIZE = 64 * 1024
+ZIP_SPOOL_SIZE = 2 * 1024 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+COMPRESSIBILITY_SAMPLE_SIZE = 64 * 1024
+COMPRESSED_CONTENT_TYPES = {
+    'application/zip', 'application/gzip', 'application/x-gzip', 'application/x-bzip2', 'application/x-xz',
+    'application/x-7z-compressed', 'application/x-rar-compressed', 'application/vnd.rar', 'application/zstd',
+    'application/pdf',
+}
+# Bit 3: CRC and sizes follow the data in a data descriptor; bit 11: UTF-8 names.
+_FLAGS = 0x08 | 0x800
+
+_compression_pool: Optional[ThreadPoolExecutor] = None
+_compression_pool_lock = threading.Lock()
+
+
+def unique_arcname(arcname: str, used: Set[str]) -> str:
+    """
+    Returns the archive member name, suffixed with a counter if it is already
+    taken (``spec.pdf``, ``spec_1.pdf``, ...), and records it as used.
+
+    :param arcname: The desired member name.
+    :param used: The set of member names already written to the archive.
+    :return: A member name that does not collide with any in ``used``.
+    """
+    root, extension = os.path.splitext(arcname)
+    candidate = arcname
+    counter = 1
+    while candidate in used:
+        candidate = f"{root}_{counter}{extension}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+class _ZipMember:
+    """
+    An archive member written with a data descriptor (general purpose flag
+    bit 3): the local header goes out before the file is read, and the CRC
+    and sizes follow the data. Stored members are read straight from disk
+    while they are streamed; deflated members are either compressed as they
+    are streamed or, when they are queued behind another member, compressed
+    ahead of time in the compression pool.
     """
-    Creates an in-memory ZIP file from the given file paths.
 
-    :param file_paths: A list of file paths to include in the ZIP archive.
-    :return: A BytesIO object containing the ZIP data in memory.
+    def __init__(self, path: str, arcname: str):
+        self.path = path
+        self.arcname = arcname
+        self.date_time = (1980, 1, 1, 0, 0, 0)
+        self.external_attr = 0
+        self.method: Optional[int] = None
+        self.zip64 = False
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+        self.offset = 0
+        self.data: Optional[BinaryIO] = None
+
+    def inspect(self, level: int) -> None:
+        """
+        Reads the file's attributes and chooses between store and deflate.
+        Members that may exceed 4 GiB get ZIP64 sizes in their local header and
+        data descriptor, since their sizes are not known when the header is
+        written.
+        """
+        stat = os.stat(self.path)
+        self.date_time = time.localtime(stat.st_mtime)[:6]
+        self.external_attr = (stat.st_mode & 0xFFFF) << 16
+        self.zip64 = stat.st_size * 1.05 >= ZIP64_LIMIT
+        self.method = ZIP_DEFLATED if should_deflate(self.path, self.arcname, level) else ZIP_STORED
+
+    def compress_ahead(self, level: int, chunk_size: int) -> '_ZipMember':
+        """
+        Runs in the compression pool: compresses a deflated member into a
+        spooled temporary file, computing its CRC and sizes. Stored members
+        are left to be read while they are streamed. zlib releases the GIL
+        while compressing, so members compress in parallel.
+        """
+        self.inspect(level)
+        if self.method != ZIP_DEFLATED:
+            return self
+        self.data = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE)
+        try:
+            for chunk in self.read_data(level, chunk_size):
+                self.data.write(chunk)
+            self.data.seek(0)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def read_data(self, level: int, chunk_size: int) -> Iterator[bytes]:
+        """
+        Reads the file once, updating the CRC and sizes, and yields the member
+        data: the file's bytes, deflated if the member is.
+        """
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if self.method == ZIP_DEFLATED else None
+        with open(self.path, 'rb') as src:
+            for chunk in iter(lambda: src.read(chunk_size), b''):
+                self.crc = zlib.crc32(chunk, self.crc)
+                self.size += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                    if not chunk:
+                        continue
+                self.compressed_size += len(chunk)
+                yield chunk
+        if compressor is not None:
+            chunk = compressor.flush()
+            self.compressed_size += len(chunk)
+            yield chunk
+
+    def stream(self, offset: int, level: int, chunk_size: int) -> Iterator[bytes]:
+        """
+        Yields the local header, the member data and the data descriptor.
+
+        :param offset: The offset of the local header in the archive.
+        :raises RuntimeError: If a member without ZIP64 sizes outgrew 4 GiB.
+        """
+        self.offset = offset
+        if self.method is None:
+            self.inspect(level)
+        yield self.local_header()
+        if self.data is not None:
+            with self.data:
+                yield from iter(lambda: self.data.read(chunk_size), b'')
+            self.data = None
+        else:
+            yield from self.read_data(level, chunk_size)
+        if not self.zip64 and (self.size >= ZIP64_LIMIT or self.compressed_size >= ZIP64_LIMIT):
+            raise RuntimeError(f"{self.path} grew past 4 GiB while it was being archived")
+        yield self.data_descriptor()
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+
+    @property
+    def version(self) -> int:
+        return 45 if self.zip64 or self.offset >= ZIP64_LIMIT else 20
+
+    @property
+    def dos_time(self) -> Tuple[int, int]:
+        year, month, day, hour, minute, second = self.date_time
+        if year < 1980:
+            year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+        return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+    def local_header(self) -> bytes:
+        name = self.arcname.encode('utf-8')
+        dos_time, dos_date = self.dos_time
+        extra = b''
+        sizes = 0
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+            sizes = 0xFFFFFFFF
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034B50, 45 if self.zip64 else 20, _FLAGS, self.method, dos_time, dos_date,
+            0, sizes, sizes, len(name), len(extra),
+        ) + name + extra
+
+    def data_descriptor(self) -> bytes:
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074B50, self.crc, self.compressed_size, self.size)
+        return struct.pack('<IIII', 0x08074B50, self.crc, self.compressed_size, self.size)
+
+    def central_directory_header(self) -> bytes:
+        name = self.arcname.encode('utf-8')
+        dos_time, dos_date = self.dos_time
+        zip64_fields = []
+        size, compressed_size, offset = self.size, self.compressed_size, self.offset
+        if size >= ZIP64_LIMIT:
+            zip64_fields.append(size)
+            size = 0xFFFFFFFF
+        if compressed_size >= ZIP64_LIMIT:
+            zip64_fields.append(compressed_size)
+            compressed_size = 0xFFFFFFFF
+        if offset >= ZIP64_LIMIT:
+            zip64_fields.append(offset)
+            offset = 0xFFFFFFFF
+        extra = b''
+        if zip64_fields:
+            extra = struct.pack(f'<HH{len(zip64_fields)}Q', 0x0001, 8 * len(zip64_fields), *zip64_fields)
+        version = self.version
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014B50, (3 << 8) | version, version, _FLAGS, self.method,
+            dos_time, dos_date, self.crc, compressed_size, size, len(name), len(extra), 0, 0, 0,
+            self.external_attr, offset,
+        ) + name + extra
+
+
+def _end_of_central_directory(count: int, directory_offset: int, directory_size: int) -> bytes:
+    """
+    Builds the end of central directory record, preceded by the ZIP64 end
+    record and locator when the archive exceeds the classic format's limits.
     """
-    in_memory = io.BytesIO()
-    with zipfile.ZipFile(in_memory, 'w') as zf:
-        for file_path in file_paths:
-            filename = os.path.basename(file_path)
-            zf.write(file_path, arcname=filename)
-    in_memory.seek(0)
-    return in_memory
+    records = b''
+    if count >= 0xFFFF or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+        zip64_offset = directory_offset + directory_size
+        records = struct.pack(
+            '<IQHHIIQQQQ', 0x06064B50, 44, (3 << 8) | 45, 45, 0, 0, count, count,
+            directory_size, directory_offset,
+        ) + struct.pack('<IIQI', 0x07064B50, 0, zip64_offset, 1)
+        count = min(count, 0xFFFF)
+        directory_offset = min(directory_offset, 0xFFFFFFFF)
+        directory_size = min(directory_size, 0xFFFFFFFF)
+    return records + struct.pack('<IHHHHIIH', 0x06054B50, 0, 0, count, count, directory_size, directory_offset, 0)
+
+
+def should_deflate(path: str, arcname: str, level: int) -> bool:
+    """
+    Decides whether a file is worth deflating: never at level 0, never for
+    formats that are already compressed (images, audio, video, archives), and
+    otherwise only if a fast trial compression of its first block shrinks it
+    by at least 10%.
+
+    :param path: The path of the file.
+    :param arcname: The archive member name, used to guess the content type.
+    :param level: The zlib compression level of the archive.
+    :return: True to deflate the member, False to store it.
+    """
+    if level == 0:
+        return False
+    content_type = mimetypes.guess_type(arcname)[0] or ''
+    if content_type in COMPRESSED_CONTENT_TYPES or (
+            content_type.split('/')[0] in ('image', 'audio', 'video') and content_type not in ('image/svg+xml', 'image/bmp')):
+        return False
+    with open(path, 'rb') as file:
+        sample = file.read(COMPRESSIBILITY_SAMPLE_SIZE)
+    return bool(sample) and len(zlib.compress(sample, 1)) <= len(sample) * 0.9
+
+
+def compression_pool() -> ThreadPoolExecutor:
+    """
+    Returns the process-wide pool that compresses archive members ahead of the
+    one being streamed, creating it with ARCHIVE_COMPRESSION_WORKERS threads on
+    first use. All archive downloads share it, so concurrent requests do not
+    multiply the number of compression threads.
+    """
+    global _compression_pool
+    with _compression_pool_lock:
+        if _compression_pool is None:
+            _compression_pool = ThreadPoolExecutor(max_workers=settings.ARCHIVE_COMPRESSION_WORKERS,
+                                                   thread_name_prefix='zip-compression')
+        return _compression_pool
+
+
+def _close_compressed(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def stream_zip(files: Iterable[Tuple[str, str]], chunk_size: int = ZIP_CHUNK_SIZE,
+               compression_level: int = 0, workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Lazily builds a ZIP archive from the given files, yielding the archive
+    bytes in member order. Every member is written with a data descriptor, so
+    its local header and data are sent as the file is read. The member being
+    streamed is read (and deflated) on the fly; up to ``workers`` members
+    queued behind it are deflated ahead in the shared compression pool, so
+    large archives use every core. Compressed members spill to disk beyond
+    ZIP_SPOOL_SIZE. Each member is either stored or deflated, as decided by
+    should_deflate().
+
+    :param files: An iterable of (file path, archive member name) pairs.
+    :param chunk_size: The number of bytes read from each file per iteration.
+    :param compression_level: The zlib level for deflated members; 0 stores every member.
+    :param workers: The number of members compressed ahead, ARCHIVE_COMPRESSION_WORKERS by default.
+    :return: An iterator over the bytes of the ZIP archive.
+    """
+    lookahead = settings.ARCHIVE_COMPRESSION_WORKERS if workers is None else workers
+    pool = compression_pool() if lookahead and compression_level else None
+    used_arcnames: Set[str] = set()
+    members = (_ZipMember(path, unique_arcname(arcname, used_arcnames)) for path, arcname in files)
+    queued: Deque[Tuple[_ZipMember, Optional[Future]]] = deque()
+    written: List[_ZipMember] = []
+    offset = 0
+
+    try:
+        while True:
+            for member in members:
+                # The next member to stream is read on the fly; only those behind it are compressed ahead.
+                future = pool.submit(member.compress_ahead, compression_level, chunk_size) if queued and pool else None
+                queued.append((member, future))
+                if len(queued) > lookahead:
+                    break
+            if not queued:
+                break
+            member, future = queued.popleft()
+            # A member the pool has not started yet is quicker to compress here than to wait for.
+            if future is not None and not future.cancel():
+                future.result()
+            for chunk in member.stream(offset, compression_level, chunk_size):
+                offset += len(chunk)
+                yield chunk
+            written.append(member)
+    finally:
+        for member, future in queued:
+            if future is not None and not future.cancel():
+                future.add_done_callback(_close_compressed)
+
+    directory = b''.join(member.central_directory_header() for member in written)
+    yield directory + _end_of_central_directory(len(written), offset, len(directory))
 
 
 def build_payload(request: Request, part: Part, part_file: PartFile) -> Dict[str, Any]:
@@ -32,8 +330,18 @@ def build_payload(request: Request, part: Part, part_file: PartFile) -> Dict[str
     :param part_file: The PartFile instance representing the uploaded file.
     :return: A dictionary with 'automobile' and 'part' keys describing the resource.
     """
+    return upload_payload(part, request.build_absolute_uri(part_file.file.url))
+
+
+def upload_payload(part: Part, file_download_link: str) -> Dict[str, Any]:
+    """
+    Builds the notification payload of a file uploaded to a part.
+
+    :param part: The Part instance associated with the file, with its automobile.
+    :param file_download_link: The absolute URL of the uploaded file.
+    :return: A dictionary with 'automobile' and 'part' keys describing the resource.
+    """
     automobile = part.automobile
-    file_download_link = request.build_absolute_uri(part_file.file.url)
 
     payload = {
         "automobile": {
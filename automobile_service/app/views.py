@@ -1,35 +1,106 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse, HttpResponse
+from django.conf import settings
+from django.db import transaction
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Automobile, Part, PartFile
-from .serializers import PartSerializer, UploadFileContentSerializer, AutomobileSerializer
-from automobile_service.celery import app as celery_app
-from app.models import Automobile
-import os
-from .utils import create_zip, build_payload
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from .models import Automobile, Part, PartFile, UploadSession
+from .serializers import (
+    PartSerializer, UploadFileContentSerializer, AutomobileSerializer, BulkUploadItemSerializer,
+    StartUploadSerializer, UploadSessionSerializer, ExportQuerySerializer,
+)
+from .utils import build_payload
+from .query_planning import QueryPlanMixin
+from .filters import filter_automobiles, filter_parts
+from .fast_serializers import AUTOMOBILE_COLUMNS, PART_COLUMNS, serialize_automobiles, serialize_parts
+from .renderers import ORJSONRenderer
+from .export import EXPORT_CONTENT_TYPE, EXPORT_STARTED_HEADER, export_watermark, iter_export
+from .pagination import PaginationMixin
+from .downloads import get_download_backend
+from .archives import AUTOMOBILE_SCOPE, PART_SCOPE, CachedArchive, archive_response, invalidate_upload_archives
+from .tasks import build_archive_task
+from .outbox import enqueue_task
+from .uploads import (
+    ChunkTooLarge, assemble_upload, chunk_count, discard_chunks, missing_chunks, received_size, write_chunk,
+)
+from .response_cache import (
+    AUTOMOBILE_LIST_SCOPE, automobile_scope, cached_representation, conditional_response,
+    invalidate_automobile_responses,
+)
+
+
+def automobile_pk(pk: str) -> int:
+    """
+    Parses the primary key of the automobile detail route, which accepts any
+    string, so that e.g. '05' and '5' share the cache scope invalidated for 5.
+
+    :raises Http404: If the key is not an integer.
+    """
+    try:
+        return int(pk)
+    except ValueError:
+        raise Http404
 
 
-class ListPartsView(APIView):
+def publish_upload(request, part: Part, part_file: PartFile) -> None:
+    """
+    Queues the email notification for a newly uploaded file in the outbox and,
+    when ARCHIVE_PREBUILD is enabled, the rebuild of the part and automobile
+    archives. Must be called in the transaction that creates the PartFile.
+
+    :param request: The incoming HTTP request, used to build the file link.
+    :param part: The part that received the file.
+    :param part_file: The uploaded PartFile.
+    """
+    payload = build_payload(request, part, part_file)
+
+    enqueue_task('email_app.tasks.send_email_task', [payload])
+
+    if settings.ARCHIVE_PREBUILD:
+        enqueue_task(build_archive_task.name, [PART_SCOPE, part.id])
+        enqueue_task(build_archive_task.name, [AUTOMOBILE_SCOPE, part.automobile_id])
+
+
+class ListPartsView(QueryPlanMixin, PaginationMixin, APIView):
     """
     Retrieves a list of parts for a specific automobile.
     """
 
+    queryset = Part.objects.all()
+    serializer_class = PartSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request, automobile_id):
         """
-        Handles GET requests to list all parts associated with a given automobile.
+        Handles GET requests to list the parts associated with a given automobile,
+        one cursor-paginated page at a time, optionally filtered by an exact
+        ``name`` or a ``search`` term. Without a field selection, pages are
+        serialized from values() rows (see fast_serializers). Pages are served
+        from the response cache and support conditional requests.
 
         :param request: The incoming HTTP request.
         :param automobile_id: The ID of the automobile to retrieve parts for.
-        :return: A Response containing serialized parts data.
+        :return: A paginated Response containing serialized parts data.
         """
 
-        automobile = get_object_or_404(Automobile, id=automobile_id)
-        parts = automobile.parts.all()
-        serializer = PartSerializer(parts, many=True, context={'request': request})
-        return Response(serializer.data)
+        def render():
+            automobile = get_object_or_404(Automobile, id=automobile_id)
+            if self.get_field_selection().is_empty:
+                queryset = Part.objects.filter(automobile=automobile).values(*PART_COLUMNS)
+                parts = self.paginate_queryset(filter_parts(queryset, request.query_params))
+                return self.get_paginated_response(serialize_parts(parts, request)).data
+
+            parts = self.paginate_queryset(
+                filter_parts(self.get_queryset().filter(automobile=automobile), request.query_params))
+            serializer = self.get_serializer(parts, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data).data
+
+        representation = cached_representation(request, automobile_scope(automobile_id), render)
+        return conditional_response(request, representation, Response)
 
 
 class UploadFileView(APIView):
@@ -49,7 +120,10 @@ class UploadFileView(APIView):
     def post(self, request, automobile_id, part_id):
         """
         Handles the POST request to upload a file for a specified part,
-        creates a PartFile object, and triggers an email task via Celery.
+        creates a PartFile object, recording the file's size, checksum and
+        content type while it is stored, and queues an email task in the
+        outbox in the same transaction. When ARCHIVE_PREBUILD is enabled, the
+        part and automobile archives are also rebuilt in the background.
 
         :param request: The incoming HTTP request containing file_name and content.
         :param automobile_id: The ID of the automobile.
@@ -68,11 +142,268 @@ class UploadFileView(APIView):
 
         file_bytes = content.encode('utf-8')
         file_obj = SimpleUploadedFile(file_name, file_bytes)
-        part_file = PartFile.objects.create(part=part, file=file_obj)
+        with transaction.atomic():
+            part_file = PartFile.objects.create(part=part, file=file_obj)
+            publish_upload(request, part, part_file)
+
+        return Response(
+            {"message": "File uploaded successfully.", "file_id": part_file.id},
+            status=status.HTTP_201_CREATED)
+
+
+class BulkUploadFileView(APIView):
+    """
+    Uploads many files for one or more parts of an automobile in a single request.
+    """
 
-        payload = build_payload(request, part, part_file)
+    @staticmethod
+    def get_items(data):
+        """
+        Normalises the request body into a list of bulk upload items.
+
+        JSON bodies carry the items directly in a 'files' array. Multipart bodies
+        carry the uploads as repeated 'files' fields, paired positionally with
+        repeated 'part_id' fields or sharing a single 'part_id'.
+
+        :param data: The parsed request data.
+        :return: A list of item dictionaries, or None if the body has no items.
+        """
+        if hasattr(data, 'getlist'):
+            uploads = data.getlist('files')
+            part_ids = data.getlist('part_id')
+            if len(part_ids) == 1:
+                part_ids = part_ids * len(uploads)
+            if not uploads or len(part_ids) != len(uploads):
+                return None
+            return [{'part_id': part_id, 'file': upload} for part_id, upload in zip(part_ids, uploads)]
+
+        items = data.get('files')
+        return items if isinstance(items, list) and items else None
+
+    def post(self, request, automobile_id):
+        """
+        Validates every file of the request together, stores them, and inserts
+        all PartFile rows with a single bulk_create inside one transaction,
+        together with one aggregated notification task in the outbox. If the
+        request fails, the blobs it wrote are deleted again.
+
+        :param request: The incoming HTTP request containing the files.
+        :param automobile_id: The ID of the automobile owning the target parts.
+        :return: A Response with the created file IDs or the validation errors.
+        """
+
+        automobile = get_object_or_404(Automobile, id=automobile_id)
+
+        items = self.get_items(request.data)
+        if items is None:
+            return Response({"error": "No files provided, or part_id and files do not match up."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_UPLOAD_MAX_FILES:
+            return Response({"error": f"At most {settings.BULK_UPLOAD_MAX_FILES} files can be uploaded at once."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = BulkUploadItemSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        celery_app.send_task('email_app.tasks.send_email_task', args=[payload])
+        part_ids = {item['part_id'] for item in serializer.validated_data}
+        parts = Part.objects.select_related('automobile').filter(automobile=automobile).in_bulk(part_ids)
+        unknown_part_ids = sorted(part_ids - set(parts))
+        if unknown_part_ids:
+            return Response({"error": f"Parts {unknown_part_ids} do not belong to this automobile."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        part_files = []
+        written = {}
+        try:
+            for item in serializer.validated_data:
+                file_obj = item.get('file') or SimpleUploadedFile(item['file_name'], item['content'].encode('utf-8'))
+                part_file = PartFile(part=parts[item['part_id']], file_name=item['file_name'])
+                written_at = part_file.store_file(item['file_name'], file_obj)
+                if written_at is not None:
+                    written[part_file.file.name] = written_at
+                part_files.append(part_file)
+
+            with transaction.atomic():
+                PartFile.objects.bulk_create(part_files)
+                transaction.on_commit(lambda: (
+                    invalidate_upload_archives(automobile, parts.values()),
+                    invalidate_automobile_responses(automobile.id),
+                ))
+
+                payloads = [build_payload(request, part_file.part, part_file) for part_file in part_files]
+                enqueue_task('email_app.tasks.send_bulk_email_task', [payloads])
+
+                if settings.ARCHIVE_PREBUILD:
+                    for part in parts.values():
+                        enqueue_task(build_archive_task.name, [PART_SCOPE, part.id])
+                    enqueue_task(build_archive_task.name, [AUTOMOBILE_SCOPE, automobile.id])
+        except Exception:
+            storage = PartFile._meta.get_field('file').storage
+            for name, written_at in written.items():
+                storage.discard(name, written_at, PartFile.objects.filter(file=name).exists)
+            raise
+
+        return Response(
+            {"message": f"{len(part_files)} files uploaded successfully.",
+             "file_ids": [part_file.id for part_file in part_files]},
+            status=status.HTTP_201_CREATED)
+
+
+class StartUploadView(APIView):
+    """
+    Starts a resumable chunked upload of a (possibly binary or large) file to a part.
+    """
+
+    def post(self, request, automobile_id, part_id):
+        """
+        Creates an upload session. The client then PUTs the file's bytes as
+        numbered chunks and completes the session to create the PartFile.
+
+        :param request: The incoming HTTP request containing file_name and size.
+        :param automobile_id: The ID of the automobile.
+        :param part_id: The ID of the part to which the file will be uploaded.
+        :return: A Response with the upload session, including its upload_id.
+        """
+
+        part = get_object_or_404(Part, id=part_id, automobile__id=automobile_id)
+
+        serializer = StartUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.create(part=part, **serializer.validated_data)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionMixin:
+    """
+    Looks up the upload session addressed by a chunked upload URL.
+    """
+
+    @staticmethod
+    def get_session(automobile_id: int, part_id: int, upload_id) -> UploadSession:
+        return get_object_or_404(UploadSession.objects.select_related('part__automobile'),
+                                 id=upload_id, part_id=part_id, part__automobile_id=automobile_id)
+
+
+class UploadSessionView(UploadSessionMixin, APIView):
+    """
+    Reports or aborts a chunked upload.
+    """
+
+    def get(self, request, automobile_id, part_id, upload_id):
+        """
+        Returns the state of an upload session, including the chunks received
+        so far, so an interrupted client can resume with the missing ones.
+
+        :param request: The incoming HTTP request.
+        :param automobile_id: The ID of the automobile.
+        :param part_id: The ID of the part.
+        :param upload_id: The ID of the upload session.
+        :return: A Response with the serialized upload session.
+        """
+
+        session = self.get_session(automobile_id, part_id, upload_id)
+        return Response(UploadSessionSerializer(session).data)
+
+    def delete(self, request, automobile_id, part_id, upload_id):
+        """
+        Aborts an upload session and discards its chunks.
+
+        :param request: The incoming HTTP request.
+        :param automobile_id: The ID of the automobile.
+        :param part_id: The ID of the part.
+        :param upload_id: The ID of the upload session.
+        :return: An empty 204 Response.
+        """
+
+        self.get_session(automobile_id, part_id, upload_id).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadChunkView(UploadSessionMixin, APIView):
+    """
+    Receives one numbered chunk of a chunked upload as the raw request body.
+    """
+
+    def put(self, request, automobile_id, part_id, upload_id, index):
+        """
+        Streams the request body to disk as chunk 'index' of the upload,
+        replacing any earlier copy of that chunk. The body is never loaded into
+        memory as a whole, and needs no text encoding. Indexes beyond the
+        session's announced size are rejected.
+
+        :param request: The incoming HTTP request whose body is the chunk's bytes.
+        :param automobile_id: The ID of the automobile.
+        :param part_id: The ID of the part.
+        :param upload_id: The ID of the upload session.
+        :param index: The zero-based chunk number.
+        :return: A Response with the stored chunk's index and size.
+        """
+
+        session = self.get_session(automobile_id, part_id, upload_id)
+        if session.part_file_id is not None:
+            return Response({"error": "This upload has already been completed."}, status=status.HTTP_409_CONFLICT)
+
+        if index >= chunk_count(session):
+            return Response({"error": f"This upload has chunks 0 to {chunk_count(session) - 1}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        too_large = Response({"error": f"Chunks may be at most {settings.UPLOAD_CHUNK_MAX_SIZE} bytes."},
+                             status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if int(request.META.get('CONTENT_LENGTH') or 0) > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return too_large
+        if request.stream is None:
+            return Response({"error": "The chunk is empty."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            size = write_chunk(session, index, request.stream)
+        except ChunkTooLarge:
+            return too_large
+        return Response({"index": index, "size": size})
+
+
+class CompleteUploadView(UploadSessionMixin, APIView):
+    """
+    Completes a chunked upload into a PartFile.
+    """
+
+    def post(self, request, automobile_id, part_id, upload_id):
+        """
+        Checks that chunks 0..n are all present and add up to the announced
+        size, assembles them into a PartFile and triggers the email
+        notification like a regular upload. Completing a session again returns
+        the same file.
+
+        :param request: The incoming HTTP request.
+        :param automobile_id: The ID of the automobile.
+        :param part_id: The ID of the part.
+        :param upload_id: The ID of the upload session.
+        :return: A Response with the created file ID, or the missing chunks.
+        """
+
+        session = self.get_session(automobile_id, part_id, upload_id)
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().select_related('part__automobile').get(pk=session.pk)
+            if session.part_file_id is not None:
+                return Response({"message": "File uploaded successfully.", "file_id": session.part_file_id})
+
+            missing = missing_chunks(session)
+            if missing:
+                return Response({"error": "Some chunks are missing.", "missing_chunks": missing},
+                                status=status.HTTP_400_BAD_REQUEST)
+            size = received_size(session)
+            if session.size is not None and size != session.size:
+                return Response({"error": f"Expected {session.size} bytes but received {size}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            part_file = assemble_upload(session)
+            session.part_file = part_file
+            session.save(update_fields=['part_file'])
+            publish_upload(request, session.part, part_file)
+            transaction.on_commit(lambda: discard_chunks(session))
 
         return Response(
             {"message": "File uploaded successfully.", "file_id": part_file.id},
@@ -86,27 +417,17 @@ class DownloadSingleFileView(APIView):
 
     def get(self, request, part_id, file_id):
         """
-        Returns a downloadable file response for the specified part file.
+        Returns a downloadable file response for the specified part file,
+        delivered by the configured download backend.
 
-        :param request: The incoming HTTP request.
+        :param request: The incoming HTTP request, optionally with a Range header.
         :param part_id: The ID of the part.
         :param file_id: The ID of the file to download.
         :return: An HttpResponse prompting the user to download the file.
         """
 
-        part = get_object_or_404(Part, id=part_id)
-        part_file = get_object_or_404(PartFile, id=file_id, part=part)
-        file_path = part_file.file.path
-
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        filename = os.path.basename(file_path)
-
-        response = HttpResponse(file_data, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        return response
+        part_file = get_object_or_404(PartFile, id=file_id, part_id=part_id)
+        return get_download_backend().serve(request, part_file)
 
 
 class DownloadAllFilesForPartView(APIView):
@@ -116,23 +437,19 @@ class DownloadAllFilesForPartView(APIView):
 
     def get(self, request, part_id):
         """
-        Creates a ZIP archive of all files for the given part and returns it
-        as a downloadable response.
+        Returns a ZIP archive of all files for the given part as a downloadable
+        response, served from the archive cache when this version was built before.
 
-        :param request: The incoming HTTP request.
+        :param request: The incoming HTTP request, optionally with If-None-Match.
         :param part_id: The ID of the part.
-        :return: An HttpResponse with a ZIP file attachment.
+        :return: An HttpResponse with a ZIP file attachment and an ETag.
         """
 
-        part = get_object_or_404(Part, id=part_id)
-        files = part.files.all()
-        if not files:
+        part = get_object_or_404(Part.objects.select_related('automobile'), id=part_id)
+        archive = CachedArchive.for_object(PART_SCOPE, part.id)
+        if not archive.members:
             return Response({"error": "No files found for this part."}, status=status.HTTP_404_NOT_FOUND)
-        file_paths = [pf.file.path for pf in files]
-        zip_file = create_zip(file_paths)
-        response = HttpResponse(zip_file, content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="{part.name}_{part.automobile}_files.zip"'
-        return response
+        return archive_response(request, archive, f"{part.name}_{part.automobile}_files.zip")
 
 
 class DownloadAllFilesForAutomobileView(APIView):
@@ -142,61 +459,107 @@ class DownloadAllFilesForAutomobileView(APIView):
 
     def get(self, request, automobile_id):
         """
-        Creates a ZIP archive of all files associated with the given automobile
-        and returns it as a downloadable response.
+        Returns a ZIP archive of all files associated with the given automobile
+        as a downloadable response, served from the archive cache when this
+        version was built before.
 
-        :param request: The incoming HTTP request.
+        :param request: The incoming HTTP request, optionally with If-None-Match.
         :param automobile_id: The ID of the automobile.
-        :return: An HttpResponse with a ZIP file attachment.
+        :return: An HttpResponse with a ZIP file attachment and an ETag.
         """
 
         automobile = get_object_or_404(Automobile, id=automobile_id)
-        parts = automobile.parts.all()
-        file_paths = []
-        for part in parts:
-            for pf in part.files.all():
-                file_paths.append(pf.file.path)
-        if not file_paths:
+        archive = CachedArchive.for_object(AUTOMOBILE_SCOPE, automobile.id)
+        if not archive.members:
             return Response({"error": "No files found for this automobile."}, status=status.HTTP_404_NOT_FOUND)
-        zip_file = create_zip(file_paths)
-        response = HttpResponse(zip_file, content_type='application/zip')
-        response[
-            'Content-Disposition'] = f'attachment; filename="{automobile.manufacturer}_{automobile.model}_files.zip"'
-        return response
+        return archive_response(request, archive, f"{automobile.manufacturer}_{automobile.model}_files.zip")
 
 
-class ListAutomobilesView(APIView):
+class ListAutomobilesView(QueryPlanMixin, PaginationMixin, APIView):
     """
     Lists all automobiles in the system.
     """
 
+    queryset = Automobile.objects.all()
+    serializer_class = AutomobileSerializer
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request):
         """
-        Retrieves a list of all Automobile instances and returns them in serialized form.
+        Retrieves one cursor-paginated page of Automobile instances and returns
+        them in serialized form. Automobiles can be filtered by exact
+        ``manufacturer``, ``type`` and ``model`` values and searched with
+        ``search`` (see filter_automobiles()). Without a field selection,
+        pages are serialized from values() rows (see fast_serializers). Pages
+        are served from the response cache and support conditional requests.
 
         :param request: The incoming HTTP request.
-        :return: A Response containing serialized Automobile data.
+        :return: A paginated Response containing serialized Automobile data.
         """
 
-        queryset = Automobile.objects.all()
-        serializer = AutomobileSerializer(queryset, many=True, context={'request': request})
-        return Response(serializer.data)
+        def render():
+            if self.get_field_selection().is_empty:
+                queryset = Automobile.objects.values(*AUTOMOBILE_COLUMNS)
+                page = self.paginate_queryset(filter_automobiles(queryset, request.query_params))
+                return self.get_paginated_response(serialize_automobiles(page, request)).data
 
+            page = self.paginate_queryset(filter_automobiles(self.get_queryset(), request.query_params))
+            serializer = self.get_serializer(page, many=True, context={'request': request})
+            return self.get_paginated_response(serializer.data).data
 
-class GetAutomobileView(APIView):
+        representation = cached_representation(request, AUTOMOBILE_LIST_SCOPE, render)
+        return conditional_response(request, representation, Response)
+
+
+class ExportCatalogueView(APIView):
+    """
+    Exports the whole catalogue, or the part of it that changed, as NDJSON.
+    """
+
+    def get(self, request):
+        """
+        Streams every automobile with its parts and files, one JSON object per
+        line, in ID order. ``since_id`` limits the export to automobiles created
+        after that ID and ``since`` to those changed at or after that time,
+        followed by a tombstone line for each automobile deleted since. The
+        response's X-Export-Started-At header is the ``since`` value of the
+        next incremental export (see export_watermark()).
+
+        :param request: The incoming HTTP request.
+        :return: A StreamingHttpResponse with the NDJSON export.
+        """
+
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        started_at = timezone.now()
+        response = StreamingHttpResponse(iter_export(**params.validated_data, request=request),
+                                         content_type=EXPORT_CONTENT_TYPE)
+        response[EXPORT_STARTED_HEADER] = export_watermark(started_at).isoformat()
+        return response
+
+
+class GetAutomobileView(QueryPlanMixin, APIView):
     """
     Retrieves a single Automobile by its primary key.
     """
 
+    queryset = Automobile.objects.all()
+    serializer_class = AutomobileSerializer
+
     def get(self, request, pk):
         """
-        Returns the details of a specific Automobile identified by 'pk'.
+        Returns the details of a specific Automobile identified by 'pk', served
+        from the response cache and supporting conditional requests.
 
         :param request: The incoming HTTP request.
         :param pk: The primary key of the Automobile to retrieve.
         :return: A Response with the serialized Automobile data.
         """
+        pk = automobile_pk(pk)
+
+        def render():
+            automobile = get_object_or_404(self.get_queryset(), pk=pk)
+            return self.get_serializer(automobile, many=False).data
 
-        queryset = get_object_or_404(Automobile, pk=pk)
-        serializer = AutomobileSerializer(queryset, many=False)
-        return Response(serializer.data)
+        representation = cached_representation(request, automobile_scope(pk), render)
+        return conditional_response(request, representation, Response)
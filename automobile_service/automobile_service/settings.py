@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,21 +77,52 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'automobile_service.wsgi.application'
 
+# Serve the download, upload and listing endpoints with async views. Enable
+# this when running under ASGI (see the automobile_service_asgi compose service).
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# DB_POOL_MODE selects how database connections are reused:
+# - 'persistent': every gunicorn worker thread and Celery worker process keeps
+#   its connection for up to DB_CONN_MAX_AGE seconds. Sync (WSGI) only.
+# - 'pgbouncer': DB_HOST/DB_PORT point at PgBouncer in transaction pooling
+#   mode, which keeps the server connections; Django opens a cheap client
+#   connection per request. Use this for the ASGI deployment.
+# - 'none': one new server connection per request.
+# See app/checks.py for how the connection budget is checked.
+DB_POOL_PERSISTENT = 'persistent'
+DB_POOL_PGBOUNCER = 'pgbouncer'
+DB_POOL_NONE = 'none'
+DB_POOL_MODE = env('DB_POOL_MODE', default=DB_POOL_NONE if ASYNC_VIEWS else DB_POOL_PERSISTENT)
+DB_CONN_MAX_AGE = env.int('DB_CONN_MAX_AGE', default=600)
+# Server connections available to this service: Postgres' max_connections
+# minus what other clients use, or PgBouncer's default_pool_size.
+DB_MAX_CONNECTIONS = env.int('DB_MAX_CONNECTIONS', default=100)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': env('DB_ENGINE', default='django.db.backends.postgresql'),
         'NAME': env('DB_NAME'),
         'USER': env('DB_USER'),
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE if DB_POOL_MODE == DB_POOL_PERSISTENT else 0,
+        # Test reused connections with a cheap query before each request.
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        # Server-side cursors do not survive PgBouncer's transaction pooling.
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == DB_POOL_PGBOUNCER,
     }
 }
 
+# gunicorn processes and threads per process (see gunicorn.conf.py); with the
+# Celery worker concurrency they hold this service's database connections.
+WEB_CONCURRENCY = env.int('WEB_CONCURRENCY', default=2)
+WEB_THREADS = env.int('WEB_THREADS', default=1)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -125,6 +157,28 @@ USE_TZ = True
 # Celery config
 CELERY_BROKER_URL = f"amqp://{env('BROKER_USER')}:{env('BROKER_PASSWORD')}@{env('BROKER_IP')}:{env('BROKER_PORT')}/"
 CELERY_RESULT_BACKEND = env('RESULT_BACKEND')
+CELERY_WORKER_CONCURRENCY = env.int('CELERY_WORKER_CONCURRENCY', default=os.cpu_count() or 1)
+# Each kind of task has its own queue: the email service consumes 'notifications' (and its own
+# 'digests'), the automobile worker 'archives'. Single-upload notifications go ahead of bulk ones.
+CELERY_TASK_ROUTES = {
+    'email_app.tasks.send_email_task': {'queue': 'notifications', 'priority': 6},
+    'email_app.tasks.send_bulk_email_task': {'queue': 'notifications', 'priority': 3},
+    'app.tasks.build_archive_task': {'queue': 'archives'},
+}
+# Must match the email service, as RabbitMQ rejects a queue redeclared with other arguments.
+CELERY_TASK_QUEUE_MAX_PRIORITY = 10
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# Archive builds are long: reserve one at a time so queued builds go to idle workers.
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1)
+
+# Transactional outbox: tasks are published by `manage.py relay_outbox`
+OUTBOX_RELAY_BATCH_SIZE = env.int('OUTBOX_RELAY_BATCH_SIZE', default=100)
+OUTBOX_RELAY_INTERVAL = env.float('OUTBOX_RELAY_INTERVAL', default=1.0)
+
+# Prometheus metrics are served at /metrics, and by Celery workers on this port (0 disables).
+WORKER_METRICS_PORT = env.int('WORKER_METRICS_PORT', default=9808)
+# Addresses or networks allowed to read /metrics on the application port; others get a 403
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
@@ -134,6 +188,57 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# File downloads
+# FILE_DOWNLOAD_BACKEND is one of app.downloads.StreamingDownloadBackend,
+# app.downloads.XAccelRedirectDownloadBackend or app.downloads.XSendfileDownloadBackend.
+FILE_DOWNLOAD_BACKEND = env('FILE_DOWNLOAD_BACKEND', default='app.downloads.StreamingDownloadBackend')
+FILE_DOWNLOAD_INTERNAL_URL = env('FILE_DOWNLOAD_INTERNAL_URL', default='/protected-media/')
+
+# ZIP archive cache, relative to MEDIA_ROOT
+ARCHIVE_CACHE_LOCATION = 'archive_cache'
+ARCHIVE_PREBUILD = env.bool('ARCHIVE_PREBUILD', default=False)
+# zlib level of each download_all endpoint (0 stores every file), and the
+# number of threads compressing archive members in parallel
+ARCHIVE_COMPRESSION_LEVELS = {
+    'part': env.int('ARCHIVE_PART_COMPRESSION_LEVEL', default=6),
+    'automobile': env.int('ARCHIVE_AUTOMOBILE_COMPRESSION_LEVEL', default=1),
+}
+ARCHIVE_COMPRESSION_WORKERS = env.int('ARCHIVE_COMPRESSION_WORKERS', default=os.cpu_count() or 1)
+
+# Response cache for the automobile and part read endpoints. CACHE_URL selects
+# the backend (e.g. redis://host:6379/1); the local-memory default is per process,
+# so gunicorn refuses it with several workers (see app.checks.check_response_cache()).
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', default=1000)}
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=300)
+
+# Blobs saved or reused this many seconds ago are not released yet, as the row referencing
+# them may not be committed; purge_orphan_blobs collects them later
+BLOB_RELEASE_GRACE_PERIOD = env.int('BLOB_RELEASE_GRACE_PERIOD', default=3600)
+
+# Chunked uploads: chunk storage relative to MEDIA_ROOT, the largest accepted chunk and file
+UPLOAD_SESSION_LOCATION = 'upload_sessions'
+UPLOAD_CHUNK_MAX_SIZE = env.int('UPLOAD_CHUNK_MAX_SIZE', default=8 * 1024 * 1024)
+UPLOAD_MAX_SIZE = env.int('UPLOAD_MAX_SIZE', default=10 * 1024 * 1024 * 1024)
+
+# Maximum number of files accepted by one bulk upload request
+BULK_UPLOAD_MAX_FILES = env.int('BULK_UPLOAD_MAX_FILES', default=500)
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Automobiles read per database round trip by the NDJSON catalogue export
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=500)
+# Seconds by which an incremental export overlaps the previous one, longer than any
+# transaction that changes automobiles, parts or files (see export_watermark())
+EXPORT_WATERMARK_OVERLAP = env.int('EXPORT_WATERMARK_OVERLAP', default=300)
+
+# Catalogue imports: manifest rows per transaction, and threads copying files
+IMPORT_BATCH_SIZE = env.int('IMPORT_BATCH_SIZE', default=1000)
+IMPORT_WORKERS = env.int('IMPORT_WORKERS', default=8)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -142,8 +247,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST_FRAMEWORK
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'app.pagination.IdCursorPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.renderers.InstrumentedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 SPECTACULAR_SETTINGS = {
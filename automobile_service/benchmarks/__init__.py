@@ -0,0 +1,7 @@
+"""
+Benchmarks for the automobile_service API.
+
+``python manage.py benchmark`` seeds synthetic fleets into a throwaway test
+database and measures the API in-process (see runner.py), while loadtest.py
+drives a running server over HTTP with slow concurrent clients.
+"""
@@ -0,0 +1,82 @@
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from .loadtest import percentile
+from .runner import WARMUP_ITERATIONS, reset_caches
+
+
+def wsgi_get(handler: WSGIHandler, path: str) -> None:
+    """
+    Sends a GET request through a WSGI handler, as gunicorn does. Unlike the
+    test client, this runs the request_started and request_finished handlers
+    that close connections older than CONN_MAX_AGE.
+
+    :raises RuntimeError: If the request fails.
+    """
+    environ = RequestFactory().get(path).environ
+    statuses = []
+    response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    if not statuses[0].startswith('2'):
+        raise RuntimeError(f"{path} returned {statuses[0]}")
+
+
+def measure_connection_reuse(path: str, iterations: int, conn_max_ages: Dict[str, int],
+                             report: Callable[[str], None] = print) -> Dict[str, Dict[str, float]]:
+    """
+    Measures the latency of an uncached request with each connection lifetime,
+    e.g. ``{'per_request': 0, 'persistent': 600}``, and counts the
+    connections opened. The difference is the cost of connecting to the
+    database (or to PgBouncer) per request.
+
+    :param path: The URL to request.
+    :param iterations: The number of timed requests per lifetime.
+    :param conn_max_ages: CONN_MAX_AGE values by name.
+    :param report: Receives a progress line after each lifetime.
+    :return: A mapping of name to metrics.
+    """
+    handler = WSGIHandler()
+    opened = []
+
+    def count(sender, **kwargs):
+        opened.append(sender)
+
+    original_max_age = connection.settings_dict['CONN_MAX_AGE']
+    connection_created.connect(count)
+    results = {}
+    try:
+        for name, max_age in conn_max_ages.items():
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = max_age
+            timings: List[float] = []
+            for iteration in range(WARMUP_ITERATIONS + iterations):
+                reset_caches()
+                if iteration == WARMUP_ITERATIONS:
+                    opened.clear()
+                started = time.perf_counter()
+                wsgi_get(handler, path)
+                if iteration >= WARMUP_ITERATIONS:
+                    timings.append((time.perf_counter() - started) * 1000)
+            results[name] = {
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'mean_ms': round(statistics.mean(timings), 3),
+                'connections': len(opened),
+            }
+            report(f"  {name:<20} CONN_MAX_AGE={max_age:<5} p50 {results[name]['p50_ms']:>8.2f}ms  "
+                   f"p95 {results[name]['p95_ms']:>8.2f}ms  connections opened {len(opened)}")
+    finally:
+        connection_created.disconnect(count)
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+    return results
@@ -0,0 +1,78 @@
+import os
+import random
+from typing import List
+
+from django.core.files.base import ContentFile
+
+from app.models import Automobile, Part, PartFile
+
+MANUFACTURERS = ['Volvo', 'Scania', 'MAN', 'Toyota', 'Ford', 'Renault', 'Iveco', 'Tesla']
+TYPES = ['Car', 'Truck', 'Bus', 'Van']
+PART_NAMES = ['Engine', 'Brakes', 'Gearbox', 'Axle', 'Cab', 'Battery']
+FILE_EXTENSIONS = ['.txt', '.pdf', '.csv', '.bin']
+
+PARTS_PER_AUTOMOBILE = 3
+FILES_PER_PART = 2
+BLOB_COUNT = 16
+BLOB_SIZE = 64 * 1024
+BATCH_SIZE = 2000
+
+
+def seed_blobs(rng: random.Random) -> List[PartFile]:
+    """
+    Stores BLOB_COUNT distinct files through PartFile.store_file() and returns
+    the unsaved PartFiles holding their names and metadata. Storage is
+    content-addressed, so seeded PartFiles share these blobs and fleets of any
+    size take a fixed amount of disk space.
+
+    :param rng: The random generator to derive file contents from.
+    :return: Unsaved PartFiles, one per blob.
+    """
+    blobs = []
+    for index in range(BLOB_COUNT):
+        if index % 2:
+            content = rng.randbytes(BLOB_SIZE)
+        else:
+            content = ''.join(f"row {row},{rng.randint(0, 10 ** 6)}\n" for row in range(BLOB_SIZE // 16)).encode()
+        extension = FILE_EXTENSIONS[index % len(FILE_EXTENSIONS)]
+        blob = PartFile()
+        blob.store_file(f"blob{index}{extension}", ContentFile(content))
+        blobs.append(blob)
+    return blobs
+
+
+def seed_fleet(count: int, blobs: List[PartFile], rng: random.Random) -> None:
+    """
+    Adds ``count`` automobiles, each with PARTS_PER_AUTOMOBILE parts of
+    FILES_PER_PART files, using bulk inserts in batches of BATCH_SIZE. Files
+    get the size, checksum and content type uploads record.
+
+    :param count: The number of automobiles to add.
+    :param blobs: The stored blobs seeded files point to, from seed_blobs().
+    :param rng: The random generator used for names.
+    """
+    for start in range(0, count, BATCH_SIZE):
+        automobiles = Automobile.objects.bulk_create([
+            Automobile(manufacturer=rng.choice(MANUFACTURERS), type=rng.choice(TYPES), model=f"M{start + index}")
+            for index in range(min(BATCH_SIZE, count - start))
+        ])
+        if automobiles[0].pk is None:
+            # Backends that do not return IDs from bulk inserts (e.g. older SQLite).
+            automobiles = list(Automobile.objects.order_by('-id')[:len(automobiles)])[::-1]
+
+        parts = Part.objects.bulk_create([
+            Part(automobile=automobile, name=PART_NAMES[index % len(PART_NAMES)])
+            for automobile in automobiles for index in range(PARTS_PER_AUTOMOBILE)
+        ])
+        if parts[0].pk is None:
+            parts = list(Part.objects.order_by('-id')[:len(parts)])[::-1]
+
+        part_files = []
+        for part in parts:
+            for index in range(FILES_PER_PART):
+                blob = rng.choice(blobs)
+                file_name = f"{part.name}-{index}{os.path.splitext(blob.file.name)[1]}"
+                part_file = PartFile(part=part, file=blob.file.name, file_name=file_name)
+                part_file.set_file_metadata(blob.size)
+                part_files.append(part_file)
+        PartFile.objects.bulk_create(part_files, batch_size=BATCH_SIZE)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Slow-client load test for the automobile_service download endpoints.
+
+Opens many concurrent connections to one URL and reads each response slowly,
+like clients on poor networks. It reports how many responses one server
+process streams at the same time, plus time-to-first-byte and total-time
+percentiles. Run it against a single-worker sync gunicorn and a single-worker
+ASGI deployment to compare concurrency per process:
+
+    gunicorn automobile_service.wsgi:application -w 1 --bind 127.0.0.1:8000
+    ASYNC_VIEWS=1 gunicorn automobile_service.asgi:application -w 1 \\
+        -k uvicorn.workers.UvicornWorker --bind 127.0.0.1:8000
+
+    python benchmarks/loadtest.py http://127.0.0.1:8000/api/parts/1/files/1/download/ \\
+        --clients 50 --read-delay 0.02
+
+Use a file larger than the socket buffers (a few MB), otherwise the kernel
+absorbs the whole response and slow clients never hold up the server.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+
+class Tracker:
+    """
+    Tracks how many responses are being streamed at the same time.
+    """
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def started(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def finished(self):
+        self.active -= 1
+
+
+async def fetch(url: str, read_size: int, read_delay: float, tracker: Tracker) -> Tuple[float, float, int]:
+    """
+    Downloads the URL once, reading read_size bytes every read_delay seconds.
+
+    :return: A tuple of (time to first byte, total time, bytes received).
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: close\r\n\r\n".encode('ascii'))
+    await writer.drain()
+
+    first_byte = None
+    received = 0
+    try:
+        while True:
+            chunk = await reader.read(read_size)
+            if not chunk:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+                tracker.started()
+            received += len(chunk)
+            await asyncio.sleep(read_delay)
+    finally:
+        if first_byte is not None:
+            tracker.finished()
+        writer.close()
+    return first_byte or 0.0, time.perf_counter() - started, received
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run(args: argparse.Namespace) -> None:
+    tracker = Tracker()
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        fetch(args.url, args.read_size, args.read_delay, tracker) for _ in range(args.clients)
+    ])
+    elapsed = time.perf_counter() - started
+
+    first_bytes = [result[0] for result in results]
+    totals = [result[1] for result in results]
+    received = sum(result[2] for result in results)
+
+    print(f"clients:               {args.clients}")
+    print(f"wall time:             {elapsed:.2f}s")
+    print(f"received:              {received / 1024 / 1024:.1f} MiB")
+    print(f"peak concurrent:       {tracker.peak}")
+    print(f"ttfb p50/p95/max:      {statistics.median(first_bytes):.3f}s / "
+          f"{percentile(first_bytes, 95):.3f}s / {max(first_bytes):.3f}s")
+    print(f"total p50/p95/max:     {statistics.median(totals):.3f}s / "
+          f"{percentile(totals, 95):.3f}s / {max(totals):.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='The endpoint to download, e.g. a single-file or download_all URL.')
+    parser.add_argument('--clients', type=int, default=50, help='Number of concurrent slow clients.')
+    parser.add_argument('--read-size', type=int, default=64 * 1024, help='Bytes read per client iteration.')
+    parser.add_argument('--read-delay', type=float, default=0.02, help='Seconds each client sleeps between reads.')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import random
+import shutil
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app.archives import archive_cache_dir
+from app.models import Automobile, PartFile
+from app.response_cache import get_response_cache
+from .fleet import seed_blobs, seed_fleet
+from .loadtest import percentile
+
+DEFAULT_SCALES = (10, 1000, 100000)
+WARMUP_ITERATIONS = 2
+
+# Differences below these are noise, whatever the relative threshold says.
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KB = 64
+
+
+class Target(NamedTuple):
+    """
+    The objects a scenario's request is about: the newest automobile of the
+    fleet, one of its parts and one of that part's files.
+    """
+
+    automobile_id: int
+    part_id: int
+    file_id: int
+
+    @classmethod
+    def latest(cls) -> 'Target':
+        part_file = PartFile.objects.select_related('part').filter(
+            part__automobile=Automobile.objects.order_by('-id').first()).order_by('id').first()
+        return cls(part_file.part.automobile_id, part_file.part_id, part_file.id)
+
+
+class Scenario(NamedTuple):
+    """
+    One benchmarked request. Cold scenarios clear the response and archive
+    caches before every request, so they measure the uncached code path.
+    """
+
+    name: str
+    url: Callable[[Target], str]
+    data: Optional[Callable[[int], Dict[str, Any]]] = None
+    cold: bool = True
+
+
+SCENARIOS = [
+    Scenario('list_automobiles', lambda t: reverse('list_automobiles')),
+    Scenario('list_automobiles_cached', lambda t: reverse('list_automobiles'), cold=False),
+    Scenario('list_automobiles_page100', lambda t: reverse('list_automobiles') + '?page_size=100'),
+    # The same page through the DRF serializers, which a field selection switches to.
+    Scenario('list_automobiles_page100_drf',
+             lambda t: reverse('list_automobiles') + '?page_size=100&expand=parts.files'),
+    Scenario('get_automobile', lambda t: reverse('get_automobile', args=[t.automobile_id])),
+    Scenario('list_parts', lambda t: reverse('list_parts', args=[t.automobile_id])),
+    Scenario('download_single_file', lambda t: reverse('download_single_file', args=[t.part_id, t.file_id])),
+    Scenario('download_all_part', lambda t: reverse('download_all_files_for_part', args=[t.part_id])),
+    Scenario('download_all_part_cached', lambda t: reverse('download_all_files_for_part', args=[t.part_id]),
+             cold=False),
+    Scenario('download_all_automobile',
+             lambda t: reverse('download_all_files_for_automobile', args=[t.automobile_id])),
+    Scenario('upload_file', lambda t: reverse('upload_file', args=[t.automobile_id, t.part_id]),
+             data=lambda i: {'file_name': f'benchmark-{i}.txt', 'content': f'benchmark upload {i}\n' * 64}),
+]
+
+
+def reset_caches() -> None:
+    get_response_cache().clear()
+    shutil.rmtree(archive_cache_dir(), ignore_errors=True)
+
+
+def perform(client: Client, scenario: Scenario, target: Target, iteration: int) -> None:
+    """
+    Sends the scenario's request and reads the whole response body.
+
+    :raises RuntimeError: If the request fails.
+    """
+    url = scenario.url(target)
+    if scenario.data is None:
+        response = client.get(url)
+    else:
+        response = client.post(url, scenario.data(iteration), content_type='application/json')
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+        response.close()
+    if response.status_code >= 400:
+        raise RuntimeError(f"{scenario.name}: {url} returned {response.status_code}")
+
+
+def measure(client: Client, scenario: Scenario, target: Target, iterations: int) -> Dict[str, float]:
+    """
+    Measures a scenario: latency percentiles and query counts over
+    ``iterations`` timed requests after a warm-up, then peak Python memory
+    over one extra request traced by tracemalloc, which is kept out of the
+    timed requests because tracing slows them down.
+
+    :return: The scenario's metrics.
+    """
+    timings: List[float] = []
+    query_counts: List[int] = []
+    for iteration in range(WARMUP_ITERATIONS + iterations):
+        if scenario.cold:
+            reset_caches()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            perform(client, scenario, target, iteration)
+            elapsed = time.perf_counter() - started
+        if iteration >= WARMUP_ITERATIONS:
+            timings.append(elapsed * 1000)
+            query_counts.append(len(queries))
+
+    if scenario.cold:
+        reset_caches()
+    tracemalloc.start()
+    try:
+        perform(client, scenario, target, WARMUP_ITERATIONS + iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(query_counts),
+        'peak_memory_kb': peak // 1024,
+    }
+
+
+def run_suite(scales: Iterable[int] = DEFAULT_SCALES, iterations: int = 30,
+              scenario_names: Optional[Iterable[str]] = None, seed: int = 0,
+              report: Callable[[str], None] = print) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Seeds fleets of increasing size into the current database, measuring every
+    scenario at each scale. Each scale only adds the automobiles missing from
+    the previous one, and seeding is deterministic for a given seed.
+
+    :param scales: The fleet sizes, in automobiles.
+    :param iterations: The number of timed requests per scenario and scale.
+    :param scenario_names: The scenarios to run, defaulting to all of them.
+    :param seed: The seed of the synthetic data.
+    :param report: Receives a progress line after each measured scenario.
+    :return: A mapping of scale to scenario name to metrics.
+    """
+    scenarios = [scenario for scenario in SCENARIOS if scenario_names is None or scenario.name in scenario_names]
+    rng = random.Random(seed)
+    blobs = seed_blobs(rng)
+    client = Client()
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    seeded = 0
+    for scale in sorted(scales):
+        started = time.perf_counter()
+        seed_fleet(scale - seeded, blobs, rng)
+        seeded = scale
+        report(f"Seeded {scale} automobiles in {time.perf_counter() - started:.1f}s")
+
+        target = Target.latest()
+        results[str(scale)] = {}
+        for scenario in scenarios:
+            metrics = measure(client, scenario, target, iterations)
+            results[str(scale)][scenario.name] = metrics
+            report(f"  {scale:>7} {scenario.name:<30} p50 {metrics['p50_ms']:>9.2f}ms  "
+                   f"p95 {metrics['p95_ms']:>9.2f}ms  queries {metrics['queries']:>3}  "
+                   f"peak {metrics['peak_memory_kb']:>7}KiB")
+    return results
+
+
+def compare(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Dict[str, Dict[str, float]]],
+            threshold: float) -> List[str]:
+    """
+    Compares results with a baseline run. Latency (p50 and p95) and peak memory
+    regress when they grow by more than ``threshold`` (a fraction) and by more
+    than a small absolute margin; any extra query is a regression.
+
+    :param results: The current results, as returned by run_suite().
+    :param baseline: The baseline results in the same format.
+    :param threshold: The tolerated relative increase, e.g. 0.2 for 20%.
+    :return: A description of every regression found.
+    """
+    regressions = []
+    for scale, scenarios in results.items():
+        for name, metrics in scenarios.items():
+            base = baseline.get(scale, {}).get(name)
+            if base is None:
+                continue
+            for key, margin in (('p50_ms', MIN_LATENCY_DELTA_MS), ('p95_ms', MIN_LATENCY_DELTA_MS),
+                                ('peak_memory_kb', MIN_MEMORY_DELTA_KB)):
+                if metrics[key] > base[key] * (1 + threshold) and metrics[key] - base[key] > margin:
+                    regressions.append(f"{name} @ {scale}: {key} {base[key]} -> {metrics[key]}")
+            if metrics['queries'] > base['queries']:
+                regressions.append(f"{name} @ {scale}: queries {base['queries']} -> {metrics['queries']}")
+    return regressions
@@ -0,0 +1,29 @@
+import os
+
+# Every sync worker thread holds its own database connection; keep these in
+# step with the connection budget checked by app/checks.py.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('WEB_THREADS', 1))
+
+
+def on_starting(server):
+    """
+    Refuses to start several workers with a per-process response cache,
+    see app.checks.check_response_cache().
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'automobile_service.settings')
+    from app.checks import check_response_cache
+
+    for error in check_response_cache(None, processes=server.cfg.workers):
+        raise RuntimeError(f"{error.msg} {error.hint}")
+
+
+def child_exit(server, worker):
+    """
+    Drops the live gauge files of an exited worker from PROMETHEUS_MULTIPROC_DIR,
+    so restarted workers do not leave stale values behind.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EmailAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'email_app'
+
+    def ready(self):
+        from . import metrics, notifications  # noqa: F401
@@ -0,0 +1,185 @@
+import hashlib
+import random
+import time
+from datetime import timedelta
+from typing import Optional
+
+from celery import Task
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .mailer import TransientDeliveryError
+from .metrics import NOTIFICATION_DEAD_LETTERS, observe_rate_limit_wait
+from .models import DeadLetter, RateLimitBucket, SentEmail
+from .notifications import RenderedEmail
+
+MAILTRAP_PROVIDER = 'mailtrap'
+
+
+class RateLimited(TransientDeliveryError):
+    """
+    Raised instead of waiting when the provider's rate limit would hold a
+    send back for longer than NOTIFICATION_RATE_LIMIT_MAX_WAIT seconds.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(429, [f"Rate limit reached, next send in {retry_after:.1f}s."], retry_after)
+
+
+class DeliveryInProgress(TransientDeliveryError):
+    """
+    Raised when another attempt has claimed a notification but not yet sent
+    it, so the caller retries once that claim has completed or expired.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(None, [f"Delivery in progress, retry in {retry_after:.1f}s."], retry_after)
+
+
+def content_hash(email: RenderedEmail) -> str:
+    return hashlib.sha256('\0'.join((email.subject, email.text)).encode('utf-8')).hexdigest()
+
+
+def delivery_key(key: str) -> str:
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def claim_delivery(recipient: str, key: str) -> bool:
+    """
+    Records that a notification is about to be sent to a recipient, unless
+    it was already sent to them in the last NOTIFICATION_DEDUP_WINDOW
+    seconds. A notification is identified by ``key``: the ID of the task
+    that sends it, or the content hash of a digest. The record is unique per
+    recipient and key, so of several workers sending the same notification,
+    e.g. a retried or redelivered task, only one claims it, while a new
+    notification with the same content is still sent.
+
+    The claim stays pending until mark_delivered() is called. A pending
+    claim older than NOTIFICATION_CLAIM_TIMEOUT seconds was left by an
+    attempt that died before sending, and is taken over.
+
+    :param recipient: The recipient address.
+    :param key: The identity of the notification.
+    :return: False if the notification was sent and must not be sent again.
+    :raises DeliveryInProgress: If another attempt holds a pending claim.
+    """
+    if not settings.NOTIFICATION_DEDUP_WINDOW:
+        return True
+    now = timezone.now()
+    claims = SentEmail.objects.filter(recipient=recipient, delivery_key=delivery_key(key))
+    expired = now - timedelta(seconds=settings.NOTIFICATION_DEDUP_WINDOW)
+    abandoned = now - timedelta(seconds=settings.NOTIFICATION_CLAIM_TIMEOUT)
+    if claims.filter(Q(sent=True, sent_at__lt=expired) | Q(sent=False, sent_at__lt=abandoned)).update(
+            sent_at=now, sent=False):
+        return True
+    try:
+        with transaction.atomic():
+            SentEmail.objects.create(recipient=recipient, delivery_key=delivery_key(key), sent_at=now)
+    except IntegrityError:
+        claim = claims.first()
+        if claim is not None and claim.sent:
+            return False
+        # A claim that vanished meanwhile was released by a failed attempt: retry at once.
+        raise DeliveryInProgress(max(0.0, (claim.sent_at - abandoned).total_seconds()) if claim else 0.0)
+    return True
+
+
+def mark_delivered(recipient: str, key: str) -> None:
+    """
+    Completes the claim of a notification once it has been sent, so that it
+    is not sent again within NOTIFICATION_DEDUP_WINDOW seconds.
+    """
+    SentEmail.objects.filter(recipient=recipient, delivery_key=delivery_key(key)).update(
+        sent=True, sent_at=timezone.now())
+
+
+def release_delivery(recipient: str, key: str) -> None:
+    """
+    Forgets the claim of a notification that could not be sent, so it is
+    sent on the next attempt.
+    """
+    SentEmail.objects.filter(recipient=recipient, delivery_key=delivery_key(key)).delete()
+
+
+def acquire_send_slot(provider: str = MAILTRAP_PROVIDER) -> float:
+    """
+    Takes a token from the provider's bucket, shared by all worker processes,
+    which refills at MAILTRAP_RATE_LIMIT tokens per second up to
+    MAILTRAP_RATE_BURST. When the bucket is empty, the next token is reserved
+    in advance and the caller sleeps until it is due, so concurrent sends are
+    spaced out at the limit instead of being rejected by the provider.
+
+    :param provider: The name of the bucket.
+    :return: The number of seconds waited.
+    :raises RateLimited: If the wait would exceed NOTIFICATION_RATE_LIMIT_MAX_WAIT.
+    """
+    rate = settings.MAILTRAP_RATE_LIMIT
+    if not rate:
+        return 0.0
+    burst = max(1.0, settings.MAILTRAP_RATE_BURST)
+
+    while True:
+        now = time.time()
+        bucket, _ = RateLimitBucket.objects.get_or_create(provider=provider,
+                                                          defaults={'tokens': burst, 'updated_at': now})
+        tokens = min(burst, bucket.tokens + max(0.0, now - bucket.updated_at) * rate) - 1
+        wait = max(0.0, -tokens / rate)
+        if wait > settings.NOTIFICATION_RATE_LIMIT_MAX_WAIT:
+            raise RateLimited(wait)
+        # Another process may have taken a token since the bucket was read.
+        if RateLimitBucket.objects.filter(pk=bucket.pk, version=bucket.version).update(
+                tokens=tokens, updated_at=now, version=bucket.version + 1):
+            break
+
+    if wait:
+        time.sleep(wait)
+    observe_rate_limit_wait(provider, wait)
+    return wait
+
+
+def throttle_provider(retry_after: Optional[float], provider: str = MAILTRAP_PROVIDER) -> None:
+    """
+    Empties the provider's bucket for ``retry_after`` seconds (one second by
+    default) after it answered 429, so that every worker backs off, not only
+    the one that was rejected.
+    """
+    rate = settings.MAILTRAP_RATE_LIMIT
+    if rate:
+        RateLimitBucket.objects.filter(provider=provider).update(
+            tokens=-(retry_after or 1.0) * rate, updated_at=time.time(), version=F('version') + 1)
+
+
+def retry_delay(retries: int, retry_after: Optional[float] = None) -> float:
+    """
+    Returns the delay before the next attempt of a task: exponential backoff
+    from NOTIFICATION_RETRY_BACKOFF seconds up to NOTIFICATION_RETRY_BACKOFF_MAX,
+    randomised so that tasks failed by the same outage do not all retry at
+    once, and never shorter than the provider's Retry-After.
+
+    :param retries: The number of retries so far.
+    :param retry_after: The delay requested by the provider, if any.
+    :return: The delay in seconds.
+    """
+    delay = min(settings.NOTIFICATION_RETRY_BACKOFF_MAX, settings.NOTIFICATION_RETRY_BACKOFF * 2 ** retries)
+    return max(random.uniform(delay / 2, delay), retry_after or 0.0)
+
+
+def dead_letter(task: Task, exc: Exception) -> DeadLetter:
+    """
+    Moves a failed task to the dead letter queue.
+
+    :param task: The bound task whose current request failed.
+    :param exc: The error it failed with.
+    :return: The created DeadLetter.
+    """
+    NOTIFICATION_DEAD_LETTERS.labels(task.name).inc()
+    return DeadLetter.objects.create(
+        task_name=task.name,
+        task_id=task.request.id or '',
+        args=list(task.request.args or []),
+        error=str(exc) or repr(exc),
+        status=getattr(exc, 'status', None),
+        retries=task.request.retries,
+    )
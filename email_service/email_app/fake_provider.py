@@ -0,0 +1,96 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+
+class FakeMailtrapHandler(BaseHTTPRequestHandler):
+    """
+    Answers ``POST /api/send`` like Mailtrap, including its failure modes:
+    429 with Retry-After above the server's rate limit, and 503 for a random
+    share of requests.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per request.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        status, response, headers = self.server.answer(body)
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMailtrapServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the Mailtrap sending API, to exercise the delivery
+    pipeline without sending real email. Point MAILTRAP_API_URL at ``url``.
+
+    :param address: The (host, port) to listen on, a free port by default.
+    :param rate: Requests per second accepted before answering 429, unlimited by default.
+    :param burst: Requests accepted at once before the rate applies, ``rate`` by default.
+    :param failure_rate: The share of requests answered 503.
+    :param latency: Seconds every request takes, like the round trip to the real API.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int] = ('127.0.0.1', 0), rate: Optional[float] = None,
+                 burst: Optional[float] = None, failure_rate: float = 0.0, latency: float = 0.0) -> None:
+        super().__init__(address, FakeMailtrapHandler)
+        self.rate = rate
+        self.burst = burst or rate or 1.0
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.tokens = self.burst
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.accepted: List[dict] = []
+        self.accepted_at: List[float] = []
+        self.rate_limited = 0
+        self.failed = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def answer(self, body: dict) -> Tuple[int, dict, List[Tuple[str, str]]]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            if self.rate:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.tokens < 1:
+                    self.rate_limited += 1
+                    retry_after = f"{(1 - self.tokens) / self.rate:.3f}"
+                    return 429, {'errors': ['Too many requests']}, [('Retry-After', retry_after)]
+                self.tokens -= 1
+            if self.failure_rate and random.random() < self.failure_rate:
+                self.failed += 1
+                return 503, {'errors': ['Service unavailable']}, []
+            self.accepted.append(body)
+            self.accepted_at.append(time.monotonic())
+            return 200, {'success': True, 'message_ids': [f"fake-{len(self.accepted)}"]}, []
+
+    def start(self) -> 'FakeMailtrapServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
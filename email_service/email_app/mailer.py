@@ -0,0 +1,96 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+import mailtrap as mt
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+TRANSIENT_STATUSES = frozenset({408, 429}) | frozenset(range(500, 600))
+
+
+class TransientDeliveryError(mt.APIError):
+    """
+    A send that failed for a reason worth retrying: the provider is rate
+    limiting (429), unavailable (5xx) or could not be reached. Any other
+    APIError is permanent.
+    """
+
+    def __init__(self, status: Optional[int], errors: List[str], retry_after: Optional[float] = None) -> None:
+        super().__init__(status, errors)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header given in seconds. HTTP dates are not used by
+    Mailtrap and are ignored.
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class PooledMailtrapClient(mt.MailtrapClient):
+    """
+    A MailtrapClient that sends through a persistent ``requests.Session``, so
+    consecutive sends reuse pooled keep-alive connections instead of opening a
+    new TLS connection for every email.
+    """
+
+    def __init__(self, token: str, api_url: str, pool_size: int = 10, timeout: Optional[float] = None) -> None:
+        super().__init__(token=token)
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.headers)
+
+    @property
+    def base_url(self) -> str:
+        return self.api_url
+
+    def send(self, mail: mt.mail.base.BaseMail) -> Dict[str, Union[bool, List[str]]]:
+        """
+        Sends a mail.
+
+        :raises TransientDeliveryError: If the send can be retried.
+        :raises mailtrap.APIError: If the provider rejected the mail.
+        """
+        try:
+            response = self.session.post(f"{self.base_url}/api/send", json=mail.api_data, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            raise TransientDeliveryError(None, [str(exc)]) from exc
+
+        if response.ok:
+            return response.json()
+
+        if response.status_code in TRANSIENT_STATUSES:
+            try:
+                errors = response.json()['errors']
+            except (ValueError, KeyError, TypeError):
+                errors = [response.reason or f"HTTP {response.status_code}"]
+            raise TransientDeliveryError(response.status_code, errors,
+                                         parse_retry_after(response.headers.get('Retry-After')))
+
+        self._handle_failed_response(response)
+
+
+@lru_cache(maxsize=None)
+def get_mail_client() -> PooledMailtrapClient:
+    """
+    Returns the pooled Mailtrap client of the current worker process, creating
+    it on first use. Celery's prefork pool forks before any task runs, so every
+    child process builds its own client and connection pool.
+
+    :return: A PooledMailtrapClient configured from settings.
+    """
+    return PooledMailtrapClient(
+        token=settings.MAILTRAP_TOKEN,
+        api_url=settings.MAILTRAP_API_URL,
+        pool_size=settings.MAILTRAP_POOL_SIZE,
+        timeout=settings.MAILTRAP_TIMEOUT,
+    )
@@ -0,0 +1,105 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from email_app.delivery import retry_delay
+from email_app.fake_provider import FakeMailtrapServer
+from email_app.mailer import TransientDeliveryError, get_mail_client
+from email_app.models import SentEmail
+from email_app.notifications import get_templates, render_digest, render_upload
+from email_app.tasks import send_mail
+
+BENCHMARK_RECIPIENT = 'benchmark@example.com'
+
+
+def sample_payload(index: int):
+    return {
+        'automobile': {'manufacturer': 'Volvo', 'model': f'FH{index}', 'type': 'Truck'},
+        'part': {'name': f'Part {index}', 'file_link': f'https://files.example.com/media/part_files/{index}.pdf'},
+    }
+
+
+class Command(BaseCommand):
+    help = ("Measures notification rendering (subject, text and HTML bodies) without sending anything, "
+            "so the render stage can be compared separately from delivery. With --deliver, also sends "
+            "emails through the rate limiter to a local fake Mailtrap API.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000,
+                            help="Renders per notification type (default: %(default)s).")
+        parser.add_argument('--digest-size', type=int, default=50,
+                            help="Uploads summarised per digest (default: %(default)s).")
+        parser.add_argument('--deliver', type=int, default=0,
+                            help="Emails to send to a fake Mailtrap API (default: none).")
+        parser.add_argument('--provider-rate', type=float, default=20.0,
+                            help="Requests per second the fake API accepts (default: %(default)s).")
+        parser.add_argument('--senders', type=int, default=8,
+                            help="Concurrent senders, like worker processes (default: %(default)s).")
+
+    def measure(self, name: str, render: Callable[[int], object], iterations: int) -> None:
+        timings: List[float] = []
+        for iteration in range(iterations):
+            started = time.perf_counter()
+            render(iteration)
+            timings.append(time.perf_counter() - started)
+        total = sum(timings)
+        self.stdout.write(
+            f"{name:<24} {iterations / total:>9.0f} renders/s  p50 {statistics.median(timings) * 1e6:>8.1f}us  "
+            f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1] * 1e6:>8.1f}us")
+
+    def handle(self, *args, **options):
+        get_templates.cache_clear()
+        started = time.perf_counter()
+        render_upload(sample_payload(0))
+        self.stdout.write(f"{'first render (compile)':<24} {(time.perf_counter() - started) * 1e3:>9.2f}ms")
+
+        digest = [sample_payload(index) for index in range(options['digest_size'])]
+        self.measure('upload', lambda iteration: render_upload(sample_payload(iteration)), options['iterations'])
+        self.measure(f"digest of {options['digest_size']}", lambda iteration: render_digest(digest),
+                     max(1, options['iterations'] // 10))
+        if options['deliver']:
+            self.deliver(options['deliver'], options['provider_rate'], options['senders'])
+
+    def deliver(self, count: int, rate: float, senders: int) -> None:
+        """
+        Sends ``count`` distinct emails from ``senders`` threads to a fake API
+        limited to ``rate`` requests per second, with the pipeline's rate
+        limit set to the same value, retrying transient failures in place.
+        """
+        server = FakeMailtrapServer(rate=rate).start()
+        retries = 0
+
+        def send(index: int) -> None:
+            nonlocal retries
+            email = render_upload(sample_payload(index))
+            try:
+                for attempt in range(10):
+                    try:
+                        send_mail(BENCHMARK_RECIPIENT, email, f"benchmark-{index}")
+                        return
+                    except TransientDeliveryError as exc:
+                        retries += 1
+                        time.sleep(retry_delay(attempt, exc.retry_after) / 10)
+            finally:
+                connection.close()
+
+        with override_settings(MAILTRAP_API_URL=server.url, MAILTRAP_RATE_LIMIT=rate, MAILTRAP_RATE_BURST=rate):
+            get_mail_client.cache_clear()
+            started = time.perf_counter()
+            try:
+                with ThreadPoolExecutor(max_workers=senders) as executor:
+                    list(executor.map(send, range(count)))
+            finally:
+                elapsed = time.perf_counter() - started
+                server.stop()
+                get_mail_client.cache_clear()
+                SentEmail.objects.filter(recipient=BENCHMARK_RECIPIENT).delete()
+
+        self.stdout.write(
+            f"{'delivery':<24} {len(server.accepted) / elapsed:>9.1f} emails/s  (limit {rate:g}/s)  "
+            f"sent {len(server.accepted)}/{count}  rejected with 429: {server.rate_limited}  retries {retries}")
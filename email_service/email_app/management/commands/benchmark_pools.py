@@ -0,0 +1,131 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+from celery import Celery
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from email_app.fake_provider import FakeMailtrapServer
+
+from .benchmark_notifications import sample_payload
+
+DEFAULT_POOLS = 'solo:1,prefork:4,threads:32,gevent:64'
+
+
+def parse_pools(value: str) -> List[Tuple[str, int]]:
+    try:
+        return [(pool, int(concurrency)) for pool, concurrency in
+                (spec.split(':') for spec in value.split(','))]
+    except ValueError:
+        raise CommandError("--pools must look like 'prefork:4,threads:32'.")
+
+
+class Command(BaseCommand):
+    help = ("Compares how many upload notifications per second a Celery worker delivers with each pool "
+            "type. Every run starts a real worker on the 'notifications' queue, backed by a filesystem "
+            "broker and a throwaway SQLite database, and sends to a fake Mailtrap API that answers after "
+            "--latency seconds. Neither RabbitMQ nor a Mailtrap account is needed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pools', default=DEFAULT_POOLS,
+                            help="Comma-separated pool:concurrency pairs (default: %(default)s).")
+        parser.add_argument('--messages', type=int, default=500,
+                            help="Notifications queued per run (default: %(default)s).")
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help="Seconds the fake API takes per email (default: %(default)s).")
+        parser.add_argument('--timeout', type=float, default=300,
+                            help="Seconds to wait for a run to finish (default: %(default)s).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        results = {}
+        self.stdout.write(f"{options['messages']} notifications, {options['latency'] * 1000:g}ms per send")
+        for pool, concurrency in parse_pools(options['pools']):
+            if pool == 'gevent':
+                try:
+                    import gevent  # noqa: F401
+                except ImportError:
+                    self.stdout.write(f"  {pool:<8} skipped, gevent is not installed")
+                    continue
+            result = self.run(pool, concurrency, options['messages'], options['latency'], options['timeout'])
+            results[f"{pool}:{concurrency}"] = result
+            self.stdout.write(f"  {pool:<8} concurrency {concurrency:<4} {result['messages_per_second']:>8.1f} msg/s  "
+                              f"delivered {result['delivered']}/{options['messages']}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+
+    def run(self, pool: str, concurrency: int, messages: int, latency: float, timeout: float) -> Dict[str, float]:
+        """
+        Queues ``messages`` notifications, then starts a worker with the given
+        pool and measures its throughput from the first to the last email the
+        fake API accepted, which leaves out worker start-up.
+        """
+        server = FakeMailtrapServer(latency=latency).start()
+        with tempfile.TemporaryDirectory() as directory:
+            broker_dir = os.path.join(directory, 'broker')
+            os.makedirs(broker_dir)
+            # The filesystem transport polls the directory, once a second by default.
+            transport_options = {'data_folder_in': broker_dir, 'data_folder_out': broker_dir,
+                                 'control_folder': os.path.join(directory, 'control'), 'polling_interval': 0.01}
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{os.path.join(directory, 'db.sqlite3')}",
+                CELERY_BROKER_URL='filesystem://',
+                CELERY_BROKER_TRANSPORT_OPTIONS=json.dumps(transport_options),
+                MAILTRAP_API_URL=server.url,
+                MAILTRAP_POOL_SIZE=str(concurrency),
+                MAILTRAP_RATE_LIMIT='0',
+                # The filesystem transport only frees prefetch slots between two-second polls, which
+                # would dominate the run; RabbitMQ frees them at once. Let the worker reserve freely.
+                CELERY_WORKER_PREFETCH_MULTIPLIER='0',
+                NOTIFICATION_DELIVERY_MODE='immediate',
+                WORKER_METRICS_PORT='0',
+            )
+            env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=settings.BASE_DIR, env=env,
+                           check=True)
+
+            producer_app = Celery(broker='filesystem://', broker_transport_options=transport_options)
+            producer_app.conf.task_routes = settings.CELERY_TASK_ROUTES
+            with producer_app.producer_or_acquire() as producer:
+                for index in range(messages):
+                    producer_app.send_task('email_app.tasks.send_email_task', args=[sample_payload(index)],
+                                           producer=producer)
+
+            log = open(os.path.join(directory, 'worker.log'), 'w+')
+            worker = subprocess.Popen(
+                [sys.executable, '-m', 'celery', '-A', 'email_service', 'worker', '-P', pool, '-c', str(concurrency),
+                 '-Q', settings.NOTIFICATION_QUEUE, '-l', 'warning', '--without-gossip', '--without-mingle',
+                 '--without-heartbeat'],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log)
+            try:
+                deadline = time.monotonic() + timeout
+                while len(server.accepted_at) < messages and time.monotonic() < deadline:
+                    if worker.poll() is not None:
+                        log.seek(0)
+                        raise CommandError(f"The {pool} worker exited with status {worker.returncode}:\n"
+                                           f"{log.read()[-2000:]}")
+                    time.sleep(0.1)
+            finally:
+                worker.terminate()
+                try:
+                    worker.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    worker.kill()
+                log.close()
+                server.stop()
+
+        accepted_at = server.accepted_at
+        elapsed = accepted_at[-1] - accepted_at[0] if len(accepted_at) > 1 else 0.0
+        return {
+            'delivered': len(accepted_at),
+            'seconds': round(elapsed, 3),
+            'messages_per_second': round((len(accepted_at) - 1) / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from email_app.fake_provider import FakeMailtrapServer
+
+
+class Command(BaseCommand):
+    help = ("Runs a fake Mailtrap sending API that enforces a rate limit and fails a share of requests, "
+            "to exercise the delivery pipeline locally. Point MAILTRAP_API_URL at it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8025)
+        parser.add_argument('--rate', type=float,
+                            help="Requests per second accepted before answering 429 (default: unlimited).")
+        parser.add_argument('--burst', type=float,
+                            help="Requests accepted at once before the rate applies (default: --rate).")
+        parser.add_argument('--failure-rate', type=float, default=0.0,
+                            help="Share of requests answered 503 (default: %(default)s).")
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help="Seconds every request takes (default: %(default)s).")
+
+    def handle(self, *args, **options):
+        server = FakeMailtrapServer((options['host'], options['port']), rate=options['rate'],
+                                    burst=options['burst'], failure_rate=options['failure_rate'],
+                                    latency=options['latency'])
+        self.stdout.write(f"Fake Mailtrap API listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        self.stdout.write(f"Accepted {len(server.accepted)}, rate limited {server.rate_limited}, "
+                          f"failed {server.failed}.")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from email_app.models import DeadLetter
+from email_service.celery import app as celery_app
+
+
+class Command(BaseCommand):
+    help = ("Publishes dead-lettered notification tasks again and removes them from the dead letter queue. "
+            "Recipients who already received an email are skipped within NOTIFICATION_DEDUP_WINDOW.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="IDs of the dead letters to requeue.")
+        parser.add_argument('--all', action='store_true', help="Requeue every dead letter.")
+
+    def handle(self, *args, **options):
+        if not options['ids'] and not options['all']:
+            raise CommandError("Give the IDs of the dead letters to requeue, or --all.")
+        dead_letters = DeadLetter.objects.all() if options['all'] else DeadLetter.objects.filter(id__in=options['ids'])
+
+        requeued = 0
+        with celery_app.producer_or_acquire() as producer:
+            for dead_letter in dead_letters.iterator():
+                celery_app.send_task(dead_letter.task_name, args=dead_letter.args, producer=producer)
+                dead_letter.delete()
+                requeued += 1
+        self.stdout.write(self.style.SUCCESS(f"Requeued {requeued} task(s)."))
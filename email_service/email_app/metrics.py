@@ -0,0 +1,140 @@
+import os
+import time
+from ipaddress import ip_address, ip_network
+from typing import Dict, Optional
+
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_ready
+from django.conf import settings
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, start_http_server)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+RENDER_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+TASK_QUEUE_LATENCY = Histogram(
+    'celery_task_queue_latency_seconds', "Time between a task being published and a worker starting it.",
+    ['task'], buckets=DURATION_BUCKETS)
+TASK_RUNTIME = Histogram(
+    'celery_task_runtime_seconds', "Time a worker spent running a task, by final state.",
+    ['task', 'state'], buckets=DURATION_BUCKETS)
+NOTIFICATION_RENDER_DURATION = Histogram(
+    'notification_render_seconds', "Time spent rendering a notification's subject and bodies.",
+    ['template'], buckets=RENDER_BUCKETS)
+NOTIFICATION_DELIVERY_DURATION = Histogram(
+    'notification_delivery_seconds', "Time spent handing one email to the Mailtrap API.",
+    buckets=DURATION_BUCKETS)
+NOTIFICATION_EMAILS = Counter(
+    'notification_emails', "Emails handled by the delivery pipeline, by outcome (sent, duplicate or failed).",
+    ['outcome'])
+NOTIFICATION_RETRIES = Counter(
+    'notification_retries', "Notification tasks scheduled for another attempt after a transient failure.",
+    ['task'])
+NOTIFICATION_DEAD_LETTERS = Counter(
+    'notification_dead_letters', "Notification tasks moved to the dead letter queue.",
+    ['task'])
+RATE_LIMIT_WAIT = Histogram(
+    'notification_rate_limit_wait_seconds', "Time a send waited for the provider's rate limit.",
+    ['provider'], buckets=DURATION_BUCKETS)
+
+_task_started: Dict[str, float] = {}
+
+
+def observe_render(template: str, seconds: float) -> None:
+    NOTIFICATION_RENDER_DURATION.labels(template).observe(seconds)
+
+
+def observe_delivery(seconds: float) -> None:
+    NOTIFICATION_DELIVERY_DURATION.observe(seconds)
+
+
+def observe_email(outcome: str) -> None:
+    NOTIFICATION_EMAILS.labels(outcome).inc()
+
+
+def observe_rate_limit_wait(provider: str, seconds: float) -> None:
+    RATE_LIMIT_WAIT.labels(provider).observe(seconds)
+
+
+def published_at(request) -> Optional[float]:
+    """
+    Returns the publish time stamped on a task message, or None. Workers
+    expose custom message headers as request attributes, while eagerly
+    applied tasks keep them in request.headers.
+    """
+    value = getattr(request, 'published_at', None)
+    if value is None:
+        value = (request.headers or {}).get('published_at')
+    return value
+
+
+@receiver(before_task_publish)
+def stamp_publish_time(sender=None, headers=None, **kwargs):
+    """
+    Records when a task was published, so workers can measure how long it queued.
+    """
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@receiver(task_prerun)
+def record_task_start(sender=None, task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    sent = published_at(task.request)
+    if sent is not None:
+        TASK_QUEUE_LATENCY.labels(task.name).observe(max(0.0, time.time() - sent))
+
+
+@receiver(task_postrun)
+def record_task_end(sender=None, task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_RUNTIME.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Returns the registry to expose: the process's own metrics, or those of
+    every process sharing PROMETHEUS_MULTIPROC_DIR (e.g. prefork pool processes).
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+@receiver(worker_ready)
+def start_worker_exporter(sender=None, **kwargs):
+    """
+    Serves a Celery worker's metrics on WORKER_METRICS_PORT, as workers have
+    no HTTP endpoint of their own. With a prefork pool, PROMETHEUS_MULTIPROC_DIR
+    must be set for the metrics of the pool processes to be included.
+    """
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+
+
+# metrics_allowed() and metrics_view() are kept identical to those of the other
+# service (app/metrics.py); the services are built and deployed separately.
+def metrics_allowed(request: HttpRequest) -> bool:
+    """
+    Tells whether the client's address is in METRICS_ALLOWED_IPS.
+    """
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Exposes the metrics in the Prometheus text format to the addresses in
+    METRICS_ALLOWED_IPS.
+    """
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST)
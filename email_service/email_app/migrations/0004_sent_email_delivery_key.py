@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_app', '0003_delivery_pipeline'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='sentemail',
+            name='unique_sent_email',
+        ),
+        migrations.RenameField(
+            model_name='sentemail',
+            old_name='content_hash',
+            new_name='delivery_key',
+        ),
+        migrations.AddConstraint(
+            model_name='sentemail',
+            constraint=models.UniqueConstraint(fields=('recipient', 'delivery_key'), name='unique_sent_email'),
+        ),
+    ]
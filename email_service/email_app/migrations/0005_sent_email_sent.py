@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email_app', '0004_sent_email_delivery_key'),
+    ]
+
+    operations = [
+        # Rows recorded before claims could be pending were all sent.
+        migrations.AddField(
+            model_name='sentemail',
+            name='sent',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='sentemail',
+            name='sent',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,3 +1,91 @@
 from django.db import models
 
-# Create your models here.
+
+class PendingNotification(models.Model):
+    """
+    An upload notification queued for the next digest email to its recipient.
+    """
+
+    recipient = models.EmailField()
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Notification for {self.recipient}"
+
+
+class ProcessedTask(models.Model):
+    """
+    The ID of a notification task that has already been handled. The
+    automobile service publishes at-least-once, so a redelivered task is
+    recognised here and skipped.
+    """
+
+    task_id = models.CharField(max_length=255, unique=True)
+    processed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.task_id
+
+
+class SentEmail(models.Model):
+    """
+    A notification recently sent, or being sent, to a recipient, identified
+    by a hash of the task that sent it or of a digest's content (see
+    claim_delivery()). A retried or redelivered notification finds it here
+    and is not sent again within NOTIFICATION_DEDUP_WINDOW seconds. Until
+    ``sent`` is set, ``sent_at`` is the time the send was claimed.
+    """
+
+    recipient = models.EmailField()
+    delivery_key = models.CharField(max_length=64)
+    sent_at = models.DateTimeField(db_index=True)
+    sent = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'delivery_key'], name='unique_sent_email'),
+        ]
+
+    def __str__(self):
+        return f"Email to {self.recipient}"
+
+
+class RateLimitBucket(models.Model):
+    """
+    The token bucket limiting sends to one email provider, shared by every
+    worker process. It is updated with compare-and-swap on ``version`` rather
+    than row locks, so it also works on SQLite.
+    """
+
+    provider = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return self.provider
+
+
+class DeadLetter(models.Model):
+    """
+    A notification task that failed permanently or ran out of retries, kept
+    with its arguments so it can be inspected and requeued.
+    """
+
+    task_name = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255, blank=True)
+    args = models.JSONField(default=list)
+    error = models.TextField()
+    status = models.PositiveSmallIntegerField(null=True, blank=True)
+    retries = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.task_name} ({self.task_id or 'no ID'})"
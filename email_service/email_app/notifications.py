@@ -0,0 +1,171 @@
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import mailtrap as mt
+from celery.signals import worker_init
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template import Template
+from django.template.loader import get_template
+
+from .metrics import observe_render
+
+TEMPLATE_DIR = 'email_app/notifications'
+UPLOAD_TEMPLATE = 'upload'
+DIGEST_TEMPLATE = 'digest'
+TEMPLATE_NAMES = (UPLOAD_TEMPLATE, DIGEST_TEMPLATE)
+
+
+class NotificationConfig(NamedTuple):
+    """
+    Who notifications are sent from and to, resolved from settings once per
+    worker process.
+    """
+
+    sender: mt.Address
+    category: str
+    recipients: Tuple[str, ...]
+    manufacturer_routes: Dict[str, Tuple[str, ...]]
+
+    def recipients_for(self, payload: Dict[str, Any]) -> Tuple[str, ...]:
+        """
+        Returns the recipients of an upload notification: the distribution
+        list of the automobile's manufacturer (matched case-insensitively) if
+        it has one, the default recipients otherwise.
+
+        :param payload: A dictionary containing Automobile and Part information.
+        :return: The recipient addresses.
+        """
+        manufacturer = str(payload.get('automobile', {}).get('manufacturer', '')).casefold()
+        return self.manufacturer_routes.get(manufacturer, self.recipients)
+
+
+class NotificationTemplates(NamedTuple):
+    """
+    The compiled subject, plain-text and HTML templates of one notification.
+    """
+
+    subject: Template
+    text: Template
+    html: Template
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    text: str
+    html: str
+
+
+@lru_cache(maxsize=None)
+def get_notification_config() -> NotificationConfig:
+    """
+    Returns the notification settings of the current worker process, reading
+    them on first use.
+
+    :return: A NotificationConfig built from settings.
+    """
+    return NotificationConfig(
+        sender=mt.Address(email=settings.NOTIFICATION_FROM_EMAIL, name=settings.NOTIFICATION_FROM_NAME),
+        category=settings.NOTIFICATION_CATEGORY,
+        recipients=tuple(settings.NOTIFICATION_RECIPIENTS),
+        manufacturer_routes={manufacturer.casefold(): tuple(recipients)
+                             for manufacturer, recipients in settings.NOTIFICATION_MANUFACTURER_ROUTES.items()},
+    )
+
+
+@lru_cache(maxsize=None)
+def get_templates(name: str) -> NotificationTemplates:
+    """
+    Returns the compiled templates of a notification, compiling them on first
+    use. Templates live in ``templates/email_app/notifications/``, as
+    ``<name>_subject.txt``, ``<name>.txt`` and ``<name>.html``.
+
+    :param name: UPLOAD_TEMPLATE or DIGEST_TEMPLATE.
+    :return: The notification's templates.
+    """
+    return NotificationTemplates(
+        subject=get_template(f"{TEMPLATE_DIR}/{name}_subject.txt"),
+        text=get_template(f"{TEMPLATE_DIR}/{name}.txt"),
+        html=get_template(f"{TEMPLATE_DIR}/{name}.html"),
+    )
+
+
+def render(name: str, context: Dict[str, Any]) -> RenderedEmail:
+    """
+    Renders the subject and both bodies of a notification, and records the
+    time taken apart from delivery.
+
+    :param name: UPLOAD_TEMPLATE or DIGEST_TEMPLATE.
+    :param context: The template context.
+    :return: The rendered email.
+    """
+    started = time.perf_counter()
+    templates = get_templates(name)
+    email = RenderedEmail(
+        subject=' '.join(templates.subject.render(context).split()),
+        text=templates.text.render(context),
+        html=templates.html.render(context),
+    )
+    observe_render(name, time.perf_counter() - started)
+    return email
+
+
+def render_upload(payload: Dict[str, Any]) -> RenderedEmail:
+    """
+    Renders the notification of one uploaded file.
+
+    :param payload: A dictionary containing Automobile and Part information.
+    :return: The rendered email.
+    """
+    return render(UPLOAD_TEMPLATE, {'payload': payload, 'automobile': payload.get('automobile', {})})
+
+
+def render_digest(payloads: List[Dict[str, Any]]) -> RenderedEmail:
+    """
+    Renders one email summarising several uploaded files.
+
+    :param payloads: The notification payloads.
+    :return: The rendered email.
+    """
+    return render(DIGEST_TEMPLATE, {'payloads': payloads})
+
+
+def build_mail(to_email: str, email: RenderedEmail) -> mt.Mail:
+    """
+    Builds a Mailtrap mail with plain-text and HTML bodies from the configured sender.
+
+    :param to_email: The recipient address.
+    :param email: The rendered notification.
+    :return: A mailtrap Mail object.
+    """
+    config = get_notification_config()
+    return mt.Mail(
+        sender=config.sender,
+        to=[mt.Address(email=to_email)],
+        subject=email.subject,
+        text=email.text,
+        html=email.html,
+        category=config.category,
+    )
+
+
+@receiver(worker_init)
+def prepare_notifications(sender=None, **kwargs):
+    """
+    Resolves the notification settings and compiles the templates when a
+    worker starts, so the first task does not pay for it. With a prefork
+    pool, the pool processes inherit both from the parent.
+    """
+    get_notification_config()
+    for name in TEMPLATE_NAMES:
+        get_templates(name)
+
+
+@receiver(setting_changed)
+def reset_notifications(setting=None, **kwargs):
+    if setting.startswith('NOTIFICATION_'):
+        get_notification_config.cache_clear()
+    if setting == 'TEMPLATES':
+        get_templates.cache_clear()
@@ -1,54 +1,262 @@
-import os
-from typing import Dict, Any
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+from typing import Callable, Dict, Any, List, Optional
 
-import mailtrap as mt
-from celery import shared_task
-import environ
+from celery import Task, shared_task
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+from django.utils import timezone
 
-env = environ.Env()
-environ.Env.read_env(os.path.join(os.path.dirname(__file__), '..', '.env'))
+from .delivery import (acquire_send_slot, claim_delivery, content_hash, dead_letter, mark_delivered,
+                       release_delivery, retry_delay, throttle_provider)
+from .mailer import TransientDeliveryError, get_mail_client
+from .metrics import NOTIFICATION_RETRIES, observe_delivery, observe_email
+from .models import PendingNotification, ProcessedTask, SentEmail
+from .notifications import RenderedEmail, build_mail, get_notification_config, render_digest, render_upload
 
+DIGEST_MODE = 'digest'
+# Errors worth retrying: provider outages, and the database being locked, restarted or unreachable.
+TRANSIENT_ERRORS = (TransientDeliveryError, OperationalError, InterfaceError)
+DIGEST_BATCH_SIZE = 500
+FLUSH_LIMIT = 5000
 
-@shared_task(name='email_app.tasks.send_email_task')
-def send_email_task(payload: Dict[str, Any]) -> None:
+
+def run_once(task_id: Optional[str], handle: Callable[[], None]) -> bool:
+    """
+    Runs a task body unless a task with the same ID was already handled.
+
+    The ID is recorded once the body has succeeded, so a failed task can be
+    retried. The body does not run in a transaction: every email it sends is
+    claimed as it goes (see claim_delivery()), so when a task fails part-way
+    or runs twice concurrently, its retry or duplicate skips the recipients
+    already served. Tasks called directly, without an ID, always run.
+
+    :param task_id: The Celery task ID, or None.
+    :param handle: The task body.
+    :return: True if the body ran, False if it was skipped as a duplicate.
+    """
+    if task_id is not None and ProcessedTask.objects.filter(task_id=task_id).exists():
+        return False
+    handle()
+    if task_id is not None:
+        ProcessedTask.objects.get_or_create(task_id=task_id)
+    return True
+
+
+def run_notification_task(task: Task, handle: Callable[[], None]) -> None:
+    """
+    Runs the body of a notification task once (see run_once()). A transient
+    failure, of the provider or of the database, is retried with exponential
+    backoff (see retry_delay()) up to NOTIFICATION_MAX_RETRIES times, which
+    overrides the task's own max_retries. A permanent failure, or one that is
+    still failing after the last retry, is moved to the dead letter queue and
+    fails the task.
+
+    :param task: The bound task.
+    :param handle: The task body.
+    :return: None
+    """
+    try:
+        run_once(task.request.id, handle)
+    except TRANSIENT_ERRORS as exc:
+        if task.request.called_directly:
+            raise
+        if task.request.retries < settings.NOTIFICATION_MAX_RETRIES:
+            NOTIFICATION_RETRIES.labels(task.name).inc()
+            retry_after = getattr(exc, 'retry_after', None)
+            raise task.retry(exc=exc, countdown=retry_delay(task.request.retries, retry_after),
+                             max_retries=settings.NOTIFICATION_MAX_RETRIES)
+        dead_letter(task, exc)
+        raise
+    except Exception as exc:
+        if not task.request.called_directly:
+            dead_letter(task, exc)
+        raise
+
+
+@shared_task(bind=True, name='email_app.tasks.send_email_task')
+def send_email_task(self, payload: Dict[str, Any]) -> None:
     """
     A Celery task that sends an email using the Mailtrap client.
     The 'payload' dictionary should contain keys 'automobile' and 'part'
     with relevant information about the uploaded file and the associated automobile.
 
+    When NOTIFICATION_DELIVERY_MODE is 'digest', the notification is queued
+    instead and delivered by flush_notifications_task. A redelivered task is
+    skipped, so each notification is sent once. Failed sends are retried or
+    dead-lettered, see run_notification_task().
+
+    :param payload: A dictionary containing Automobile and Part information.
+    :return: None
+    """
+    run_notification_task(self, lambda: deliver_notification(payload, self.request.id))
+
+
+def deliver_notification(payload: Dict[str, Any], key: Optional[str] = None) -> None:
+    """
+    Sends the email for one upload notification to each of its recipients,
+    or queues it for their next digest in digest mode. The email is rendered
+    once for all recipients.
+
     :param payload: A dictionary containing Automobile and Part information.
+    :param key: The identity of the notification, usually its task ID, see send_mail().
+    :return: None
+    """
+    recipients = get_notification_config().recipients_for(payload)
+
+    if settings.NOTIFICATION_DELIVERY_MODE == DIGEST_MODE:
+        PendingNotification.objects.bulk_create(
+            [PendingNotification(recipient=recipient, payload=payload) for recipient in recipients])
+        return
+
+    email = render_upload(payload)
+    for recipient in recipients:
+        send_mail(recipient, email, key)
+
+
+def send_mail(recipient: str, email: RenderedEmail, key: Optional[str] = None) -> bool:
+    """
+    Sends a rendered notification to one recipient within the provider's
+    rate limit, unless the recipient already received the notification
+    identified by ``key`` recently (see claim_delivery()).
+
+    :param recipient: The recipient address.
+    :param email: The rendered notification.
+    :param key: The identity of the notification, or None to send it unconditionally.
+    :return: False if the email was skipped as a duplicate.
+    :raises TransientDeliveryError: If the send failed and can be retried.
+    """
+    if key is not None and not claim_delivery(recipient, key):
+        observe_email('duplicate')
+        return False
+
+    try:
+        acquire_send_slot()
+        started = time.perf_counter()
+        try:
+            get_mail_client().send(build_mail(recipient, email))
+        except TransientDeliveryError as exc:
+            if exc.status == 429:
+                throttle_provider(exc.retry_after)
+            raise
+        finally:
+            observe_delivery(time.perf_counter() - started)
+    except Exception:
+        if key is not None:
+            release_delivery(recipient, key)
+        observe_email('failed')
+        raise
+    if key is not None:
+        mark_delivered(recipient, key)
+    observe_email('sent')
+    return True
+
+
+def send_digest(recipient: str, payloads: List[Dict[str, Any]], key: Optional[str] = None) -> None:
+    """
+    Sends one email to a recipient summarising several upload notifications.
+
+    :param recipient: The recipient address.
+    :param payloads: The notification payloads for that recipient.
+    :param key: The identity of the digest, by default its content hash.
+    :return: None
+    """
+    email = render_digest(payloads)
+    send_mail(recipient, email, key or content_hash(email))
+
+
+@shared_task(bind=True, name='email_app.tasks.send_bulk_email_task')
+def send_bulk_email_task(self, payloads: List[Dict[str, Any]]) -> None:
+    """
+    A Celery task that notifies about several uploaded files at once, e.g.
+    from a bulk upload. The files are summarised in a single digest email, or
+    queued for the next digest when NOTIFICATION_DELIVERY_MODE is 'digest'.
+    A redelivered task is skipped, and failed sends are retried or
+    dead-lettered like those of send_email_task.
+
+    :param payloads: A list of payloads as accepted by send_email_task.
+    :return: None
+    """
+    run_notification_task(self, lambda: deliver_bulk_notification(payloads, self.request.id))
+
+
+def deliver_bulk_notification(payloads: List[Dict[str, Any]], key: Optional[str] = None) -> None:
+    """
+    Sends the digest emails for several upload notifications, one per
+    recipient as routed, or queues them for the next digests in digest mode.
+
+    :param payloads: A list of payloads as accepted by send_email_task.
+    :param key: The identity of the notifications, usually their task ID.
     :return: None
     """
-    to_email = env('TO_EMAIL')
-    automobile = payload.get('automobile', {})
-    part = payload.get('part', {})
-
-    subject = f"New File Uploaded for {automobile.get('manufacturer')} {automobile.get('model')}"
-    message = f"""
-            Hello,
-            
-            A new file was uploaded for the following automobile:
-            
-            Manufacturer: {automobile.get('manufacturer')}
-            Model: {automobile.get('model')}
-            Type: {automobile.get('type')}
-            
-            Part: {part.get('name')}
-            File Link: {part.get('file_link')}
-            
-            Regards,
-            Email Service
-            """.strip()
-
-    mail = mt.Mail(
-        sender=mt.Address(email=env("FROM_EMAIL"), name="Automobile Management System"),
-        to=[mt.Address(email=to_email)],
-        subject=subject,
-        text=message,
-        category="Integration Test"
-    )
-
-    token = os.environ.get("MAILTRAP_TOKEN", env("MAILTRAP_TOKEN"))
-
-    client = mt.MailtrapClient(token=token)
-    response = client.send(mail)
+    config = get_notification_config()
+    by_recipient = defaultdict(list)
+    for payload in payloads:
+        for recipient in config.recipients_for(payload):
+            by_recipient[recipient].append(payload)
+
+    if settings.NOTIFICATION_DELIVERY_MODE == DIGEST_MODE:
+        PendingNotification.objects.bulk_create([
+            PendingNotification(recipient=recipient, payload=payload)
+            for recipient, recipient_payloads in by_recipient.items() for payload in recipient_payloads
+        ])
+        return
+
+    for recipient, recipient_payloads in by_recipient.items():
+        for start in range(0, len(recipient_payloads), DIGEST_BATCH_SIZE):
+            send_digest(recipient, recipient_payloads[start:start + DIGEST_BATCH_SIZE],
+                        key and f"{key}:{start}")
+
+
+@shared_task(name='email_app.tasks.flush_notifications_task')
+def flush_notifications_task() -> int:
+    """
+    A periodic Celery task that sends every queued notification as one digest
+    email per recipient, with at most DIGEST_BATCH_SIZE notifications per
+    email and FLUSH_LIMIT per run. Notifications are only deleted once their
+    digest has been sent, so a failed send is retried on the next flush.
+    A notification queued twice for the same recipient is included once.
+
+    :return: The number of notifications delivered.
+    """
+    pending = PendingNotification.objects.order_by('recipient', 'id')[:FLUSH_LIMIT]
+    delivered = 0
+    for recipient, notifications in groupby(pending, key=lambda notification: notification.recipient):
+        notifications = list(notifications)
+        for start in range(0, len(notifications), DIGEST_BATCH_SIZE):
+            batch = notifications[start:start + DIGEST_BATCH_SIZE]
+            payloads = {json.dumps(notification.payload, sort_keys=True): notification.payload
+                        for notification in batch}
+            send_digest(recipient, list(payloads.values()))
+            PendingNotification.objects.filter(id__in=[notification.id for notification in batch]).delete()
+            delivered += len(batch)
+    return delivered
+
+
+@shared_task(name='email_app.tasks.purge_processed_tasks_task')
+def purge_processed_tasks_task() -> int:
+    """
+    A periodic Celery task that forgets handled task IDs older than
+    PROCESSED_TASK_RETENTION_DAYS, long after any redelivery could arrive.
+
+    :return: The number of task IDs removed.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PROCESSED_TASK_RETENTION_DAYS)
+    deleted, _ = ProcessedTask.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
+
+
+@shared_task(name='email_app.tasks.purge_sent_emails_task')
+def purge_sent_emails_task() -> int:
+    """
+    A periodic Celery task that forgets sent emails older than
+    NOTIFICATION_DEDUP_WINDOW, which can no longer be duplicated.
+
+    :return: The number of records removed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.NOTIFICATION_DEDUP_WINDOW)
+    deleted, _ = SentEmail.objects.filter(sent_at__lt=cutoff).delete()
+    return deleted
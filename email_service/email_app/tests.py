@@ -1,3 +1,391 @@
-from django.test import TestCase
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import mailtrap as mt
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from email_service.celery import app as celery_app
+
+from .delivery import RateLimited, acquire_send_slot, claim_delivery
+from .fake_provider import FakeMailtrapServer
+from .mailer import get_mail_client
+from .models import DeadLetter, PendingNotification, ProcessedTask, SentEmail
+from .notifications import get_notification_config, get_templates, render_upload
+from .tasks import flush_notifications_task, send_bulk_email_task, send_email_task, send_mail
+
+
+class StubMailtrapHandler(BaseHTTPRequestHandler):
+    """
+    Records every request sent to the stub Mailtrap API and answers like the
+    real ``/api/send`` endpoint.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append({
+            'path': self.path,
+            'headers': dict(self.headers),
+            'body': json.loads(body),
+            'client_port': self.client_address[1],
+        })
+        status, response = self.server.responses.pop(0) if self.server.responses else (200, {
+            'success': True, 'message_ids': ['stub-id'],
+        })
+        data = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubMailtrapTestCase(TestCase):
+    """
+    Base test case that points the Mailtrap client at a local stub server.
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubMailtrapHandler)
+        self.server.requests = []
+        self.server.responses = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        api_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        settings_override = override_settings(MAILTRAP_API_URL=api_url, MAILTRAP_TOKEN='stub-token')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_mail_client.cache_clear()
+        self.addCleanup(get_mail_client.cache_clear)
+
+    @staticmethod
+    def payload(index: int = 0):
+        return {
+            'automobile': {'manufacturer': 'Volvo', 'model': 'FH16', 'type': 'Truck'},
+            'part': {'name': f'Part {index}', 'file_link': f'http://files/{index}.txt'},
+        }
+
+
+class SendEmailTaskTests(StubMailtrapTestCase):
+    def test_immediate_mode_sends_one_email(self):
+        send_email_task(self.payload())
+
+        self.assertEqual(len(self.server.requests), 1)
+        request = self.server.requests[0]
+        self.assertEqual(request['path'], '/api/send')
+        self.assertEqual(request['headers']['Authorization'], 'Bearer stub-token')
+        self.assertEqual(request['body']['subject'], 'New File Uploaded for Volvo FH16')
+        self.assertIn('File Link: http://files/0.txt', request['body']['text'])
+
+    def test_client_reuses_pooled_connection(self):
+        for index in range(3):
+            send_email_task(self.payload(index))
+
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len({request['client_port'] for request in self.server.requests}), 1)
+        self.assertIs(get_mail_client(), get_mail_client())
+
+    def test_bulk_task_sends_single_summary(self):
+        send_bulk_email_task([self.payload(index) for index in range(4)])
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0]['body']['subject'], '4 New File(s) Uploaded')
+
+
+@override_settings(NOTIFICATION_RECIPIENTS=['team@example.com'],
+                   NOTIFICATION_MANUFACTURER_ROUTES={'Volvo': ['volvo@example.com', 'fleet@example.com']})
+class NotificationRoutingTests(StubMailtrapTestCase):
+    def recipients(self):
+        return [request['body']['to'][0]['email'] for request in self.server.requests]
+
+    def test_manufacturer_is_routed_to_its_distribution_list(self):
+        payload = self.payload()
+        payload['automobile']['manufacturer'] = 'VOLVO'
+        send_email_task(payload)
+        self.assertEqual(self.recipients(), ['volvo@example.com', 'fleet@example.com'])
+
+        self.server.requests.clear()
+        payload['automobile']['manufacturer'] = 'Scania'
+        send_email_task(payload)
+        self.assertEqual(self.recipients(), ['team@example.com'])
+
+    def test_bulk_task_sends_one_digest_per_recipient(self):
+        scania = self.payload(9)
+        scania['automobile']['manufacturer'] = 'Scania'
+        send_bulk_email_task([self.payload(0), scania, self.payload(1)])
+
+        digests = {request['body']['to'][0]['email']: request['body'] for request in self.server.requests}
+        self.assertEqual(sorted(digests), ['fleet@example.com', 'team@example.com', 'volvo@example.com'])
+        self.assertEqual(digests['volvo@example.com']['subject'], '2 New File(s) Uploaded')
+        self.assertEqual(digests['team@example.com']['subject'], '1 New File(s) Uploaded')
+
+    @override_settings(NOTIFICATION_DELIVERY_MODE='digest')
+    def test_digest_mode_queues_per_recipient(self):
+        send_email_task(self.payload())
+        self.assertEqual(sorted(PendingNotification.objects.values_list('recipient', flat=True)),
+                         ['fleet@example.com', 'volvo@example.com'])
+
+
+class NotificationTemplateTests(StubMailtrapTestCase):
+    def test_email_has_text_and_escaped_html_bodies(self):
+        payload = self.payload()
+        payload['part']['name'] = '<Brakes & Pads>'
+        send_email_task(payload)
+
+        body = self.server.requests[0]['body']
+        self.assertIn('Part: <Brakes & Pads>', body['text'])
+        self.assertIn('<dd>&lt;Brakes &amp; Pads&gt;</dd>', body['html'])
+        self.assertEqual(body['from']['email'], get_notification_config().sender.email)
+
+    def test_templates_and_config_are_resolved_once(self):
+        self.assertIs(get_templates('upload'), get_templates('upload'))
+        self.assertIs(get_notification_config(), get_notification_config())
+        with override_settings(NOTIFICATION_FROM_NAME='Fleet Desk'):
+            self.assertEqual(get_notification_config().sender.name, 'Fleet Desk')
+            self.assertEqual(render_upload(self.payload()).subject, 'New File Uploaded for Volvo FH16')
+
+
+class IdempotentDeliveryTests(StubMailtrapTestCase):
+    def test_redelivered_task_is_sent_once(self):
+        for _ in range(2):
+            send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        send_bulk_email_task.apply(args=[[self.payload()]], task_id='outbox-message-2')
+        send_bulk_email_task.apply(args=[[self.payload()]], task_id='outbox-message-2')
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(ProcessedTask.objects.count(), 2)
+
+    def test_failed_task_can_be_retried(self):
+        self.server.responses.append((400, {'errors': ['boom']}))
+
+        result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        self.assertTrue(result.failed())
+        self.assertFalse(ProcessedTask.objects.exists())
+
+        send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertTrue(ProcessedTask.objects.filter(task_id='outbox-message-1').exists())
+
+
+@override_settings(NOTIFICATION_RETRY_BACKOFF=0)
+class DeliveryPipelineTests(StubMailtrapTestCase):
+    def test_transient_failure_is_retried(self):
+        self.server.responses.extend([(503, {'errors': ['unavailable']}), (429, {'errors': ['slow down']})])
+
+        result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+
+        self.assertTrue(result.successful())
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertTrue(ProcessedTask.objects.filter(task_id='outbox-message-1').exists())
+        self.assertFalse(DeadLetter.objects.exists())
+
+    @override_settings(NOTIFICATION_MAX_RETRIES=2)
+    def test_exhausted_retries_are_dead_lettered(self):
+        self.server.responses.extend([(503, {'errors': ['unavailable']})] * 3)
+
+        result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+
+        self.assertTrue(result.failed())
+        self.assertEqual(len(self.server.requests), 3)
+        dead_letter = DeadLetter.objects.get()
+        self.assertEqual((dead_letter.task_id, dead_letter.status, dead_letter.retries), ('outbox-message-1', 503, 2))
+        self.assertEqual(dead_letter.args, [self.payload()])
+
+    @override_settings(NOTIFICATION_MAX_RETRIES=5)
+    def test_retry_limit_overrides_celery_default(self):
+        self.server.responses.extend([(503, {'errors': ['unavailable']})] * 6)
+
+        result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+
+        self.assertTrue(result.failed())
+        self.assertEqual(len(self.server.requests), 6)
+        self.assertEqual(DeadLetter.objects.get().retries, 5)
+
+    def test_permanent_failure_is_not_retried(self):
+        self.server.responses.append((422, {'errors': ['Invalid recipient']}))
+
+        result = send_bulk_email_task.apply(args=[[self.payload()]])
+
+        self.assertTrue(result.failed())
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(DeadLetter.objects.get().error, 'Invalid recipient')
+
+    @override_settings(NOTIFICATION_MANUFACTURER_ROUTES={'Volvo': ['volvo@example.com', 'fleet@example.com']})
+    def test_retry_skips_recipients_already_sent(self):
+        self.server.responses.extend([(200, {'success': True}), (503, {'errors': ['unavailable']})])
+
+        send_email_task.apply(args=[self.payload()])
+
+        self.assertEqual([request['body']['to'][0]['email'] for request in self.server.requests],
+                         ['volvo@example.com', 'fleet@example.com', 'fleet@example.com'])
+
+    def test_claimed_notification_is_sent_once_within_window(self):
+        self.assertTrue(send_mail('team@example.com', render_upload(self.payload()), 'outbox-message-1'))
+        self.assertFalse(send_mail('team@example.com', render_upload(self.payload()), 'outbox-message-1'))
+        self.assertEqual(len(self.server.requests), 1)
+
+        with override_settings(NOTIFICATION_DEDUP_WINDOW=0):
+            self.assertTrue(send_mail('team@example.com', render_upload(self.payload()), 'outbox-message-1'))
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_same_content_from_another_task_is_sent(self):
+        send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        send_email_task.apply(args=[self.payload()], task_id='outbox-message-2')
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    @override_settings(NOTIFICATION_RECIPIENTS=['team@example.com'], NOTIFICATION_MANUFACTURER_ROUTES={})
+    def test_redelivery_takes_over_claim_of_dead_attempt(self):
+        # The first delivery claimed the send, then its worker died before sending.
+        claim_delivery('team@example.com', 'outbox-message-1')
+
+        with override_settings(NOTIFICATION_MAX_RETRIES=0):
+            result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        self.assertTrue(result.failed())
+        self.assertIn('Delivery in progress', DeadLetter.objects.get().error)
+        self.assertEqual(self.server.requests, [])
+
+        SentEmail.objects.update(sent_at=timezone.now() - datetime.timedelta(seconds=61))
+        send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(SentEmail.objects.get().sent)
+
+        send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_database_errors_are_retried(self):
+        with mock.patch('email_app.tasks.claim_delivery', side_effect=[OperationalError('database is locked'), True]):
+            result = send_email_task.apply(args=[self.payload()], task_id='outbox-message-1')
+
+        self.assertTrue(result.successful())
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertFalse(DeadLetter.objects.exists())
+
+    @override_settings(MAILTRAP_RATE_LIMIT=10, MAILTRAP_RATE_BURST=1, NOTIFICATION_RATE_LIMIT_MAX_WAIT=0.5)
+    def test_provider_429_pauses_all_senders(self):
+        self.server.responses.append((429, {'errors': ['slow down']}))
+
+        with self.assertRaises(mt.APIError):
+            send_email_task(self.payload())
+        with self.assertRaises(RateLimited):
+            acquire_send_slot()
+
+
+class RateLimitTests(TestCase):
+    def test_sends_are_spaced_below_the_provider_limit(self):
+        server = FakeMailtrapServer(rate=20, burst=2).start()
+        self.addCleanup(server.stop)
+        get_mail_client.cache_clear()
+        self.addCleanup(get_mail_client.cache_clear)
+
+        with override_settings(MAILTRAP_API_URL=server.url, MAILTRAP_RATE_LIMIT=16, MAILTRAP_RATE_BURST=2):
+            started = time.perf_counter()
+            send_bulk_email_task([StubMailtrapTestCase.payload(index) for index in range(10)])
+            for index in range(10):
+                send_email_task(StubMailtrapTestCase.payload(index))
+            elapsed = time.perf_counter() - started
+
+        self.assertEqual(len(server.accepted), 11)
+        self.assertEqual(server.rate_limited, 0)
+        self.assertGreaterEqual(elapsed, 0.4)
+
+
+class TaskRoutingTests(TestCase):
+    @staticmethod
+    def route(task_name):
+        options = celery_app.amqp.router.route({}, task_name, (), {})
+        return options['queue'].name, options.get('priority')
+
+    def test_notifications_and_digests_have_their_own_queues(self):
+        self.assertEqual(self.route(send_email_task.name), ('notifications', 6))
+        self.assertEqual(self.route(send_bulk_email_task.name), ('notifications', 3))
+        self.assertEqual(self.route(flush_notifications_task.name), ('digests', None))
+        self.assertEqual(celery_app.amqp.router.route({}, send_email_task.name, (), {})['queue'].queue_arguments,
+                         {'x-max-priority': 10})
+        self.assertTrue(send_email_task.acks_late)
+
+
+class TaskMetricsTests(StubMailtrapTestCase):
+    @staticmethod
+    def sample(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_queue_latency_and_run_time(self):
+        task = {'task': 'email_app.tasks.send_email_task'}
+        latency = self.sample('celery_task_queue_latency_seconds_sum', **task)
+        runs = self.sample('celery_task_runtime_seconds_count', state='SUCCESS', **task)
+
+        send_email_task.apply(args=[self.payload()], headers={'published_at': time.time() - 5})
+
+        self.assertGreaterEqual(self.sample('celery_task_queue_latency_seconds_sum', **task), latency + 5)
+        self.assertEqual(self.sample('celery_task_runtime_seconds_count', state='SUCCESS', **task), runs + 1)
+
+    def test_failed_task_is_recorded_with_its_state(self):
+        self.server.responses.append((400, {'errors': ['boom']}))
+        task = {'task': 'email_app.tasks.send_email_task'}
+        failures = self.sample('celery_task_runtime_seconds_count', state='FAILURE', **task)
+
+        send_email_task.apply(args=[self.payload()])
+
+        self.assertEqual(self.sample('celery_task_runtime_seconds_count', state='FAILURE', **task), failures + 1)
+
+    def test_metrics_endpoint_is_restricted_by_address(self):
+        send_email_task.apply(args=[self.payload()])
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'celery_task_runtime_seconds_count', response.content)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+
+@override_settings(NOTIFICATION_DELIVERY_MODE='digest')
+class DigestDeliveryTests(StubMailtrapTestCase):
+    def test_digest_mode_queues_instead_of_sending(self):
+        for index in range(3):
+            send_email_task(self.payload(index))
+
+        send_bulk_email_task([self.payload(index) for index in range(2)])
+
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(PendingNotification.objects.count(), 5)
+
+    def test_flush_sends_one_digest_per_recipient(self):
+        for index in range(3):
+            PendingNotification.objects.create(recipient='a@example.com', payload=self.payload(index))
+        PendingNotification.objects.create(recipient='b@example.com', payload=self.payload(9))
+
+        self.assertEqual(flush_notifications_task(), 4)
+
+        self.assertEqual(len(self.server.requests), 2)
+        digests = {request['body']['to'][0]['email']: request['body'] for request in self.server.requests}
+        self.assertEqual(digests['a@example.com']['subject'], '3 New File(s) Uploaded')
+        for index in range(3):
+            self.assertIn(f'Part: Part {index}', digests['a@example.com']['text'])
+        self.assertIn('Part: Part 9', digests['b@example.com']['text'])
+        self.assertFalse(PendingNotification.objects.exists())
+
+    def test_failed_digest_stays_queued(self):
+        PendingNotification.objects.create(recipient='a@example.com', payload=self.payload())
+        self.server.responses.append((500, {'errors': ['boom']}))
+
+        with self.assertRaises(mt.APIError):
+            flush_notifications_task()
+        self.assertEqual(PendingNotification.objects.count(), 1)
+
+        self.assertEqual(flush_notifications_task(), 1)
+        self.assertFalse(PendingNotification.objects.exists())
@@ -77,11 +77,10 @@ WSGI_APPLICATION = 'email_service.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Workers that share notification state (e.g. the notification and digest workers) must
+# point DATABASE_URL at the same database.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': env.db('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
 }
 
 
@@ -127,13 +126,104 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Celery config
-CELERY_BROKER_URL = f"amqp://{env('BROKER_USER')}:{env('BROKER_PASSWORD')}@{env('BROKER_IP')}:{env('BROKER_PORT')}/"
+CELERY_BROKER_URL = env(
+    'CELERY_BROKER_URL',
+    default=f"amqp://{env('BROKER_USER')}:{env('BROKER_PASSWORD')}@{env('BROKER_IP')}:{env('BROKER_PORT')}/")
+CELERY_BROKER_TRANSPORT_OPTIONS = env.json('CELERY_BROKER_TRANSPORT_OPTIONS', default={})
 CELERY_RESULT_BACKEND = env('RESULT_BACKEND')
 
+# Upload notifications, digests and housekeeping have their own queues, so a digest run or a
+# bulk import cannot hold up upload notifications. The automobile service routes the
+# notification tasks it publishes the same way. Within a queue, higher priorities run first;
+# single uploads go ahead of bulk ones.
+NOTIFICATION_QUEUE = 'notifications'
+DIGEST_QUEUE = 'digests'
+CELERY_TASK_ROUTES = {
+    'email_app.tasks.send_email_task': {'queue': NOTIFICATION_QUEUE, 'priority': 6},
+    'email_app.tasks.send_bulk_email_task': {'queue': NOTIFICATION_QUEUE, 'priority': 3},
+    'email_app.tasks.flush_notifications_task': {'queue': DIGEST_QUEUE},
+    'email_app.tasks.purge_processed_tasks_task': {'queue': DIGEST_QUEUE},
+    'email_app.tasks.purge_sent_emails_task': {'queue': DIGEST_QUEUE},
+}
+# Must match the automobile service, as RabbitMQ rejects a queue redeclared with other arguments.
+CELERY_TASK_QUEUE_MAX_PRIORITY = 10
+CELERY_TASK_DEFAULT_PRIORITY = 5
+# Every task is idempotent (see run_once() and claim_delivery()), so tasks are acknowledged
+# once they have run and redelivered if the worker dies. Reserving one task per pool slot
+# keeps priorities effective and leaves queued tasks to idle workers.
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_REJECT_ON_WORKER_LOST = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = env.int('CELERY_WORKER_PREFETCH_MULTIPLIER', default=1)
+# Sends mostly wait on Mailtrap, so the notification worker runs best with a gevent or
+# threads pool and a high concurrency (see `manage.py benchmark_pools`). Choose the pool
+# with `celery worker -P`, not in settings: Celery only monkey-patches for gevent when the
+# pool is on the command line. Keep MAILTRAP_POOL_SIZE at least as high as the concurrency.
+CELERY_WORKER_CONCURRENCY = env.int('CELERY_WORKER_CONCURRENCY', default=os.cpu_count() or 1)
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 EMAIL_HOST = 'sandbox.smtp.mailtrap.io'
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = env('EMAIL_PORT')
 EMAIL_USE_TLS = True
-EMAIL_USE_SSL = False
\ No newline at end of file
+EMAIL_USE_SSL = False
+
+# Mailtrap delivery
+MAILTRAP_TOKEN = env('MAILTRAP_TOKEN')
+MAILTRAP_API_URL = env('MAILTRAP_API_URL', default='https://send.api.mailtrap.io')
+MAILTRAP_POOL_SIZE = env.int('MAILTRAP_POOL_SIZE', default=10)
+MAILTRAP_TIMEOUT = env.float('MAILTRAP_TIMEOUT', default=10.0)
+# Sends per second across all workers, in bursts of up to MAILTRAP_RATE_BURST (0 disables the limit).
+MAILTRAP_RATE_LIMIT = env.float('MAILTRAP_RATE_LIMIT', default=10.0)
+MAILTRAP_RATE_BURST = env.float('MAILTRAP_RATE_BURST', default=10.0)
+
+# Sends that would wait longer than this for the rate limit are retried later instead.
+NOTIFICATION_RATE_LIMIT_MAX_WAIT = env.float('NOTIFICATION_RATE_LIMIT_MAX_WAIT', default=5.0)
+# Transient failures (429, 5xx, timeouts) are retried with exponential backoff from
+# NOTIFICATION_RETRY_BACKOFF seconds; after NOTIFICATION_MAX_RETRIES, or on a permanent
+# failure, the task is moved to the dead letter queue.
+NOTIFICATION_MAX_RETRIES = env.int('NOTIFICATION_MAX_RETRIES', default=10)
+NOTIFICATION_RETRY_BACKOFF = env.float('NOTIFICATION_RETRY_BACKOFF', default=2.0)
+NOTIFICATION_RETRY_BACKOFF_MAX = env.float('NOTIFICATION_RETRY_BACKOFF_MAX', default=600.0)
+# The same email is sent to a recipient at most once in this many seconds (0 disables).
+NOTIFICATION_DEDUP_WINDOW = env.int('NOTIFICATION_DEDUP_WINDOW', default=3600)
+# A claimed send not completed within this many seconds was abandoned by a dead worker and
+# is taken over by the redelivered task; keep it above the rate limit wait plus MAILTRAP_TIMEOUT.
+NOTIFICATION_CLAIM_TIMEOUT = env.int('NOTIFICATION_CLAIM_TIMEOUT', default=60)
+
+# Notification batching: 'immediate' sends one email per upload, 'digest' queues
+# notifications and sends one email per recipient every NOTIFICATION_DIGEST_INTERVAL seconds.
+# Upload notifications are sent from FROM_EMAIL to the TO_EMAIL addresses
+# (comma-separated), except for manufacturers routed to their own
+# distribution lists, e.g. 'Volvo=volvo@example.com,fleet@example.com;Scania=scania@example.com'.
+NOTIFICATION_FROM_EMAIL = env('FROM_EMAIL')
+NOTIFICATION_FROM_NAME = env('NOTIFICATION_FROM_NAME', default='Automobile Management System')
+NOTIFICATION_RECIPIENTS = env.list('TO_EMAIL')
+NOTIFICATION_MANUFACTURER_ROUTES = env.dict('NOTIFICATION_MANUFACTURER_ROUTES', cast={'value': list}, default={})
+NOTIFICATION_CATEGORY = env('NOTIFICATION_CATEGORY', default='Integration Test')
+
+NOTIFICATION_DELIVERY_MODE = env('NOTIFICATION_DELIVERY_MODE', default='immediate')
+NOTIFICATION_DIGEST_INTERVAL = env.int('NOTIFICATION_DIGEST_INTERVAL', default=300)
+
+# IDs of handled tasks are kept this many days to recognise redelivered tasks.
+PROCESSED_TASK_RETENTION_DAYS = env.int('PROCESSED_TASK_RETENTION_DAYS', default=7)
+
+# Prometheus metrics are served at /metrics, and by Celery workers on this port (0 disables).
+WORKER_METRICS_PORT = env.int('WORKER_METRICS_PORT', default=9808)
+# Addresses or networks allowed to read /metrics on the application port; others get a 403
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+CELERY_BEAT_SCHEDULE = {
+    'flush-notification-digests': {
+        'task': 'email_app.tasks.flush_notifications_task',
+        'schedule': NOTIFICATION_DIGEST_INTERVAL,
+    },
+    'purge-processed-tasks': {
+        'task': 'email_app.tasks.purge_processed_tasks_task',
+        'schedule': 24 * 60 * 60,
+    },
+    'purge-sent-emails': {
+        'task': 'email_app.tasks.purge_sent_emails_task',
+        'schedule': 60 * 60,
+    },
+}